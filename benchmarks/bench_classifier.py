@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the question classifier
+
+Classifies a large synthetic corpus of scraped-looking text with the
+original substring checks and with the compiled QuestionClassifier, and
+reports the cost per candidate plus a sample of texts the two disagree on.
+Only filter words changed to whole-word matching, so the compiled classifier
+may accept texts the substring checks rejected ("road" no longer contains
+the filter word 'ad') but never the other way round. The benchmark fails if
+it rejects any text the substring checks accepted, or fewer of the fallback
+dares, which rarely end in '?' and are the first to suffer.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import QuestionClassifier
+from config import FILTER_WORDS, QUESTION_INDICATORS
+from packs import load_fallback_questions
+
+SAMPLES = [
+    "What's the most embarrassing thing you've ever done on the road?",
+    "Have you already told your best friend your biggest secret?",
+    "Would you rather live by the sea or in the mountains?",
+    "Dance for 30 seconds without music while someone films it.",
+    "Show the group the last photo you took on your phone.",
+    "Let the group read your last three text messages out loud.",
+    "Advertisement",
+    "Subscribe to our newsletter for the best questions every week!",
+    "Copyright 2024 All Rights Reserved",
+    "Privacy Policy | Terms and Conditions | Cookie settings",
+    "Home Truth Questions Dare Questions Menu",
+    "Click here to read more questions like these",
+    "These questions are great for parties, sleepovers and game nights.",
+    "Who was your first crush and did you ever tell them?",
+    "Read your most recent search history out loud to everyone.",
+]
+
+
+def legacy_is_valid_question(text):
+    """The substring-scanning check _is_valid_question used originally"""
+    if not text or len(text) < 10 or len(text) > 500:
+        return False
+    text_lower = text.lower()
+    if any(word in text_lower for word in FILTER_WORDS):
+        return False
+    has_question_indicator = any(indicator in text_lower for indicator in QUESTION_INDICATORS)
+    return has_question_indicator or text.strip().endswith('?')
+
+
+def build_corpus(size, seed=0):
+    """Mix sample texts with random padding into a corpus of `size` candidates"""
+    rng = random.Random(seed)
+    words = " ".join(SAMPLES).split()
+    corpus = []
+    for _ in range(size):
+        text = rng.choice(SAMPLES)
+        if rng.random() < 0.5:
+            text = f"{text} {' '.join(rng.choices(words, k=rng.randint(1, 12)))}"
+        corpus.append(text)
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=200_000, help='number of candidate texts')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.size)
+    print(f"🧮 Classifying {len(corpus):,} candidates")
+
+    started = time.perf_counter()
+    legacy = [legacy_is_valid_question(text) for text in corpus]
+    legacy_seconds = time.perf_counter() - started
+
+    classifier = QuestionClassifier()
+    started = time.perf_counter()
+    compiled = classifier.classify(corpus)
+    compiled_seconds = time.perf_counter() - started
+
+    for name, seconds in (("substring scans", legacy_seconds), ("compiled regex", compiled_seconds)):
+        print(f"   {name:<16} {seconds * 1e9 / len(corpus):8.0f} ns/candidate")
+    print(f"   Speedup: {legacy_seconds / compiled_seconds:.1f}x")
+
+    disagreements = {text for text, a, b in zip(corpus, legacy, compiled) if a != b}
+    print(f"   {len(disagreements)} distinct texts classified differently, e.g.:")
+    for text in sorted(disagreements, key=len)[:5]:
+        print(f"     {'✅' if classifier.is_question(text) else '❌'} {text[:80]}")
+
+    dares = [entry.question for entry in load_fallback_questions()['dare']]
+    legacy_dares = sum(map(legacy_is_valid_question, dares))
+    compiled_dares = sum(classifier.classify(dares))
+    print(f"   Fallback dares accepted: {compiled_dares}/{len(dares)} (substring scans: {legacy_dares})")
+
+    regressions = {text for text, a, b in zip(corpus, legacy, compiled) if a and not b}
+    if regressions or compiled_dares < legacy_dares:
+        parser.exit(1, f"❌ {len(regressions)} texts the substring scans accepted are now rejected, "
+                       f"e.g. {min(regressions, key=len, default='-')!r}; "
+                       f"dares accepted: {compiled_dares} vs {legacy_dares}\n")
+
+
+if __name__ == "__main__":
+    main()
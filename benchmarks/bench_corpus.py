@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Measure the memory used by the question corpus
+
+Stores the same synthetic questions as plain Python lists (one per
+category, duplicated across categories as scraping from several pages
+does) and in the interned QuestionCorpus, and reports bytes per 10k
+questions for each, measured with tracemalloc.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import QuestionCorpus
+from sample_pages import OPENERS, SUBJECTS, ENDINGS
+
+
+def build_questions(count, seed=0):
+    """Make `count` distinct questions"""
+    rng = random.Random(seed)
+    questions = set()
+    while len(questions) < count:
+        opener = rng.choice(OPENERS['truth'] + OPENERS['dare'])
+        questions.add(f"{opener} {rng.choice(SUBJECTS)} {rng.choice(ENDINGS)} #{rng.randint(0, 10**6)}?")
+    return list(questions)
+
+
+def measure(build):
+    """Return (result, bytes allocated, seconds) for building a structure"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--questions', type=int, default=10_000, help='distinct questions to store')
+    parser.add_argument('--copies', type=int, default=3, help='how many sources each question is scraped from')
+    args = parser.parse_args()
+
+    questions = build_questions(args.questions)
+    # Fresh string objects per source, as each scrape produces its own copies
+    scraped = [[q.encode().decode() for q in questions] for _ in range(args.copies)]
+    print(f"🧠 {len(questions):,} questions, each scraped from {args.copies} sources")
+
+    def as_lists():
+        return [list(source) for source in scraped]
+
+    def as_corpus(near_duplicates):
+        corpus = QuestionCorpus(near_duplicates=near_duplicates)
+        ids = [corpus.add_many(source) for source in scraped]
+        return corpus, ids
+
+    _, list_bytes, list_seconds = measure(as_lists)
+    _, exact_bytes, exact_seconds = measure(lambda: as_corpus(False))
+    (corpus, _), corpus_bytes, corpus_seconds = measure(lambda: as_corpus(True))
+    # The lists only hold references, so count the strings they keep alive too
+    list_bytes += sum(sys.getsizeof(q) for source in scraped for q in source)
+
+    per_10k = 10_000 / len(questions)
+    print(f"   {'lists of str':<16} {list_bytes * per_10k / 1024:8.0f} KB per 10k  ({list_seconds * 1000:.1f} ms)")
+    print(f"   {'QuestionCorpus':<16} {exact_bytes * per_10k / 1024:8.0f} KB per 10k  ({exact_seconds * 1000:.1f} ms)")
+    print(f"   {'+ near-dup index':<16} {corpus_bytes * per_10k / 1024:8.0f} KB per 10k  ({corpus_seconds * 1000:.1f} ms)")
+    usage = corpus.memory_usage()
+    print(f"   Corpus self-report: {usage['bytes_per_10k'] / 1024:.0f} KB per 10k, "
+          f"{len(corpus):,} unique questions, near-duplicate index {usage['near_duplicate_bytes'] / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Measure near-duplicate detection at ingestion as the corpus grows
+
+Builds synthetic candidate questions, a share of which are near-duplicate
+variants of others (different case, punctuation, emoji, texting shorthand or
+a one-letter typo), and times adding them all to a QuestionCorpus with and
+without near-duplicate detection at sizes up to 100k. The LSH lookup only
+verifies the candidates sharing a band with each new question: their number
+(shown per lookup) grows while buckets fill up but is capped at
+LSH_BANDS * LSH_MAX_BUCKET, so per-candidate cost rises far less than the
+corpus does. A naive pairwise comparison, whose per-candidate cost grows
+with the corpus, is timed at the smaller sizes for contrast. Recall
+(variants merged into their original) and false merges (distinct questions
+merged) are reported for each size.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import QuestionCorpus
+from dedup import jaccard, normalize_text, shingles
+from config import NEAR_DUPLICATE_THRESHOLD
+
+TEMPLATES = [
+    "What is the {} {} you have ever {}?",
+    "Have you ever {} a {} {} in front of your friends?",
+    "Who is your {} {} and why do you {} them?",
+    "Would you rather {} a {} or {} every day?",
+    "When was the last time you {} your {} {}?",
+]
+EMOJI = ["😂", "😱", "🔥", "👀", "🙈"]
+
+
+def make_vocabulary(rng, size=5000):
+    """Pronounceable made-up words, so distinct questions share only their template"""
+    consonants, vowels = "bcdfghklmnprstvz", "aeiou"
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_variant(rng, text):
+    """A near-duplicate of a question, as another site might word it"""
+    kind = rng.randrange(5)
+    if kind == 0:
+        return text.upper()
+    if kind == 1:
+        return text.rstrip('?') + rng.choice(["??", "?!", "!!", " ?", ""])
+    if kind == 2:
+        return f"{text} {rng.choice(EMOJI)}"
+    if kind == 3:
+        return text.replace("your", "ur").replace("you", "u")
+    # One-letter typo in the longest word
+    word = max(text.split(), key=len)
+    i = rng.randrange(1, len(word) - 1)
+    return text.replace(word, word[:i] + word[i + 1:], 1)
+
+
+def build_candidates(count, duplicate_share, seed=0):
+    """[(text, cluster)] where variants share the cluster number of their original"""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    originals = int(count * (1 - duplicate_share))
+    candidates, seen = [], set()
+    while len(candidates) < originals:
+        template = rng.choice(TEMPLATES)
+        text = template.format(*(rng.choice(vocabulary) for _ in range(template.count('{}'))))
+        if text not in seen:
+            seen.add(text)
+            candidates.append((text, len(candidates)))
+    while len(candidates) < count:
+        text, cluster = rng.choice(candidates[:originals])
+        candidates.append((make_variant(rng, text), cluster))
+    rng.shuffle(candidates)
+    return candidates
+
+
+def ingest(candidates, near_duplicates):
+    """Add every candidate to a fresh corpus, returning (corpus, IDs, seconds)"""
+    corpus = QuestionCorpus(near_duplicates=near_duplicates)
+    started = time.perf_counter()
+    ids = [corpus.add(text) for text, _ in candidates]
+    return corpus, ids, time.perf_counter() - started
+
+
+def ingest_pairwise(candidates):
+    """Naive baseline: compare every candidate with every kept question, returning seconds"""
+    kept = []
+    started = time.perf_counter()
+    for text, _ in candidates:
+        shingle_set = shingles(normalize_text(text))
+        if not any(jaccard(shingle_set, other) >= NEAR_DUPLICATE_THRESHOLD for other in kept):
+            kept.append(shingle_set)
+    return time.perf_counter() - started
+
+
+def score(candidates, ids):
+    """(recall, false merges): variants resolved to their cluster's ID, and IDs shared by several clusters"""
+    cluster_ids = {}
+    for (_, cluster), qid in zip(candidates, ids):
+        cluster_ids.setdefault(cluster, []).append(qid)
+    variants = sum(len(qids) - 1 for qids in cluster_ids.values())
+    merged = sum(qids.count(qids[0]) - 1 for qids in cluster_ids.values())
+    canonical = {}
+    false_merges = 0
+    for cluster, qids in cluster_ids.items():
+        owner = canonical.setdefault(qids[0], cluster)
+        false_merges += owner != cluster
+    return merged / variants if variants else 1.0, false_merges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 2_000, 10_000, 100_000],
+                        help='candidate counts to ingest')
+    parser.add_argument('--duplicate-share', type=float, default=0.3,
+                        help='fraction of candidates that are near-duplicates of another')
+    parser.add_argument('--pairwise-max', type=int, default=2_000,
+                        help='largest size to time the pairwise baseline at')
+    args = parser.parse_args()
+
+    print(f"👯 Ingesting candidates, {args.duplicate_share:.0%} of them near-duplicates "
+          f"(threshold {NEAR_DUPLICATE_THRESHOLD}):")
+    print(f"   {'candidates':>10} {'LSH':>10} {'per cand.':>10} {'exact only':>11} {'pairwise':>10} "
+          f"{'checked':>8} {'recall':>7} {'false':>6} {'index KB':>9}")
+    for size in args.sizes:
+        candidates = build_candidates(size, args.duplicate_share)
+        corpus, ids, seconds = ingest(candidates, near_duplicates=True)
+        _, _, exact_seconds = ingest(candidates, near_duplicates=False)
+        pairwise = f"{ingest_pairwise(candidates):9.2f}s" if size <= args.pairwise_max else f"{'-':>10}"
+        recall, false_merges = score(candidates, ids)
+        index_kb = corpus.memory_usage()['near_duplicate_bytes'] / 1024
+        index = corpus.near_index
+        checked = index.candidates_checked / index.lookups if index.lookups else 0.0
+        print(f"   {size:>10,} {seconds:9.2f}s {seconds / size * 1e6:8.1f}µs {exact_seconds:10.2f}s {pairwise} "
+              f"{checked:8.1f} {recall:7.1%} {false_merges:>6} {index_kb:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark question extraction over the sample source pages
+
+Compares the original BeautifulSoup implementation (html.parser plus one
+soup.select pass per selector) with the single-pass lxml extractor used by
+the scraper, and checks that both find the same questions.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from classifier import is_valid_question
+from config import MAX_QUESTIONS_PER_SOURCE
+from extractor import extract_questions
+from sample_pages import load_sample_pages
+
+
+def legacy_extract_questions(page):
+    """The selector-loop extraction the scraper used before the single-pass engine"""
+    soup = BeautifulSoup(page, 'html.parser')
+
+    questions = []
+    selectors = [
+        'li', 'p', 'h3', 'h4', 'h5', 'div.question',
+        'div.truth-question', 'div.dare-question',
+        'span.question', 'article', 'section'
+    ]
+    for selector in selectors:
+        for element in soup.select(selector):
+            text = element.get_text().strip()
+            if is_valid_question(text):
+                questions.append(text)
+
+    seen = set()
+    unique_questions = []
+    for question in questions:
+        if question not in seen:
+            seen.add(question)
+            unique_questions.append(question)
+    return unique_questions[:MAX_QUESTIONS_PER_SOURCE]
+
+
+def run(extract, pages, rounds):
+    """Extract every page `rounds` times and return (seconds, results of the last round)"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        results = [extract(page) for page in pages]
+    return time.perf_counter() - started, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=3, help='times to extract every page')
+    args = parser.parse_args()
+
+    pages = [page for _, page in load_sample_pages().values()]
+    total_mb = sum(len(page) for page in pages) * args.rounds / 1e6
+    print(f"📄 {len(pages)} pages, {total_mb / args.rounds:.2f} MB, {args.rounds} rounds")
+
+    legacy_seconds, legacy_results = run(legacy_extract_questions, pages, args.rounds)
+    new_seconds, new_results = run(extract_questions, pages, args.rounds)
+
+    for name, seconds in (("selector loop (bs4)", legacy_seconds), ("single pass (lxml)", new_seconds)):
+        pages_per_second = len(pages) * args.rounds / seconds
+        print(f"   {name:<20} {pages_per_second:8.1f} pages/s  {total_mb / seconds:6.2f} MB/s")
+    print(f"   Speedup: {legacy_seconds / new_seconds:.1f}x")
+
+    legacy_found = sum(len(r) for r in legacy_results)
+    new_found = sum(len(r) for r in new_results)
+    shared = sum(len(set(a) & set(b)) for a, b in zip(legacy_results, new_results))
+    print(f"   Questions found: {legacy_found} (bs4) vs {new_found} (lxml), {shared} in common")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Measure writing and streaming large question packs
+
+Writes a synthetic pack of several hundred thousand questions, then streams
+it back with iter_pack(), once in full and once for a single category, and
+reports throughput and the peak memory allocated while reading. Peak memory
+staying flat however large the pack shows entries are never all held at
+once. A smaller pack is then loaded the way the bot loads it, streamed into
+a QuestionScraper's corpus with near-duplicate detection and tags, while the
+longest the event loop went without running anything else is measured. It
+exits with an error if that is more than --max-stall-ms, a few slices of
+PACK_LOAD_SLICE_MS to allow for scheduling noise.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PACK_LOAD_SLICE_MS
+from packs import iter_pack, write_pack
+from scraper import QuestionScraper
+from sample_pages import OPENERS, SUBJECTS, ENDINGS
+
+CATEGORIES = ['truth', 'dare', 'would_you_rather']
+
+
+def generate_entries(count, seed=0):
+    """Yield `count` (category, question, tags) entries without building a list"""
+    rng = random.Random(seed)
+    for n in range(count):
+        category = CATEGORIES[n % len(CATEGORIES)]
+        question = f"{rng.choice(OPENERS[category])} {rng.choice(SUBJECTS)} {rng.choice(ENDINGS)} #{n}?"
+        yield category, question, ['funny'] if n % 7 == 0 else []
+
+
+def stream(path, category=None):
+    """Count a pack's entries, returning (count, seconds, peak bytes allocated)"""
+    started = time.perf_counter()
+    count = sum(1 for _ in iter_pack(path, category))
+    seconds = time.perf_counter() - started
+    # Memory is measured on a second pass, as tracing slows the first down several times
+    tracemalloc.start()
+    for _ in iter_pack(path, category):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, seconds, peak
+
+
+async def load_into_scraper(directory):
+    """Load a directory of packs into a scraper, returning (questions, seconds, longest loop stall)"""
+    scraper = QuestionScraper(sources={}, alternative_sources={}, store_path=None, packs_dir=directory)
+    longest = 0.0
+    
+    async def watch():
+        nonlocal longest
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            longest = max(longest, now - last)
+            last = now
+    
+    watcher = asyncio.create_task(watch())
+    started = time.perf_counter()
+    try:
+        for category in CATEGORIES:
+            await scraper._apply_packs(category)
+        seconds = time.perf_counter() - started
+    finally:
+        watcher.cancel()
+        await scraper.close()
+    return len(scraper.corpus), seconds, longest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=300_000, help='questions in the pack')
+    parser.add_argument('--load-entries', type=int, default=30_000,
+                        help='questions in the pack loaded into a scraper')
+    parser.add_argument('--max-stall-ms', type=float, default=4 * PACK_LOAD_SLICE_MS,
+                        help='longest the event loop may stall while loading')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.jsonl')
+        started = time.perf_counter()
+        write_pack(path, generate_entries(args.entries))
+        seconds = time.perf_counter() - started
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"📦 Wrote {args.entries:,} entries ({size_mb:.1f} MB) in {seconds:.2f}s")
+
+        for label, category in (('all categories', None), ('truth only', 'truth')):
+            count, seconds, peak = stream(path, category)
+            print(f"   {label:<16} {count:>9,} entries in {seconds:6.2f}s "
+                  f"({count / seconds:>9,.0f}/s), peak {peak / 1024:7.0f} KB allocated")
+
+        directory = os.path.join(tmp, 'packs')
+        os.mkdir(directory)
+        write_pack(os.path.join(directory, 'load.jsonl'), generate_entries(args.load_entries))
+        questions, seconds, longest = asyncio.run(load_into_scraper(directory))
+        print(f"📥 Loaded {args.load_entries:,} entries into a scraper ({questions:,} unique questions) "
+              f"in {seconds:.2f}s, longest event loop stall {longest * 1000:.1f} ms")
+        if longest * 1000 > args.max_stall_ms:
+            parser.exit(1, f"❌ Loading stalled the event loop for more than {args.max_stall_ms:g} ms\n")
+
+
+if __name__ == "__main__":
+    main()
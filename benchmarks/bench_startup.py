@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Measure bot cold-start time against a budget
+
+Starts fresh interpreters that import config, scraper and bot, and one that
+goes from nothing to the first question answered out of a question store
+(what a restarted container does before it can reply). Each is run several
+times and the median wall time, interpreter startup included, is compared
+with COLD_START_BUDGET_MS. It also checks that importing the scraper loads
+none of the heavy modules that are only needed once scraping starts, and
+prints the slowest imports from a `python -X importtime` profile of bot.py.
+
+Exits with status 1 when a budget is exceeded or a heavy module is loaded
+too early, so it can run in CI.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from store import QuestionStore
+
+# Median milliseconds allowed for each scenario, interpreter startup included
+COLD_START_BUDGET_MS = {
+    'import config': 150,
+    'import scraper': 300,
+    'import bot': 1500,
+    'first question from store': 400,
+}
+
+# Modules that should only be imported once the first page is scraped or served
+DEFERRED_MODULES = ['aiohttp', 'lxml', 'bs4', 'discord', 'extractor']
+
+FIRST_QUESTION = """
+import asyncio, sys
+from scraper import QuestionScraper
+
+async def main():
+    scraper = QuestionScraper(store_path=sys.argv[1])
+    question, _ = scraper.peek_random_question('truth')
+    assert question, "no question loaded from the store"
+    await scraper.close()
+
+asyncio.run(main())
+"""
+
+
+def run_python(code, *args, importtime=False):
+    """Run code in a fresh interpreter from the repo root, returning (seconds, stderr)"""
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code, *args]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+    if result.returncode:
+        raise RuntimeError(f"{code.strip().splitlines()[0]!r} failed:\n{result.stderr}")
+    return seconds, result.stderr
+
+
+def parse_importtime(stderr):
+    """Turn -X importtime output into [(module, self µs, cumulative µs)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def seed_store(path, count=300):
+    """Fill a question store like one left behind by an earlier run"""
+    store = QuestionStore(path)
+    questions = [f"What is the most surprising thing about question number {n}?" for n in range(count)]
+    store.save_source('truth', 'https://example.com/truth-questions/', questions)
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7, help='fresh interpreters per scenario')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list from the profile')
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, 'questions.db')
+        seed_store(store_path)
+        scenarios = {
+            'import config': ('import config',),
+            'import scraper': ('import scraper',),
+            'import bot': ('import bot',),
+            'first question from store': (FIRST_QUESTION, store_path),
+        }
+
+        print(f"🚀 Cold start, median of {args.runs} fresh interpreters:")
+        for name, command in scenarios.items():
+            run_python(*command)  # Compile bytecode first so every measured run is alike
+            median = statistics.median(run_python(*command)[0] for _ in range(args.runs)) * 1000
+            budget = COLD_START_BUDGET_MS[name]
+            marker = "✅" if median <= budget else "❌"
+            failed |= median > budget
+            print(f"   {marker} {name:<28} {median:7.1f} ms  (budget {budget} ms)")
+
+    _, stderr = run_python(
+        'import sys, scraper; print(" ".join(sorted(sys.modules)), file=sys.stderr)'
+    )
+    loaded = set(stderr.split())
+    early = [module for module in DEFERRED_MODULES if module in loaded]
+    if early:
+        failed = True
+        print(f"\n❌ Importing the scraper already loads: {', '.join(early)}")
+    else:
+        print(f"\n✅ Importing the scraper loads none of: {', '.join(DEFERRED_MODULES)}")
+
+    _, stderr = run_python('import bot', importtime=True)
+    rows = parse_importtime(stderr)
+    total_us = next(cumulative for name, _, cumulative in rows if name == 'bot')
+    print(f"\n🔍 Slowest imports for bot.py ({total_us / 1000:.1f} ms total, by self time):")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"   {self_us / 1000:7.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
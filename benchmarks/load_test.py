@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the scraper and bot commands
+
+Serves the sample page for every URL in QUESTION_SOURCES and
+ALTERNATIVE_SOURCES from a local aiohttp server, with configurable latency
+and failure injection, then:
+
+1. Fills every category from scratch several times to measure scrape throughput
+2. Drives the bot.py command handlers with a stubbed ctx at a configurable
+   concurrency to measure command latency
+
+Results are printed and saved as JSON in benchmarks/results/ so that runs
+can be compared with --compare.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+from sample_pages import load_sample_pages
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+COMMANDS = ['truth', 'dare', 'would_you_rather', 'random_question']
+
+
+class MockSourceServer:
+    """Local server answering for every configured source page"""
+
+    def __init__(self, latency_ms=50, jitter_ms=20, failure_rate=0.0, port=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.port = port
+        self.requests = 0
+        self.failures = 0
+        self._runner = None
+        # path -> (category, original URL, html bytes)
+        self.pages = {
+            urlsplit(url).path: (category, url, page)
+            for url, (category, page) in load_sample_pages().items()
+        }
+
+    async def _handle(self, request):
+        self.requests += 1
+        delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if random.random() < self.failure_rate:
+            self.failures += 1
+            return web.Response(status=503, text="Injected failure")
+
+        page = self.pages.get(request.path)
+        if page is None:
+            return web.Response(status=404)
+        return web.Response(body=page[2], content_type='text/html', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/{path:.*}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    def local_sources(self, sources):
+        """Rewrite a config sources dict to point at this server"""
+        return {
+            category: [f'http://127.0.0.1:{self.port}{urlsplit(url).path}' for url in urls]
+            for category, urls in sources.items()
+        }
+
+
+class StubAuthor:
+    display_name = "load-test"
+
+
+class StubChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+
+
+class StubTyping:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class StubContext:
+    """Just enough of commands.Context for the question command handlers"""
+
+    def __init__(self, channel_id):
+        self.author = StubAuthor()
+        self.channel = StubChannel(channel_id)
+        self.guild = None
+        self.sent = []
+
+    def typing(self):
+        return StubTyping()
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content or kwargs.get('embed'))
+
+
+def percentiles(samples):
+    """p50/p95/p99 of a list of seconds, in milliseconds"""
+    if not samples:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99)}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+async def scrape_phase(server, rounds):
+    """Fill every category from an empty cache `rounds` times"""
+    from config import QUESTION_SOURCES, ALTERNATIVE_SOURCES
+    from scraper import QuestionScraper
+
+    fill_times = []
+    requests_before = server.requests
+    started = time.perf_counter()
+    for _ in range(rounds):
+        scraper = QuestionScraper(
+            sources=server.local_sources(QUESTION_SOURCES),
+            alternative_sources=server.local_sources(ALTERNATIVE_SOURCES),
+            store_path=None
+        )
+        fill_started = time.perf_counter()
+        await scraper.warm_up()
+        fill_times.append(time.perf_counter() - fill_started)
+        await scraper.close()
+    seconds = time.perf_counter() - started
+    scrapes = server.requests - requests_before
+
+    return {
+        'rounds': rounds,
+        'scrapes': scrapes,
+        'scrapes_per_second': round(scrapes / seconds, 2),
+        'fill': percentiles(fill_times),
+    }
+
+
+async def command_phase(server, commands_total, concurrency, channels, cold_every):
+    """Run the bot's question commands against a scraper backed by the mock server"""
+    from config import QUESTION_SOURCES, ALTERNATIVE_SOURCES
+    from scraper import QuestionScraper
+    import bot
+
+    scraper = QuestionScraper(
+        sources=server.local_sources(QUESTION_SOURCES),
+        alternative_sources=server.local_sources(ALTERNATIVE_SOURCES),
+        store_path=None
+    )
+    bot.scraper = scraper
+    handlers = {name: getattr(bot, name).callback for name in COMMANDS}
+
+    latencies = {name: [] for name in COMMANDS}
+    issued = 0
+    errors = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < commands_total:
+            issued += 1
+            if cold_every and issued % cold_every == 0:
+                await scraper.refresh_cache()
+            name = random.choice(COMMANDS)
+            ctx = StubContext(random.randrange(channels))
+            started = time.perf_counter()
+            try:
+                await handlers[name](ctx)
+            except Exception:
+                errors += 1
+            latencies[name].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    await scraper.close()
+
+    all_latencies = [latency for samples in latencies.values() for latency in samples]
+    return {
+        'commands': len(all_latencies),
+        'concurrency': concurrency,
+        'errors': errors,
+        'commands_per_second': round(len(all_latencies) / seconds, 2),
+        'latency': percentiles(all_latencies),
+        'by_command': {name: percentiles(samples) for name, samples in latencies.items()},
+    }
+
+
+def print_report(results):
+    scrape = results['scrape']
+    commands = results['commands']
+    print(f"🌐 Scrape: {scrape['scrapes']} requests, {scrape['scrapes_per_second']} scrapes/s, "
+          f"full fill p50 {scrape['fill']['p50_ms']}ms p95 {scrape['fill']['p95_ms']}ms")
+    latency = commands['latency']
+    print(f"💬 Commands: {commands['commands']} at concurrency {commands['concurrency']}, "
+          f"{commands['commands_per_second']}/s, {commands['errors']} errors")
+    print(f"   Latency p50 {latency['p50_ms']}ms • p95 {latency['p95_ms']}ms • p99 {latency['p99_ms']}ms")
+    print(f"🧠 Peak RSS: {results['peak_rss_mb']} MB")
+
+
+def print_comparison(results, baseline_path):
+    """Print how key numbers moved relative to an earlier run"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    rows = [
+        ("scrapes/s", ('scrape', 'scrapes_per_second'), True),
+        ("commands/s", ('commands', 'commands_per_second'), True),
+        ("command p50 ms", ('commands', 'latency', 'p50_ms'), False),
+        ("command p95 ms", ('commands', 'latency', 'p95_ms'), False),
+        ("command p99 ms", ('commands', 'latency', 'p99_ms'), False),
+        ("peak RSS MB", ('peak_rss_mb',), False),
+    ]
+    print(f"\n📊 Compared with {os.path.basename(baseline_path)}:")
+    for label, path, higher_is_better in rows:
+        old, new = baseline, results
+        for key in path:
+            old, new = old.get(key) if old else None, new.get(key) if new else None
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        better = change > 0 if higher_is_better else change < 0
+        marker = "✅" if better or abs(change) < 0.05 else "❌"
+        print(f"   {marker} {label:<16} {old:>10} -> {new:<10} ({change:+.1%})")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency-ms', type=float, default=50, help='mean response delay of the mock server')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='random +/- added to each delay')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--scrape-rounds', type=int, default=5, help='full cold fills of every category')
+    parser.add_argument('--commands', type=int, default=2000, help='commands to run')
+    parser.add_argument('--concurrency', type=int, default=50, help='commands in flight at once')
+    parser.add_argument('--channels', type=int, default=100, help='distinct channels commands come from')
+    parser.add_argument('--cold-every', type=int, default=0,
+                        help='clear the cache every N commands to exercise the cold path (0 = never)')
+    parser.add_argument('--output', help='where to write the JSON results (default: benchmarks/results/)')
+    parser.add_argument('--compare', help='earlier JSON results to compare against')
+    args = parser.parse_args()
+
+    server = MockSourceServer(args.latency_ms, args.jitter_ms, args.failure_rate)
+    await server.start()
+    try:
+        results = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'config': vars(args),
+            'scrape': await scrape_phase(server, args.scrape_rounds),
+            'commands': await command_phase(
+                server, args.commands, args.concurrency, args.channels, args.cold_every
+            ),
+            'server': {'requests': server.requests, 'injected_failures': server.failures},
+        }
+    finally:
+        await server.stop()
+    results['peak_rss_mb'] = peak_rss_mb()
+
+    print_report(results)
+    if args.compare:
+        print_comparison(results, args.compare)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"load_test-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Sample source pages for the benchmarks
+
+Pages saved in benchmarks/pages/ (one .html file per source URL, named by
+the URL's last path segment) are used as-is. Any source without a saved
+page gets a synthetic one shaped like the real question sites: navigation
+menus, scripts, ad blocks and long nested article/section/list markup.
+
+Run this file with --record to save the live pages for every source.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import QUESTION_SOURCES, ALTERNATIVE_SOURCES, USER_AGENT
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+
+OPENERS = {
+    'truth': ["What's the", "When was the last time you", "Who is the", "Have you ever", "Why did you", "How often do you"],
+    'dare': ["Let the group", "Call your", "Do your best", "Post a", "Try to", "Sing the"],
+    'would_you_rather': ["Would you rather"]
+}
+SUBJECTS = [
+    "most embarrassing thing", "weirdest habit", "biggest secret", "funniest memory",
+    "worst date", "strangest dream", "last lie", "biggest crush", "worst haircut",
+    "favourite snack", "oldest friend", "longest phone call", "most awkward text"
+]
+ENDINGS = [
+    "you've ever told anyone", "from high school", "in front of your family", "at a party",
+    "on a first date", "while on holiday", "that nobody knows about", "in the last year"
+]
+
+
+def page_name(url):
+    """File name a source URL's page is saved under"""
+    return url.rstrip('/').rsplit('/', 1)[-1] + '.html'
+
+
+def all_source_urls():
+    """Every configured source URL with its category"""
+    for sources in (QUESTION_SOURCES, ALTERNATIVE_SOURCES):
+        for category, urls in sources.items():
+            for url in urls:
+                yield category, url
+
+
+def _question(rng, category):
+    """Make up a plausible question for a category"""
+    text = f"{rng.choice(OPENERS[category])} {rng.choice(SUBJECTS)} {rng.choice(ENDINGS)}"
+    if category == 'would_you_rather':
+        text += f" or {rng.choice(SUBJECTS)} {rng.choice(ENDINGS)}"
+    return text + ('?' if category != 'dare' else '.')
+
+
+def generate_page(url, category, questions=300):
+    """Build a synthetic page for a source URL (deterministic per URL)"""
+    rng = random.Random(url)
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>Questions</title>']
+    parts.append('<script>window.dataLayer=[];function track(){return "What is this?";}</script>')
+    parts.append('<style>.menu li{display:inline}</style></head><body>')
+    parts.append('<nav class="menu"><ul>')
+    for item in ("Home", "Truth Questions", "Dare Questions", "Would You Rather", "Privacy Policy", "Contact"):
+        parts.append(f'<li><a href="#">{item}</a></li>')
+    parts.append('</ul></nav><div class="content"><article><h1>Questions</h1>')
+
+    for section in range(questions // 25):
+        parts.append(f'<section><h2>Section {section + 1}</h2>')
+        parts.append(
+            '<p>These questions are great for parties, sleepovers and game nights. '
+            'Pick one at random and see where the conversation goes.</p>'
+        )
+        parts.append('<div class="advertisement"><p>Advertisement - click here for more</p></div>')
+        parts.append('<ol>')
+        for _ in range(25):
+            parts.append(f'<li><strong>{_question(rng, category)}</strong></li>')
+        parts.append('</ol></section>')
+
+    parts.append('</article></div><footer><p>Copyright 2024, all rights reserved.</p>')
+    parts.append('<p>Subscribe to our newsletter for new questions every week!</p></footer>')
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def load_sample_pages():
+    """Return {url: (category, html bytes)} for every configured source"""
+    pages = {}
+    for category, url in all_source_urls():
+        path = os.path.join(PAGES_DIR, page_name(url))
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                pages[url] = (category, f.read())
+        else:
+            pages[url] = (category, generate_page(url, category))
+    return pages
+
+
+async def record_pages():
+    """Download every source page into benchmarks/pages/"""
+    import aiohttp
+
+    os.makedirs(PAGES_DIR, exist_ok=True)
+    async with aiohttp.ClientSession(headers={'User-Agent': USER_AGENT}) as session:
+        for _, url in all_source_urls():
+            try:
+                async with session.get(url) as response:
+                    body = await response.read()
+                if response.status != 200:
+                    print(f"❌ {url}: Status {response.status}")
+                    continue
+                with open(os.path.join(PAGES_DIR, page_name(url)), 'wb') as f:
+                    f.write(body)
+                print(f"✅ {url}: {len(body) // 1024} KB")
+            except Exception as e:
+                print(f"❌ {url}: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--record', action='store_true', help='save the live source pages to benchmarks/pages/')
+    args = parser.parse_args()
+    if args.record:
+        asyncio.run(record_pages())
+    else:
+        for url, (category, page) in load_sample_pages().items():
+            print(f"{category:>16}  {len(page) // 1024:>4} KB  {url}")
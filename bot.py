@@ -1,117 +1,414 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
-import asyncio
+import logging
 import random
-import os
-from dotenv import load_dotenv
-from datetime import datetime
+import time
+from typing import Optional
+from urllib.parse import urlsplit
 
 # Import our modules
-from config import BOT_TOKEN, COMMAND_PREFIX, EMBED_COLORS, STATUS_MESSAGES
+from config import (
+    BOT_TOKEN, COMMAND_PREFIX, PREFIX_COMMANDS_ENABLED, SYNC_APP_COMMANDS,
+    BOT_RUN_MODE, SHARD_COUNT, SHARD_IDS,
+    EMBED_COLORS, STATUS_MESSAGES, METRICS_ENABLED, USER_RATE_LIMIT, GUILD_RATE_LIMIT
+)
+from game import GameManager, GameError, LOBBY, CHOOSING, ANSWERING
+from logs import setup_logging
+from metrics import registry, MetricsServer
+from ratelimit import RateLimiter, acquire
 from scraper import QuestionScraper
+from shared import SharedQuestionReader
+from tags import normalize_tag
 
-# Load environment variables
-load_dotenv()
+# config.py has already loaded the .env file
+
+logger = logging.getLogger(__name__)
 
 # Bot configuration
 intents = discord.Intents.none()  # Start with no intents
-intents.message_content = True
 intents.guilds = True
-intents.messages = True
+# Message events are only needed for prefix commands; slash commands arrive as interactions
+intents.message_content = PREFIX_COMMANDS_ENABLED
+intents.messages = PREFIX_COMMANDS_ENABLED
 # Explicitly disable privileged intents
 intents.members = False
 intents.presences = False
 
-bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents)
+command_prefix = COMMAND_PREFIX if PREFIX_COMMANDS_ENABLED else commands.when_mentioned
+
+if BOT_RUN_MODE == 'shard':
+    BotBase, bot_options = commands.AutoShardedBot, {'shard_count': SHARD_COUNT, 'shard_ids': SHARD_IDS}
+elif BOT_RUN_MODE == 'standalone':
+    BotBase, bot_options = commands.Bot, {}
+else:
+    raise ValueError(f"Unknown BOT_RUN_MODE {BOT_RUN_MODE!r}, expected 'standalone' or 'shard'")
+
+class TruthOrDareBot(BotBase):
+    """The bot, which also stops its question source, game deadlines and metrics server when closed"""
+    
+    async def setup_hook(self):
+        global scraper
+        if scraper is None:
+            scraper = create_scraper()
+        
+        # Game buttons are matched by custom ID, and every game's deadlines run on one task
+        self.add_dynamic_items(GameButton)
+        game_manager.scheduler.start()
+        
+        # Register the slash versions of the commands with Discord
+        if SYNC_APP_COMMANDS:
+            await self.tree.sync()
+    
+    async def close(self):
+        if self.is_closed():
+            return
+        try:
+            await super().close()
+        finally:
+            await metrics_server.stop()
+            await game_manager.scheduler.stop()
+            if scraper is not None:
+                await scraper.close()
+
+bot = TruthOrDareBot(command_prefix=command_prefix, intents=intents, **bot_options)
+
+# The question source is created in setup_hook, once the bot is actually starting
+scraper = None
+
+def create_scraper():
+    """Create the question source for the configured run mode"""
+    if BOT_RUN_MODE == 'shard':
+        # Questions come from the refresher process through the shared store
+        return SharedQuestionReader()
+    return QuestionScraper()
+
+# Command instrumentation, exposed on /metrics when METRICS_ENABLED
+COMMAND_SECONDS = registry.histogram(
+    'truthbot_command_duration_seconds', 'Time to handle a bot command', ['command']
+)
+COMMANDS = registry.counter(
+    'truthbot_commands_total', 'Bot commands handled by command and outcome', ['command', 'outcome']
+)
+metrics_server = MetricsServer()
+
+# Token buckets per (user, command) and (server, command)
+user_limiter = RateLimiter(*USER_RATE_LIMIT)
+guild_limiter = RateLimiter(*GUILD_RATE_LIMIT)
+
+class RateLimited(commands.CheckFailure):
+    """Raised when a user or server has run a command too often"""
+    
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limited, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+@bot.check
+async def rate_limit(ctx):
+    name = ctx.command.qualified_name
+    limits = [(user_limiter, (ctx.author.id, name))]
+    if ctx.guild is not None:
+        limits.append((guild_limiter, (ctx.guild.id, name)))
+    retry_after = acquire(limits)
+    if retry_after:
+        COMMANDS.labels(name, 'rate_limited').inc()
+        raise RateLimited(retry_after)
+    return True
 
-# Initialize the scraper
-scraper = QuestionScraper()
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+@bot.after_invoke
+async def record_command_metrics(ctx):
+    name = ctx.command.qualified_name
+    COMMAND_SECONDS.labels(name).observe(time.perf_counter() - ctx.started_at)
+    COMMANDS.labels(name, 'error' if ctx.command_failed else 'ok').inc()
 
 @bot.event
 async def on_ready():
-    print(f'{bot.user} has connected to Discord!')
-    print(f'Bot is in {len(bot.guilds)} guilds')
+    logger.info("%s has connected to Discord", bot.user, extra={'guilds': len(bot.guilds)})
+    
+    # Keep the question cache warm in the background
+    scraper.start_background_refresh()
+    
+    if METRICS_ENABLED:
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            logger.error("Could not start metrics server on port %s: %s", metrics_server.port, e)
     
     # Set bot status
     status = random.choice(STATUS_MESSAGES)
     await bot.change_presence(activity=discord.Game(name=status))
 
-@bot.command(name='truth')
-async def truth(ctx):
-    """Get a random truth question"""
-    async with ctx.typing():
-        question, category = await scraper.get_random_question('truth')
-        if question:
-            embed = discord.Embed(
-                title="🤔 Truth Question",
-                description=question,
-                color=EMBED_COLORS['truth']
+# Embed templates per question category, built once; the second title is used by !random
+EMBED_TITLES = {
+    'truth': ("🤔 Truth Question", "🤔 Random Truth Question"),
+    'dare': ("🎯 Dare Challenge", "🎯 Random Dare Challenge"),
+    'would_you_rather': ("🤷 Would You Rather", "🤷 Random Would You Rather"),
+}
+EMBED_TEMPLATES = {
+    (category, is_random): discord.Embed(title=titles[is_random], color=EMBED_COLORS[category]).to_dict()
+    for category, titles in EMBED_TITLES.items()
+    for is_random in (False, True)
+}
+
+def question_embed(category, question, author, is_random=False, tag=None):
+    """Fill in the embed template of a category with a question"""
+    footer = f"Requested by {author.display_name}"
+    if tag:
+        footer += f" • #{tag}"
+    return discord.Embed.from_dict({
+        **EMBED_TEMPLATES[(category, is_random)],
+        'description': question,
+        'footer': {'text': footer}
+    })
+
+async def send_question(ctx, category, description, tag=None):
+    """Answer a question command with one message.
+    
+    Questions already in memory are sent straight away, as the interaction
+    response for slash commands. Only when the category still has to be
+    scraped is the typing indicator shown (or, for a slash command, the
+    response deferred), since that is an extra API call per command.
+    Questions with a tag the server has turned off are never sent.
+    """
+    tag = normalize_tag(tag) if tag else None
+    exclude = scraper.get_guild_excluded_tags(ctx.guild.id) if ctx.guild else frozenset()
+    if tag in exclude:
+        await ctx.send(f"❌ '{tag}' questions are turned off in this server.")
+        return
+    
+    question, category_picked = scraper.peek_random_question(category, ctx.channel.id, tag, exclude)
+    if question is None:
+        # For slash commands ctx.typing() defers the interaction response
+        async with ctx.typing():
+            question, category_picked = await scraper.get_random_question(
+                category_picked, ctx.channel.id, tag, exclude
             )
-            embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-            await ctx.send(embed=embed)
-        else:
-            await ctx.send("Sorry, I couldn't get a truth question right now. Try again later!")
+    
+    if question:
+        scraper.record_demand(category_picked, ctx.guild.id if ctx.guild else None)
+        await ctx.send(embed=question_embed(category_picked, question, ctx.author, category is None, tag))
+    elif tag:
+        available = [name for name in scraper.get_tags(category) if name not in exclude]
+        hint = f" Try one of: {', '.join(available)}" if available else ""
+        await ctx.send(f"Sorry, I couldn't find {description} tagged '{tag}'.{hint}")
+    else:
+        await ctx.send(f"Sorry, I couldn't get {description} right now. Try again later!")
+
+TAG_DESCRIPTION = "Only questions with this tag, e.g. funny or couples"
+
+@bot.hybrid_command(name='truth')
+@app_commands.describe(tag=TAG_DESCRIPTION)
+async def truth(ctx, tag: Optional[str] = None):
+    """Get a random truth question"""
+    await send_question(ctx, 'truth', "a truth question", tag)
 
-@bot.command(name='dare')
-async def dare(ctx):
+@bot.hybrid_command(name='dare')
+@app_commands.describe(tag=TAG_DESCRIPTION)
+async def dare(ctx, tag: Optional[str] = None):
     """Get a random dare question"""
-    async with ctx.typing():
-        question, category = await scraper.get_random_question('dare')
-        if question:
-            embed = discord.Embed(
-                title="🎯 Dare Challenge",
-                description=question,
-                color=EMBED_COLORS['dare']
-            )
-            embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-            await ctx.send(embed=embed)
-        else:
-            await ctx.send("Sorry, I couldn't get a dare question right now. Try again later!")
+    await send_question(ctx, 'dare', "a dare question", tag)
 
-@bot.command(name='would_you_rather')
-async def would_you_rather(ctx):
+@bot.hybrid_command(name='would_you_rather')
+@app_commands.describe(tag=TAG_DESCRIPTION)
+async def would_you_rather(ctx, tag: Optional[str] = None):
     """Get a random 'Would You Rather' question"""
-    async with ctx.typing():
-        question, category = await scraper.get_random_question('would_you_rather')
-        if question:
-            embed = discord.Embed(
-                title="🤷 Would You Rather",
-                description=question,
-                color=EMBED_COLORS['would_you_rather']
-            )
-            embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-            await ctx.send(embed=embed)
-        else:
-            await ctx.send("Sorry, I couldn't get a 'Would You Rather' question right now. Try again later!")
+    await send_question(ctx, 'would_you_rather', "a 'Would You Rather' question", tag)
 
-@bot.command(name='random')
-async def random_question(ctx):
+@bot.hybrid_command(name='random')
+@app_commands.describe(tag=TAG_DESCRIPTION)
+async def random_question(ctx, tag: Optional[str] = None):
     """Get a random question of any type"""
-    async with ctx.typing():
-        question, category = await scraper.get_random_question()
-        if question:
-            # Create appropriate embed based on category
-            if category == 'truth':
-                title = "🤔 Random Truth Question"
-                color = EMBED_COLORS['truth']
-            elif category == 'dare':
-                title = "🎯 Random Dare Challenge"
-                color = EMBED_COLORS['dare']
-            else:
-                title = "🤷 Random Would You Rather"
-                color = EMBED_COLORS['would_you_rather']
-            
-            embed = discord.Embed(
-                title=title,
-                description=question,
-                color=color
-            )
-            embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-            await ctx.send(embed=embed)
+    await send_question(ctx, None, "a random question", tag)
+
+@bot.hybrid_command(name='dirty')
+@commands.guild_only()
+@commands.has_guild_permissions(manage_guild=True)
+@app_commands.describe(allowed="Whether questions from dirty sources may be shown here")
+async def dirty_setting(ctx, allowed: bool):
+    """Allow or hide dirty questions in this server"""
+    excluded = set(scraper.get_guild_excluded_tags(ctx.guild.id))
+    if allowed:
+        excluded.discard('dirty')
+    else:
+        excluded.add('dirty')
+    scraper.set_guild_excluded_tags(ctx.guild.id, excluded)
+    state = "allowed" if allowed else "hidden"
+    await ctx.send(f"✅ Dirty questions are now {state} in this server.")
+
+# Game sessions: each channel's game is shown in one message, updated in place as it goes
+GAME_BUTTONS = {
+    'join': ("Join", discord.ButtonStyle.success),
+    'leave': ("Leave", discord.ButtonStyle.secondary),
+    'start': ("Start", discord.ButtonStyle.primary),
+    'truth': ("Truth", discord.ButtonStyle.success),
+    'dare': ("Dare", discord.ButtonStyle.danger),
+    'would_you_rather': ("Would You Rather", discord.ButtonStyle.primary),
+    'random': ("🎲 Random", discord.ButtonStyle.secondary),
+    'done': ("Done", discord.ButtonStyle.success),
+    'skip': ("Skip", discord.ButtonStyle.secondary),
+}
+GAME_PHASE_BUTTONS = {
+    LOBBY: ('join', 'leave', 'start'),
+    CHOOSING: ('truth', 'dare', 'would_you_rather', 'random', 'skip'),
+    ANSWERING: ('done', 'skip'),
+}
+GAME_END_REASONS = {
+    'ended': "The host ended the game.",
+    'expired': "The game timed out.",
+    'not_enough_players': "Not enough players are left.",
+}
+
+class GameButton(discord.ui.DynamicItem[discord.ui.Button], template=rf"game:(?P<action>{'|'.join(GAME_BUTTONS)})"):
+    """A game button, dispatched by its custom ID.
+    
+    The game is looked up by channel, so one registered class handles the
+    buttons of every game and discord.py keeps no view or timeout task per
+    message. Presses on an old message are checked against the game's
+    current state like any other.
+    """
+    
+    def __init__(self, action):
+        label, style = GAME_BUTTONS[action]
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=f"game:{action}"))
+        self.action = action
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['action'])
+    
+    async def callback(self, interaction):
+        await game_action(interaction, self.action)
+
+# One view per phase, built on first use and shared by every game
+_game_views = {}
+
+def game_view(session):
+    """The buttons of a game's current phase, or None once it has ended"""
+    if session.phase not in GAME_PHASE_BUTTONS:
+        return None
+    view = _game_views.get(session.phase)
+    if view is None:
+        view = discord.ui.View(timeout=None)
+        for action in GAME_PHASE_BUTTONS[session.phase]:
+            view.add_item(GameButton(action))
+        _game_views[session.phase] = view
+    return view
+
+def game_embed(session, note=None):
+    """Show a game's current state; `note` says what just happened, e.g. a turn timing out"""
+    if session.phase == ANSWERING:
+        embed = discord.Embed.from_dict({
+            **EMBED_TEMPLATES[(session.category, False)],
+            'description': session.question or "Drawing a question...",
+            'footer': {'text': f"Round {session.round} • Press Done once you've answered"}
+        })
+        embed.add_field(name="Player", value=f"<@{session.current_player}>")
+    elif session.phase == CHOOSING:
+        embed = discord.Embed(
+            title=f"🎲 Round {session.round}",
+            description=f"<@{session.current_player}>, truth or dare?",
+            color=EMBED_COLORS['random']
+        )
+        embed.set_footer(text=f"{game_manager.turn_seconds}s to choose and answer")
+    elif session.phase == LOBBY:
+        embed = discord.Embed(
+            title="🎲 Truth or Dare",
+            description=f"<@{session.host_id}> started a game! Press Join to play.",
+            color=EMBED_COLORS['random']
+        )
+        embed.add_field(name=f"Players ({len(session.players)})", value=' '.join(f"<@{p}>" for p in session.players))
+        embed.set_footer(text=f"Starts in {game_manager.join_seconds}s, or when the host presses Start")
+    else:
+        embed = discord.Embed(
+            title="🏁 Game Over",
+            description=GAME_END_REASONS[session.end_reason],
+            color=EMBED_COLORS['random']
+        )
+        embed.set_footer(text=f"Rounds played: {session.round}")
+    if note:
+        embed.description = f"{note}\n{embed.description}"
+    return embed
+
+async def announce_game_timeout(session, reason):
+    """Update a game's message after its lobby closed, a turn ran out of time or it expired"""
+    if session.message is None:
+        return
+    note = "⏰ Time's up, next player!" if reason == 'turn_timeout' else None
+    try:
+        await session.message.edit(embed=game_embed(session, note), view=game_view(session))
+    except discord.HTTPException as e:
+        logger.warning("Could not update game message: %s", e, extra={'channel': session.channel_id})
+
+game_manager = GameManager(on_timeout=announce_game_timeout)
+
+async def game_action(interaction, action):
+    """Apply a button press to the channel's game and update its message"""
+    channel_id, user_id = interaction.channel_id, interaction.user.id
+    try:
+        if action == 'join':
+            session = game_manager.join(channel_id, user_id)
+        elif action == 'leave':
+            session = game_manager.leave(channel_id, user_id)
+        elif action == 'start':
+            session = game_manager.start(channel_id, user_id)
+        elif action in ('done', 'skip'):
+            session = game_manager.finish_turn(channel_id, user_id)
         else:
-            await ctx.send("Sorry, I couldn't get a random question right now. Try again later!")
+            session = game_manager.choose(channel_id, user_id, None if action == 'random' else action)
+    except GameError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+    
+    session.message = interaction.message
+    if session.phase != ANSWERING:
+        await interaction.response.edit_message(embed=game_embed(session), view=game_view(session))
+        return
+    
+    # Draw the question like a command would, deferring only if the category has to be scraped
+    exclude = scraper.get_guild_excluded_tags(interaction.guild_id) if interaction.guild_id else frozenset()
+    category = session.category
+    question, _ = scraper.peek_random_question(category, channel_id, None, exclude)
+    if question is None:
+        await interaction.response.defer()
+        question, _ = await scraper.get_random_question(category, channel_id, None, exclude)
+    # The turn may have timed out while the question was being scraped
+    if question:
+        scraper.record_demand(category, interaction.guild_id)
+    if session.phase == ANSWERING and session.category == category:
+        session.question = question or "Sorry, I couldn't get a question right now. Press Skip to move on!"
+    if interaction.response.is_done():
+        await interaction.edit_original_response(embed=game_embed(session), view=game_view(session))
+    else:
+        await interaction.response.edit_message(embed=game_embed(session), view=game_view(session))
 
-@bot.command(name='stats')
+@bot.hybrid_group(name='game', fallback='start', invoke_without_command=True)
+@commands.guild_only()
+async def game(ctx):
+    """Start a truth or dare game in this channel"""
+    try:
+        session = game_manager.create(ctx.channel.id, ctx.author.id)
+    except GameError as e:
+        await ctx.send(f"❌ {e}")
+        return
+    session.message = await ctx.send(embed=game_embed(session), view=game_view(session))
+
+@game.command(name='end')
+@commands.guild_only()
+async def game_end(ctx):
+    """End the game in this channel (host only)"""
+    try:
+        session = game_manager.end(ctx.channel.id, ctx.author.id)
+    except GameError as e:
+        await ctx.send(f"❌ {e}")
+        return
+    await announce_game_timeout(session, 'ended')
+    await ctx.send("🏁 Game over, thanks for playing!")
+
+@bot.hybrid_command(name='stats')
 async def stats(ctx):
     """Show bot statistics"""
     cache_info = scraper.get_cache_info()
@@ -128,30 +425,149 @@ async def stats(ctx):
     cache_text = ""
     for category, info in cache_info.items():
         status = "✅ Fresh" if info['is_fresh'] else "🔄 Stale"
+        if info['refreshing']:
+            status += ", refreshing"
+        elif info['last_refresh_seconds'] is not None:
+            status += f", refreshed in {info['last_refresh_seconds']:.1f}s"
+        if info['last_added'] is not None:
+            status += f", +{info['last_added']}/-{info['last_removed']}"
+        if info['sources_in_grace']:
+            status += f", {info['sources_in_grace']} sources kept from last good scrape"
+        skipped = sum(1 for source in info['sources'].values() if source['state'] != 'closed')
+        if skipped:
+            status += f", {skipped}/{len(info['sources'])} sources backing off"
         cache_text += f"{category.title()}: {info['question_count']} questions ({status})\n"
     
     if cache_text:
         embed.add_field(name="Cache Status", value=cache_text, inline=False)
     
+    # Add question corpus size
+    corpus_info = scraper.get_corpus_info()
+    embed.add_field(
+        name="Question Corpus",
+        value=(
+            f"{corpus_info['question_count']} unique questions "
+            f"({corpus_info['near_duplicates_merged']} near-duplicates merged) • "
+            f"{corpus_info['total_bytes'] // 1024} KB "
+            f"({corpus_info['bytes_per_10k'] // 1024} KB per 10k) + "
+            f"{corpus_info['near_duplicate_bytes'] // 1024} KB near-duplicate index"
+        ),
+        inline=False
+    )
+    
+    # Add latency and failure summary
+    perf = scraper.get_performance_info()
+    
+    def ms(seconds):
+        return "n/a" if seconds is None else f"{seconds * 1000:.0f}ms"
+    
+    embed.add_field(
+        name="Performance (p95)",
+        value=(
+            f"Command: {ms(COMMAND_SECONDS.quantile(0.95))} • "
+            f"Lookup: {ms(perf['lookup_p95_seconds'])}\n"
+            f"Scrape: {ms(perf['scrape_p95_seconds'])} • "
+            f"Parse: {ms(perf['parse_p95_seconds'])} • "
+            f"Failures: {perf['scrape_failure_rate']:.0%} of {perf['scrape_count']}"
+        ),
+        inline=False
+    )
+    
+    # Add page download / revalidation counters
+    http_stats = scraper.get_http_stats()
+    embed.add_field(
+        name="Page Cache",
+        value=(
+            f"Hits: {http_stats['hits']} • Misses: {http_stats['misses']} • "
+            f"304s: {http_stats['not_modified']} • Errors: {http_stats['errors']}\n"
+            f"Downloaded: {http_stats['bytes_downloaded'] // 1024} KB • "
+            f"Saved: {http_stats['bytes_saved'] // 1024} KB"
+        ),
+        inline=False
+    )
+    
+    # Add rate limiting and refresh coalescing counters
+    refresh_stats = scraper.manual_refresh_stats
+    embed.add_field(
+        name="Rate Limits",
+        value=(
+            f"Rejected: {user_limiter.rejected + guild_limiter.rejected} "
+            f"({user_limiter.rejected} user, {guild_limiter.rejected} server) • "
+            f"Refreshes: {refresh_stats['started']} run, {refresh_stats['coalesced']} coalesced"
+        ),
+        inline=False
+    )
+    
+    # Add recent demand per category and the refresh request budget
+    demand = scraper.get_demand_info()
+    rates = " • ".join(
+        f"{category.replace('_', ' ').title()}: {rate:.0f}/h"
+        for category, rate in sorted(demand['requests_per_hour'].items())
+    )
+    embed.add_field(
+        name="Demand",
+        value=(
+            f"{rates or 'No requests yet'}\n"
+            f"Refresh budget: {demand['budget_remaining']}/{demand['budget_per_hour']} pages left this hour • "
+            f"Deferred: {demand['refreshes_deferred']}"
+        ),
+        inline=False
+    )
+    
+    # Add sources whose circuit breaker is open or probing
+    source_health = scraper.get_source_health()
+    unhealthy = {url: health for url, health in source_health.items() if health['state'] != 'closed'}
+    health_text = f"{len(source_health) - len(unhealthy)}/{len(source_health)} sources healthy"
+    for url, health in sorted(unhealthy.items())[:5]:
+        retry = f"retry in {health['retry_in_seconds']}s" if health['state'] == 'open' else "probing"
+        parts = urlsplit(url)
+        health_text += f"\n⛔ {parts.netloc}{parts.path}: {health['consecutive_failures']} failures, {retry}"
+    if source_health:
+        embed.add_field(name="Source Health", value=health_text, inline=False)
+    
+    # Add game session counters
+    game_stats = game_manager.stats
+    embed.add_field(
+        name="Games",
+        value=(
+            f"Running: {len(game_manager)} • Started: {game_stats['started']} • "
+            f"Turns: {game_stats['turns']} ({game_stats['turn_timeouts']} timed out) • "
+            f"Expired: {game_stats['expired']}"
+        ),
+        inline=False
+    )
+    
     embed.set_footer(text="Truth and Truth Bot")
     await ctx.send(embed=embed)
 
-@bot.command(name='refresh')
+@bot.hybrid_command(name='refresh')
 async def refresh_cache(ctx):
     """Refresh the question cache"""
-    async with ctx.typing():
-        await scraper.refresh_cache()
-        embed = discord.Embed(
-            title="🔄 Cache Refreshed",
-            description="The question cache has been refreshed!",
-            color=EMBED_COLORS['random']
-        )
-        embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-        await ctx.send(embed=embed)
+    # Current questions keep being served while every category is rebuilt
+    if scraper.request_refresh():
+        deferred = scraper.manual_refresh_deferred
+        if not deferred:
+            description = "Fetching fresh questions in the background!"
+        elif len(deferred) < len(scraper.sources):
+            names = ', '.join(category.replace('_', ' ').title() for category in deferred)
+            description = (f"Fetching fresh questions in the background! The hourly refresh budget has run out "
+                           f"for {names}, which will be refreshed once it refills.")
+        else:
+            description = "The hourly refresh budget has run out, questions will be refreshed once it refills."
+    else:
+        description = "A refresh is already in progress, new questions are on their way!"
+    embed = discord.Embed(
+        title="🔄 Cache Refreshing",
+        description=description,
+        color=EMBED_COLORS['random']
+    )
+    embed.set_footer(text=f"Requested by {ctx.author.display_name}")
+    await ctx.send(embed=embed)
 
-@bot.command(name='info')
+@bot.hybrid_command(name='info')
 async def info_command(ctx):
     """Show help information"""
+    prefix = COMMAND_PREFIX if PREFIX_COMMANDS_ENABLED else '/'
     embed = discord.Embed(
         title="🎮 Truth and Truth Bot - Help",
         description="Get random questions to spice up your conversations!",
@@ -159,14 +575,17 @@ async def info_command(ctx):
     )
     embed.add_field(
         name="Commands",
-        value="""
-        `!truth` - Get a random truth question
-        `!dare` - Get a random dare challenge
-        `!would_you_rather` - Get a random "Would You Rather" question
-        `!random` - Get a random question of any type
-        `!stats` - Show bot statistics
-        `!refresh` - Refresh the question cache
-        `!info` - Show this help message
+        value=f"""
+        `{prefix}truth [tag]` - Get a random truth question, e.g. `{prefix}truth funny`
+        `{prefix}dare [tag]` - Get a random dare challenge
+        `{prefix}would_you_rather [tag]` - Get a random "Would You Rather" question
+        `{prefix}random [tag]` - Get a random question of any type
+        `{prefix}game` - Start a game where players take turns, `{prefix}game end` to stop it
+        `{prefix}dirty on|off` - Allow or hide dirty questions (Manage Server)
+        `{prefix}stats` - Show bot statistics
+        `{prefix}refresh` - Refresh the question cache
+        `{prefix}info` - Show this help message
+        Every command is also available as a slash command.
         """,
         inline=False
     )
@@ -187,21 +606,30 @@ async def info_command(ctx):
 async def on_command_error(ctx, error):
     if isinstance(error, commands.CommandNotFound):
         await ctx.send("❌ Command not found! Use `!info` to see available commands.")
+    elif isinstance(error, RateLimited):
+        await ctx.send(
+            f"⏳ Slow down! Try again in {error.retry_after:.1f}s.",
+            delete_after=min(error.retry_after, 10),
+            ephemeral=True
+        )
+    elif isinstance(error, commands.NoPrivateMessage):
+        await ctx.send("❌ This command only works in a server!")
     elif isinstance(error, commands.MissingPermissions):
         await ctx.send("❌ You don't have permission to use this command!")
     else:
         await ctx.send(f"❌ An error occurred: {error}")
 
-# Cleanup on bot shutdown
-@bot.event
-async def on_close():
-    await scraper.close()
-
 # Run the bot
 if __name__ == "__main__":
-    if not BOT_TOKEN:
-        print("Error: DISCORD_TOKEN not found in environment variables!")
-        print("Please create a .env file with your Discord bot token.")
-        print("See .env.example for reference.")
-    else:
-        bot.run(BOT_TOKEN) 
\ No newline at end of file
+    log_listener = setup_logging()
+    try:
+        if not BOT_TOKEN:
+            logger.error(
+                "DISCORD_TOKEN not found in environment variables! "
+                "Please create a .env file with your Discord bot token. See .env.example for reference."
+            )
+        else:
+            # discord.py logs through the JSON pipeline instead of installing its own handler
+            bot.run(BOT_TOKEN, log_handler=None)
+    finally:
+        log_listener.stop() 
\ No newline at end of file
@@ -0,0 +1,114 @@
+import re
+from config import FILTER_WORDS, QUESTION_INDICATORS
+
+MIN_QUESTION_LENGTH = 10
+MAX_QUESTION_LENGTH = 500
+# Filter words this long also match the start of a longer word ('subscribe' in 'subscribers').
+# Shorter ones would catch unrelated words that way ('ad' in 'adventure'), so they only take a plural.
+FILTER_PREFIX_LENGTH = 4
+
+
+def _trie_pattern(node, end=None, depth=0):
+    """Regex for the branches below one trie node, with end(length) after each phrase if given"""
+    branches = []
+    for char, child in sorted(node.items()):
+        if char:
+            branches.append((r'\s+' if char == ' ' else re.escape(char)) + _trie_pattern(child, end, depth + 1))
+    if '' in node and end is not None:
+        # '' marks a phrase ending here; longer phrases are tried first
+        branches.append(end(depth))
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    # Without an end a phrase ending here makes the rest optional
+    return f'(?:{pattern})?' if '' in node and end is None else pattern
+
+
+def compile_phrases(phrases, whole_words=True, prefix_length=None):
+    """Compile words and phrases into one regex shaped like a trie.
+
+    Factoring shared prefixes keeps the regex engine from retrying every
+    phrase at every position, and starting each branch with a plain literal
+    lets it skip ahead to characters that can begin a match. With
+    `whole_words` the left word boundary is a lookbehind placed after that
+    first literal (a leading \\b would disable the skip-ahead), and the right
+    one is a (?!\\w) after each phrase; without it phrases match anywhere,
+    even inside a word. With `prefix_length`, phrases at least that long
+    may also start a longer word, and shorter ones may take a plural 's'
+    or 'es'. Any whitespace is accepted between the words of a phrase.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in ' '.join(phrase.lower().split()):
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    if not whole_words:
+        return re.compile(_trie_pattern(trie))
+
+    def end(length):
+        if prefix_length is None:
+            return r'(?!\w)'
+        return '' if length >= prefix_length else r'(?:e?s)?(?!\w)'
+
+    branches = []
+    for char, child in sorted(trie.items()):
+        if char:
+            first = re.escape(char)
+            branches.append(rf'{first}(?<!\w{first}){_trie_pattern(child, end, 1)}')
+    return re.compile(f"(?:{'|'.join(branches)})")
+
+
+class QuestionClassifier:
+    """Decides whether scraped text is a question.
+
+    The filter words and question indicators are each compiled once into a
+    regex. Filter words only match at the start of a word, so 'ad' rejects
+    "Buy an ad" but not "road" or "already". Words of FILTER_PREFIX_LENGTH
+    letters or more also match inflected forms ('cookies', 'subscribers');
+    shorter ones only their plural ('ads'). Indicators still match anywhere, as
+    before: dares rarely end with '?', and most are only recognised by an
+    indicator inside a word ('how' in "Show the group..."). A text is a
+    question when it has no filter word and either ends with '?' or
+    contains an indicator.
+    """
+
+    def __init__(self, filter_words=FILTER_WORDS, indicators=QUESTION_INDICATORS):
+        self._filter = compile_phrases(filter_words, prefix_length=FILTER_PREFIX_LENGTH)
+        self._indicators = compile_phrases(indicators, whole_words=False)
+
+    def is_question(self, text):
+        """Check if a single scraped text is a valid question"""
+        if not text or len(text) < MIN_QUESTION_LENGTH or len(text) > MAX_QUESTION_LENGTH:
+            return False
+
+        text_lower = text.lower()
+        if self._filter.search(text_lower):
+            return False
+
+        return text.rstrip().endswith('?') or self._indicators.search(text_lower) is not None
+
+    def classify(self, texts):
+        """Classify a batch of texts, returning one bool per text"""
+        filter_search = self._filter.search
+        indicator_search = self._indicators.search
+        results = []
+        for text in texts:
+            if not text or len(text) < MIN_QUESTION_LENGTH or len(text) > MAX_QUESTION_LENGTH:
+                results.append(False)
+                continue
+            text_lower = text.lower()
+            results.append(
+                filter_search(text_lower) is None
+                and (text.rstrip().endswith('?') or indicator_search(text_lower) is not None)
+            )
+        return results
+
+
+default_classifier = QuestionClassifier()
+
+
+def is_valid_question(text):
+    """Check if a scraped text is a valid question"""
+    return default_classifier.is_question(text)
@@ -7,12 +7,92 @@ load_dotenv()
 # Bot Configuration
 BOT_TOKEN = os.getenv('DISCORD_TOKEN')
 COMMAND_PREFIX = '!'
+# Prefix commands need the privileged message content intent. With them off the
+# bot only answers slash commands and receives no message events at all.
+PREFIX_COMMANDS_ENABLED = os.getenv('PREFIX_COMMANDS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SYNC_APP_COMMANDS = os.getenv('SYNC_APP_COMMANDS', 'true').lower() in ('1', 'true', 'yes')  # Register slash commands on startup
 
 # Web Scraping Configuration
 REQUEST_TIMEOUT = 10
 MAX_QUESTIONS_PER_SOURCE = 50
 CACHE_DURATION_HOURS = 1
 
+# Background refresh settings
+REFRESH_AHEAD_MINUTES = 5       # Rebuild a category this long before its cache expires
+REFRESH_CHECK_INTERVAL = 60     # Seconds between background refresher checks
+
+# Predictive refreshes: requests are counted per category and server, and categories due for
+# a rebuild are refreshed busiest and closest to expiry first, within an outbound page budget
+DEMAND_HALF_LIFE_MINUTES = 30   # Requests count half as much towards demand after this long
+REFRESH_REQUEST_BUDGET = 240    # Source pages rebuilds may request per hour before background and stale refreshes wait
+PREFETCH_GUILDS = 20            # Busiest servers per category whose filtered question sets are built after a refresh
+
+# Concurrent scraping limits
+MAX_CONCURRENT_REQUESTS = 8     # In-flight requests across all hosts on the shared session
+MAX_REQUESTS_PER_HOST = 3       # In-flight requests to any single website
+MIN_QUESTIONS_PER_CATEGORY = 100  # A command waiting on an empty category gets it once this many are in; slower sources are added later
+
+# Incremental refreshes: a source that fails, or suddenly yields far fewer questions,
+# keeps its last good questions in the pool for a grace period
+SOURCE_GRACE_HOURS = 24         # How long the last good questions of a failing source are kept
+SOURCE_SHRINK_LIMIT = 0.5       # Fetches with less than this fraction of the last good count count as bad
+
+# Per-source circuit breaker and adaptive timeouts
+HEALTH_WINDOW = 20                  # Recent requests per source used for latency and error rate
+BREAKER_FAILURE_THRESHOLD = 3       # Consecutive failures before a source is skipped
+BREAKER_BASE_BACKOFF_SECONDS = 60   # First skip window, doubled each time the source fails again
+BREAKER_MAX_BACKOFF_SECONDS = 1800  # Longest skip window
+ADAPTIVE_TIMEOUT_MULTIPLIER = 3     # Source timeout is its p95 latency times this...
+ADAPTIVE_TIMEOUT_MIN_SECONDS = 2    # ...but never below this or above REQUEST_TIMEOUT
+
+# HTML parsing workers, so large pages never block the Discord event loop
+PARSE_EXECUTOR = os.getenv('PARSE_EXECUTOR', 'thread')  # 'thread' or 'process'
+PARSE_WORKERS = 2               # Pages parsed at the same time
+PARSE_QUEUE_DEPTH = 8           # Pages allowed to wait for a worker before scrapes are held back
+
+# Command rate limits as (burst, commands per minute), per command name
+USER_RATE_LIMIT = (5, 12)       # For each user
+GUILD_RATE_LIMIT = (30, 120)    # For each server, shared by its members
+
+# Channels that keep their own no-repeat question deck (least recently used are dropped)
+SAMPLER_MAX_CHANNELS = 1000
+
+# Game sessions (`!game`): players in a channel take turns choosing truth, dare or would you rather
+GAME_JOIN_SECONDS = 120         # The lobby starts by itself after this long if enough players joined
+GAME_TURN_SECONDS = 90          # Time a player has to choose and answer before their turn is skipped
+GAME_IDLE_MINUTES = 10          # Games nobody has pressed a button in for this long are ended
+GAME_MIN_PLAYERS = 2
+GAME_MAX_PLAYERS = 25
+GAME_MAX_SESSIONS = 10000       # Games running at once across all channels
+
+# Prometheus-style metrics, served on http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+# Logging: JSON lines on stdout, written by a background thread so logging never blocks
+# the event loop. Warnings about one URL are rate limited as (burst, records per minute).
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_URL_RATE_LIMIT = (3, 2)
+
+# Local database of scraped questions, reloaded on startup (set to an empty value to disable)
+QUESTION_STORE_PATH = os.getenv('QUESTION_STORE_PATH', 'questions.db')
+
+# Question packs (see packs.py). Every pack in QUESTION_PACKS_DIR is loaded as a question
+# source next to the websites below; the fallback pack is served when scraping fails.
+PACKS_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'packs')
+QUESTION_PACKS_DIR = os.getenv('QUESTION_PACKS_DIR', PACKS_ROOT)
+FALLBACK_PACK_PATH = os.path.join(PACKS_ROOT, 'fallback.jsonl')
+PACK_LOAD_SLICE_MS = 5          # Longest the event loop loads a pack before yielding
+
+# Deployment: 'standalone' scrapes inside the bot process. 'shard' runs an AutoShardedBot
+# that serves the questions `python refresher.py` publishes to QUESTION_STORE_PATH, so
+# several bot processes share one scraper.
+BOT_RUN_MODE = os.getenv('BOT_RUN_MODE', 'standalone')
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None  # Default: Discord's recommendation
+SHARD_IDS = [int(shard) for shard in os.getenv('SHARD_IDS', '').split(',') if shard.strip()] or None  # Shards this process runs
+SHARED_POLL_INTERVAL = 15       # Seconds between checks for newly published questions (shards and refresher)
+
 # User Agent for web scraping
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 
@@ -56,6 +136,31 @@ FILTER_WORDS = [
     'terms', 'conditions', 'copyright', 'all rights reserved'
 ]
 
+# Words and phrases that mark scraped text as a question
+QUESTION_INDICATORS = [
+    'what', 'when', 'where', 'who', 'why', 'how',
+    'would you', 'have you', 'do you', 'are you'
+]
+
+# Near-duplicate questions are merged across all sources when they are added to the
+# corpus. They are compared after case, punctuation and emoji are stripped and texting
+# shorthand is spelled out, so 'What's ur biggest fear? 😱' matches 'what is your biggest fear'
+NEAR_DUPLICATE_THRESHOLD = 0.75  # Character-shingle Jaccard similarity at which two questions are merged
+SHORTHAND_WORDS = {
+    'u': 'you', 'ur': 'your', 'r': 'are', 'y': 'why', 'n': 'and',
+    'bf': 'boyfriend', 'gf': 'girlfriend', 'pls': 'please', 'plz': 'please', 'whats': 'what is',
+}
+
+# Tags for filtered commands like `!truth funny`. Every word of a source URL's slug
+# that isn't listed here becomes a tag of its questions ('funny-truth-questions' -> funny)...
+SLUG_STOPWORDS = ['truth', 'dare', 'would', 'you', 'rather', 'questions', 'question', 'for', 'and', 'the', 'of', 'to']
+# ...and questions containing one of these words get the tag too
+TAG_KEYWORDS = {
+    'couples': ['boyfriend', 'girlfriend', 'partner', 'relationship', 'crush', 'first date'],
+    'dirty': ['sexy', 'naked', 'kinky', 'sex'],
+    'funny': ['funny', 'funniest', 'silly', 'weirdest'],
+}
+
 # Embed colors for different question types
 EMBED_COLORS = {
     'truth': 0x00ff00,      # Green
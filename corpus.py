@@ -0,0 +1,232 @@
+import hashlib
+import sys
+from array import array
+from dedup import NearDuplicateIndex, normalize_text
+
+# Slots of the previous index table moved into the current one per question added, so
+# growing the table never re-inserts every entry at once
+INDEX_MOVE_STEP = 8
+
+
+def content_hash(text):
+    """Non-zero 64-bit hash of a question's normalized content"""
+    digest = hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class QuestionCorpus:
+    """Every known question, deduplicated by content and addressed by integer ID.
+
+    Question texts live back to back in one UTF-8 buffer, with an offsets
+    array marking where each starts, instead of as one Python string per
+    question. The content-hash index is an open-addressing table held in
+    two more arrays rather than a dict of Python ints, so the corpus is a
+    handful of flat buffers. Adding text whose normalized content is
+    already known returns the existing ID, so the same question scraped
+    from several pages or categories is stored once. Unless
+    `near_duplicates` is False, text that is merely similar to a known
+    question (see dedup.NearDuplicateIndex) also resolves to it: the first
+    version seen stays the canonical one, and the variant's hash is indexed
+    too so seeing it again is a plain lookup. IDs are stable for the life
+    of the corpus; texts are never removed, and since refreshes mostly
+    re-add the same questions the buffer only grows with new ones.
+    """
+
+    def __init__(self, near_duplicates=True):
+        self._buffer = bytearray()
+        # Question i is self._buffer[self._offsets[i]:self._offsets[i + 1]]
+        self._offsets = array('Q', [0])
+        # Open-addressing index: slot -> content hash (0 = empty) and question ID
+        self._slot_hashes = array('Q', bytes(8 * 64))
+        self._slot_ids = array('I', bytes(4 * 64))
+        # Used slots, including near-duplicate variants pointing at a canonical ID
+        self._slots_used = 0
+        # The table before the last resize, read-only until all of its slots have been moved
+        self._old_hashes = self._old_ids = None
+        self._moved = 0
+        # Similar-question lookups (None when near_duplicates is False)
+        self.near_index = NearDuplicateIndex() if near_duplicates else None
+        self.near_duplicates_merged = 0
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _find_slot(self, key, hashes=None):
+        """Index of the slot holding `key`, or of the empty slot where it belongs"""
+        if hashes is None:
+            hashes = self._slot_hashes
+        mask = len(hashes) - 1
+        slot = key & mask
+        while True:
+            stored = hashes[slot]
+            if stored == key or stored == 0:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _grow_index(self):
+        """Double the index table; its entries are moved over a few at a time by _move_slots()"""
+        if self._old_hashes is not None:
+            self._move_slots(len(self._old_hashes))
+        self._old_hashes, self._old_ids = self._slot_hashes, self._slot_ids
+        self._moved = 0
+        self._slot_hashes = array('Q', bytes(16 * len(self._old_hashes)))
+        self._slot_ids = array('I', bytes(8 * len(self._old_ids)))
+
+    def _move_slots(self, count):
+        """Move up to `count` slots of the previous table into the current one"""
+        old_hashes, old_ids = self._old_hashes, self._old_ids
+        end = min(self._moved + count, len(old_hashes))
+        for old_slot in range(self._moved, end):
+            key = old_hashes[old_slot]
+            if key:
+                slot = self._find_slot(key)
+                self._slot_hashes[slot] = key
+                self._slot_ids[slot] = old_ids[old_slot]
+        self._moved = end
+        if end == len(old_hashes):
+            self._old_hashes = self._old_ids = None
+
+    def add(self, text):
+        """Add a question and return its ID, reusing the ID of an existing duplicate"""
+        key = content_hash(text)
+        slot = self._find_slot(key)
+        if self._slot_hashes[slot] == key:
+            return self._slot_ids[slot]
+        if self._old_hashes is not None:
+            old_slot = self._find_slot(key, self._old_hashes)
+            if self._old_hashes[old_slot] == key:
+                return self._old_ids[old_slot]
+
+        if self.near_index is not None:
+            qid, band_keys = self.near_index.find(text, self.get)
+        else:
+            qid = None
+        if qid is None:
+            qid = len(self)
+            self._buffer += text.encode('utf-8')
+            self._offsets.append(len(self._buffer))
+            if self.near_index is not None:
+                self.near_index.add(qid, band_keys)
+        else:
+            self.near_duplicates_merged += 1
+
+        self._slot_hashes[slot] = key
+        self._slot_ids[slot] = qid
+        self._slots_used += 1
+        if self._old_hashes is not None:
+            self._move_slots(INDEX_MOVE_STEP)
+        # Keep the table at most half full so probe sequences stay short
+        if 2 * self._slots_used > len(self._slot_hashes):
+            self._grow_index()
+        return qid
+
+    def add_many(self, texts):
+        """Add several questions, returning their IDs in order without duplicates"""
+        ids = array('I')
+        seen = set()
+        for text in texts:
+            qid = self.add(text)
+            if qid not in seen:
+                seen.add(qid)
+                ids.append(qid)
+        return ids
+
+    def get(self, qid):
+        """Get the text of a question by ID"""
+        return self._buffer[self._offsets[qid]:self._offsets[qid + 1]].decode('utf-8')
+
+    def get_many(self, ids):
+        """Get the texts of several questions"""
+        return [self.get(qid) for qid in ids]
+
+    def memory_usage(self):
+        """Approximate bytes held by the corpus, broken down by structure.
+
+        The near-duplicate index is reported on its own and isn't part of
+        `total_bytes` or `bytes_per_10k`, which cover the questions themselves.
+        """
+        usage = {
+            'text_bytes': sys.getsizeof(self._buffer),
+            'offset_bytes': sys.getsizeof(self._offsets),
+            'index_bytes': sum(sys.getsizeof(table) for table in (
+                self._slot_hashes, self._slot_ids, self._old_hashes, self._old_ids) if table is not None),
+        }
+        usage['total_bytes'] = sum(usage.values())
+        usage['bytes_per_10k'] = usage['total_bytes'] * 10_000 // len(self) if len(self) else 0
+        usage['near_duplicate_bytes'] = self.near_index.memory_usage() if self.near_index is not None else 0
+        return usage
+
+
+class SourceSnapshot:
+    """The last good set of question IDs scraped from one source URL"""
+
+    __slots__ = ('ids', 'fetched_at', 'failed_since')
+
+    def __init__(self, ids, fetched_at):
+        self.ids = ids
+        self.fetched_at = fetched_at
+        # When fetches of this source started failing, or None while it works
+        self.failed_since = None
+
+
+class CategoryPool:
+    """The questions of one category, as the union of its sources' last good snapshots.
+
+    Each question ID is reference-counted by the number of snapshots that
+    contain it, so replacing one source's snapshot only touches the IDs
+    that were added to or removed from that source, and a question shared
+    by two sources stays until both have dropped it.
+    """
+
+    def __init__(self):
+        self.snapshots = {}
+        # question ID -> number of snapshots containing it; insertion ordered
+        self._refcounts = {}
+
+    def __len__(self):
+        return len(self._refcounts)
+
+    def update(self, url, ids, fetched_at):
+        """Replace a source's snapshot, returning (added, removed) question counts for the category"""
+        for changes in self.update_steps(url, ids, fetched_at):
+            pass
+        return changes
+
+    def update_steps(self, url, ids, fetched_at, step=1000):
+        """Replace a source's snapshot like update(), yielding the (added, removed) counts so far
+        after every `step` IDs and once more when done, so a large one can be spread over several calls
+        """
+        old = self.snapshots.get(url)
+        old_ids = set(old.ids) if old else set()
+        new_ids = set(ids)
+        added = removed = 0
+        for done, qid in enumerate(ids, 1):
+            if qid not in old_ids:
+                count = self._refcounts.get(qid, 0)
+                self._refcounts[qid] = count + 1
+                added += not count
+            if not done % step:
+                yield added, removed
+        for done, qid in enumerate(old_ids - new_ids, 1):
+            count = self._refcounts[qid] - 1
+            if count:
+                self._refcounts[qid] = count
+            else:
+                del self._refcounts[qid]
+                removed += 1
+            if not done % step:
+                yield added, removed
+        self.snapshots[url] = SourceSnapshot(ids, fetched_at)
+        yield added, removed
+
+    def drop(self, url):
+        """Remove a source and its questions, returning (added, removed) like update()"""
+        if url not in self.snapshots:
+            return 0, 0
+        result = self.update(url, array('I'), 0)
+        del self.snapshots[url]
+        return result
+
+    def ids(self):
+        """IDs of every question in the category"""
+        return array('I', self._refcounts)
@@ -0,0 +1,259 @@
+import re
+import sys
+import unicodedata
+import zlib
+from array import array
+from difflib import SequenceMatcher
+from config import NEAR_DUPLICATE_THRESHOLD, SHORTHAND_WORDS
+
+# Characters per shingle when comparing normalized questions
+SHINGLE_SIZE = 4
+# MinHash signature layout: LSH_BANDS bands of LSH_ROWS values each. Pairs at the
+# default threshold (0.75) become candidates ~96% of the time, pairs at 0.5 ~55%.
+LSH_BANDS = 6
+LSH_ROWS = 3
+# Buckets holding more questions than this come from phrases many questions share
+# ('in front of your friends'), not near-duplicates, and are no longer searched
+LSH_MAX_BUCKET = 8
+# Slots of the previous band-key table moved into the current one per question added,
+# so growing the table never re-inserts every key at once
+LSH_MOVE_STEP = 32
+# How alike the words two near-duplicates don't share must be ('favourite'/'favorite').
+# Only words this long are compared that way, and only if their lengths differ by one
+# letter at most; shorter words ('fear'/'far') must match exactly.
+SPELLING_SIMILARITY = 0.8
+SPELLING_MIN_LENGTH = 5
+_EMPTY_BIN = 1 << 32
+
+_APOSTROPHES = re.compile(r"['’`]")
+# Punctuation, symbols and emoji: anything that isn't a letter, digit or space
+_NON_WORD = re.compile(r"[\W_]+")
+_NUMBER = re.compile(r"\d+")
+# Words most questions share. They are left out of the LSH signature, or every question
+# starting 'what is your' would land in the same buckets, but not out of verification.
+STOPWORDS = frozenset("""
+    a an the and or but if of to in on at for with about from by as into than then so
+    i me my you your yours he she him her his they them their we us our it its
+    is are was were be been being am do does did done have has had having will would
+    can could should shall may might must ever never not no
+    what when where who whom why how which that this these those there here
+""".split())
+# Words that turn a question around ('Have you ever...'/'Have you never...'). Two
+# questions that don't share all of them are never the same question.
+NEGATIONS = frozenset("""
+    no not never nobody nothing nowhere none neither nor
+    dont doesnt didnt cant cannot couldnt wont wouldnt shouldnt
+    isnt arent wasnt werent havent hasnt hadnt
+""".split())
+
+
+def normalize_text(text):
+    """Canonical form of a question for near-duplicate detection.
+
+    Case-folded, with apostrophes dropped ("don't" -> "dont"), other
+    punctuation and emoji turned into spaces and SHORTHAND_WORDS spelled
+    out ("ur" -> "your"), e.g. 'What's UR fave?? 😂' -> 'what is your fave'.
+    """
+    text = _APOSTROPHES.sub('', unicodedata.normalize('NFKC', text).casefold())
+    words = _NON_WORD.sub(' ', text).split()
+    return ' '.join(SHORTHAND_WORDS.get(word, word) for word in words)
+
+
+def shingles(normalized):
+    """Set of overlapping SHINGLE_SIZE-character substrings of normalized text"""
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def content_words(normalized):
+    """Normalized text without its STOPWORDS, or all of it if that leaves nothing"""
+    return ' '.join(word for word in normalized.split() if word not in STOPWORDS) or normalized
+
+
+def same_wording(a, b):
+    """Whether two normalized questions differ only in spelling, not in their words.
+
+    The words each has that the other lacks must be spellings of each other
+    ('favourite'/'favorite', 'best friend'/'bestfriend'), so swapping one
+    word for another ('boy'/'girl') keeps two questions apart however long
+    the sentence they share. Negations must match exactly, so 'ever' and
+    'never' are never taken for spellings of each other.
+    """
+    words_a, words_b = a.split(), b.split()
+    set_a, set_b = set(words_a), set(words_b)
+    only_a = [word for word in words_a if word not in set_b]
+    only_b = [word for word in words_b if word not in set_a]
+    if any(word in NEGATIONS for word in only_a + only_b):
+        return False
+    if ''.join(only_a) == ''.join(only_b):
+        return True
+
+    def spelled_alike(word, others):
+        return len(word) >= SPELLING_MIN_LENGTH and any(
+            len(other) >= SPELLING_MIN_LENGTH and abs(len(word) - len(other)) <= 1
+            and SequenceMatcher(None, word, other).ratio() >= SPELLING_SIMILARITY
+            for other in others
+        )
+    return all(spelled_alike(word, only_b) for word in only_a) and all(spelled_alike(word, only_a) for word in only_b)
+
+
+def jaccard(a, b):
+    """Jaccard similarity of two sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def signature(shingle_set, size=LSH_BANDS * LSH_ROWS):
+    """One-permutation MinHash signature of a shingle set.
+
+    Every shingle is hashed once and falls into one of `size` bins by its
+    hash, and each bin keeps its smallest value, which estimates Jaccard
+    similarity as well as `size` independent hash functions at 1/size of
+    the cost. Empty bins borrow the value of the next non-empty one so
+    short questions still fill every band.
+    """
+    bins = [_EMPTY_BIN] * size
+    for shingle in shingle_set:
+        # crc32 rather than hash() so signatures are the same in every process
+        value = zlib.crc32(shingle.encode('utf-8'))
+        index = value % size
+        value //= size
+        if value < bins[index]:
+            bins[index] = value
+    if _EMPTY_BIN in bins:
+        for i in range(size):
+            if bins[i] == _EMPTY_BIN:
+                step = 1
+                while bins[(i + step) % size] == _EMPTY_BIN:
+                    step += 1
+                # Offset by the distance so borrowed values differ from the original bin's
+                bins[i] = bins[(i + step) % size] + step
+    return bins
+
+
+class NearDuplicateIndex:
+    """Locality-sensitive hash index that finds near-duplicate questions in sublinear time.
+
+    Each question's MinHash signature is cut into LSH_BANDS bands, and the
+    questions sharing any band with a new one are its only candidates. A
+    lookup verifies at most LSH_BANDS * LSH_MAX_BUCKET of them however large
+    the corpus gets, though buckets fill up as the corpus grows, so lookups
+    get slower until they reach that bound. Candidates are then verified
+    against the exact Jaccard similarity of their shingles and with
+    same_wording(). Questions that mention different numbers are never
+    merged, since 'Would you rather have 1 kid or 5?' and '... 2 kids or 3?'
+    differ in the only part that matters.
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        # Open-addressing multimap like QuestionCorpus's index: slot -> 32-bit band key
+        # (0 = empty) and question ID. Equal keys sit in the same probe run, one per ID.
+        self._slot_keys = array('I', bytes(4 * 64))
+        self._slot_ids = array('I', bytes(4 * 64))
+        self._slots_used = 0
+        # The table before the last resize, read-only until all of its slots have been moved
+        self._old_keys = self._old_ids = None
+        self._moved = 0
+        # Lookups so far and the candidates they verified, to see how full buckets get
+        self.lookups = 0
+        self.candidates_checked = 0
+
+    def _band_keys(self, bins, numbers):
+        # The numbers are part of every key, so questions about different ones never meet
+        return [
+            hash((band, numbers, *bins[band * LSH_ROWS:(band + 1) * LSH_ROWS])) & 0xFFFFFFFF or 1
+            for band in range(LSH_BANDS)
+        ]
+
+    def _bucket(self, key):
+        """IDs stored under a band key"""
+        bucket = self._probe(self._slot_keys, self._slot_ids, key)
+        if self._old_keys is not None:
+            # Slots below self._moved are in the current table already
+            bucket += self._probe(self._old_keys, self._old_ids, key, self._moved)
+        return bucket
+
+    @staticmethod
+    def _probe(keys, ids, key, first=0):
+        """IDs stored under a band key in one table, in slots from `first` on"""
+        mask = len(keys) - 1
+        slot = key & mask
+        found = []
+        while keys[slot]:
+            if keys[slot] == key and slot >= first:
+                found.append(ids[slot])
+            slot = (slot + 1) & mask
+        return found
+
+    def _insert(self, key, qid):
+        keys = self._slot_keys
+        mask = len(keys) - 1
+        slot = key & mask
+        while keys[slot]:
+            slot = (slot + 1) & mask
+        keys[slot] = key
+        self._slot_ids[slot] = qid
+
+    def find(self, text, get_text):
+        """Look up a question among the indexed ones.
+
+        Returns (ID of its closest near-duplicate or None, band keys to pass
+        to add() if it turns out to be new). `get_text` maps an ID back to
+        the text to verify against.
+        """
+        normalized = normalize_text(text)
+        shingle_set = shingles(normalized)
+        numbers = tuple(_NUMBER.findall(normalized))
+        keys = self._band_keys(signature(shingles(content_words(normalized))), numbers)
+        candidates = set()
+        for key in keys:
+            bucket = self._bucket(key)
+            if len(bucket) <= LSH_MAX_BUCKET:
+                candidates.update(bucket)
+        self.lookups += 1
+        self.candidates_checked += len(candidates)
+
+        best, best_similarity = None, 0.0
+        for qid in sorted(candidates):
+            other = normalize_text(get_text(qid))
+            similarity = jaccard(shingle_set, shingles(other))
+            if similarity >= self.threshold and similarity > best_similarity and same_wording(normalized, other):
+                best, best_similarity = qid, similarity
+        return best, keys
+
+    def add(self, qid, keys):
+        """Index a new question under the band keys find() returned for it"""
+        for key in keys:
+            # Oversized buckets are never searched, so they don't need to grow either
+            if len(self._bucket(key)) <= LSH_MAX_BUCKET:
+                self._insert(key, qid)
+                self._slots_used += 1
+        if self._old_keys is not None:
+            self._move_slots(LSH_MOVE_STEP)
+        # Keep the table at most three quarters full so probe runs stay short
+        if 4 * self._slots_used > 3 * len(self._slot_keys):
+            if self._old_keys is not None:
+                self._move_slots(len(self._old_keys))
+            self._old_keys, self._old_ids = self._slot_keys, self._slot_ids
+            self._moved = 0
+            self._slot_keys = array('I', bytes(8 * len(self._old_keys)))
+            self._slot_ids = array('I', bytes(8 * len(self._old_ids)))
+
+    def _move_slots(self, count):
+        """Move up to `count` slots of the previous table into the current one"""
+        old_keys, old_ids = self._old_keys, self._old_ids
+        end = min(self._moved + count, len(old_keys))
+        for slot in range(self._moved, end):
+            if old_keys[slot]:
+                self._insert(old_keys[slot], old_ids[slot])
+        self._moved = end
+        if end == len(old_keys):
+            self._old_keys = self._old_ids = None
+
+    def memory_usage(self):
+        """Approximate bytes held by the band-key tables"""
+        return sum(sys.getsizeof(table) for table in (
+            self._slot_keys, self._slot_ids, self._old_keys, self._old_ids) if table is not None)
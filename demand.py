@@ -0,0 +1,89 @@
+import heapq
+import math
+import time
+from config import DEMAND_HALF_LIFE_MINUTES
+from ratelimit import SWEEP_INTERVAL
+
+# Server counters that have decayed below this many requests are dropped
+MIN_COUNT = 0.05
+
+
+class _Counter:
+    __slots__ = ('count', 'updated')
+
+    def __init__(self, count, updated):
+        self.count = count
+        self.updated = updated
+
+
+class DemandTracker:
+    """Recent request rates per category and per (server, category).
+
+    Each key keeps an exponentially decaying count of its requests: a
+    request adds one and the count halves every `half_life` seconds, so
+    rates follow what is being asked for now rather than all time. Server
+    counters are swept once they have decayed to almost nothing, so memory
+    only grows with the servers active recently.
+    """
+
+    def __init__(self, half_life=DEMAND_HALF_LIFE_MINUTES * 60):
+        self.half_life = half_life
+        self._decay = math.log(2) / half_life
+        self._categories = {}
+        self._guilds = {}
+        self._last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self._guilds)
+
+    def _count(self, counter, now):
+        return counter.count * math.exp(-self._decay * (now - counter.updated))
+
+    def _add(self, counters, key, now):
+        counter = counters.get(key)
+        if counter is None:
+            counters[key] = _Counter(1.0, now)
+        else:
+            counter.count = self._count(counter, now) + 1
+            counter.updated = now
+
+    def record(self, category, guild_id=None, now=None):
+        """Count a request for a question of `category`, from a server if it came from one"""
+        now = time.monotonic() if now is None else now
+        self._add(self._categories, category, now)
+        if guild_id is not None:
+            self._add(self._guilds, (guild_id, category), now)
+        if now - self._last_sweep >= SWEEP_INTERVAL:
+            self.evict_idle(now)
+
+    def rate(self, category, now=None):
+        """Recent requests per hour for a category"""
+        now = time.monotonic() if now is None else now
+        counter = self._categories.get(category)
+        if counter is None:
+            return 0.0
+        # A steady r requests a second settle at a count of r / decay
+        return self._count(counter, now) * self._decay * 3600
+
+    def top_guilds(self, category, limit, now=None):
+        """The servers asking for a category most, busiest first"""
+        now = time.monotonic() if now is None else now
+        counts = (
+            (self._count(counter, now), guild_id)
+            for (guild_id, name), counter in self._guilds.items() if name == category
+        )
+        return [guild_id for _, guild_id in heapq.nlargest(limit, counts)]
+
+    def evict_idle(self, now=None):
+        """Drop server counters that have decayed to almost nothing"""
+        now = time.monotonic() if now is None else now
+        idle = [key for key, counter in self._guilds.items() if self._count(counter, now) < MIN_COUNT]
+        for key in idle:
+            del self._guilds[key]
+        self._last_sweep = now
+        return len(idle)
+
+    def snapshot(self, now=None):
+        """Requests per hour of every category requested so far"""
+        now = time.monotonic() if now is None else now
+        return {category: self.rate(category, now) for category in self._categories}
@@ -0,0 +1,80 @@
+from lxml import etree, html as lxml_html
+from classifier import is_valid_question
+from config import MAX_QUESTIONS_PER_SOURCE
+
+# Elements whose text can hold a single question
+CANDIDATE_TAGS = {'li', 'p', 'h3', 'h4', 'h5', 'article', 'section'}
+CANDIDATE_CLASSES = {'question', 'truth-question', 'dare-question'}
+
+# Elements whose text is never shown to readers
+SKIP_TAGS = {'script', 'style', 'noscript', 'template'}
+
+
+def _is_candidate(element):
+    """Check if an element is one whose text could be a question"""
+    if element.tag in CANDIDATE_TAGS:
+        return True
+    if element.tag in ('div', 'span'):
+        classes = element.get('class')
+        return bool(classes) and not CANDIDATE_CLASSES.isdisjoint(classes.split())
+    return False
+
+
+def extract_questions(page, encoding=None, limit=MAX_QUESTIONS_PER_SOURCE):
+    """Extract the unique valid questions from a page of HTML in a single pass.
+
+    The tree is walked once, appending every text node to one flat list.
+    Each candidate element remembers where its text starts in that list, so
+    the text of the innermost candidates (the ones with no candidate inside
+    them) is joined exactly once. Containers like <article> or <section> are
+    only used when they don't wrap smaller candidates, which avoids calling
+    get_text() on the same nested text over and over.
+
+    `page` may be bytes (decoded with `encoding`, or the page's own charset)
+    or str. This is CPU-bound and meant to run off the event loop.
+    """
+    try:
+        if isinstance(page, bytes):
+            parser = lxml_html.HTMLParser(encoding=encoding) if encoding else None
+            root = lxml_html.document_fromstring(page, parser=parser)
+        else:
+            root = lxml_html.document_fromstring(page)
+    except (etree.ParserError, ValueError, LookupError):
+        # Empty documents, or an encoding lxml doesn't know
+        return []
+
+    chunks = []
+    # One frame per open element: [is_candidate, first chunk index, contains_candidate]
+    frames = []
+    skipping = 0
+    seen = set()
+    questions = []
+
+    for event, element in etree.iterwalk(root, events=('start', 'end')):
+        tag = element.tag if isinstance(element.tag, str) else None
+
+        if event == 'start':
+            frames.append([tag is not None and _is_candidate(element), len(chunks), False])
+            if tag in SKIP_TAGS:
+                skipping += 1
+            elif element.text and tag and not skipping:
+                chunks.append(element.text)
+            continue
+
+        candidate, start, contains_candidate = frames.pop()
+        if candidate and not contains_candidate:
+            text = ''.join(chunks[start:]).strip()
+            if text not in seen and is_valid_question(text):
+                seen.add(text)
+                questions.append(text)
+                if len(questions) >= limit:
+                    break
+        if frames and (candidate or contains_candidate):
+            frames[-1][2] = True
+
+        if tag in SKIP_TAGS:
+            skipping -= 1
+        if element.tail and not skipping:
+            chunks.append(element.tail)
+
+    return questions
@@ -0,0 +1,344 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import random
+import time
+from config import (
+    GAME_JOIN_SECONDS, GAME_TURN_SECONDS, GAME_IDLE_MINUTES,
+    GAME_MIN_PLAYERS, GAME_MAX_PLAYERS, GAME_MAX_SESSIONS
+)
+
+logger = logging.getLogger(__name__)
+
+# Session phases
+LOBBY = 'lobby'             # Players join until the host starts the game or the join window closes
+CHOOSING = 'choosing'       # The current player picks a category
+ANSWERING = 'answering'     # The current player answers their question
+ENDED = 'ended'
+
+CATEGORIES = ('truth', 'dare', 'would_you_rather')
+
+
+class GameError(ValueError):
+    """An action the game doesn't allow right now; the message is shown to the player"""
+
+
+class DeadlineScheduler:
+    """One pending deadline per key, for any number of keys, served by a single task.
+
+    Deadlines are kept in a heap. Rescheduling or cancelling a key only
+    updates its entry in a dict; the heap entries this leaves behind are
+    skipped when they reach the top, and dropped in one pass once they
+    outnumber the live ones. The task sleeps until the earliest deadline and
+    is only woken early when a new deadline comes before it, so thousands of
+    games cost one sleeping task rather than one each.
+    """
+
+    def __init__(self, callback, clock=time.monotonic):
+        self.callback = callback
+        self.clock = clock
+        self._deadlines = {}
+        self._heap = []
+        self._order = itertools.count()
+        self._wakeup = None
+        self._task = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, key, delay):
+        """Call back with `key` in `delay` seconds, replacing its previous deadline"""
+        deadline = self.clock() + delay
+        self._deadlines[key] = deadline
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._compact()
+        entry = (deadline, next(self._order), key)
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry and self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel(self, key):
+        """Forget a key's deadline, if it has one"""
+        self._deadlines.pop(key, None)
+
+    def _is_live(self, entry):
+        return self._deadlines.get(entry[2]) == entry[0]
+
+    def _compact(self):
+        self._heap = [entry for entry in self._heap if self._is_live(entry)]
+        heapq.heapify(self._heap)
+
+    def next_deadline(self):
+        """The earliest pending deadline, or None if there are none"""
+        heap = self._heap
+        while heap and not self._is_live(heap[0]):
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now=None):
+        """Remove and return the keys whose deadline has passed, earliest first"""
+        now = self.clock() if now is None else now
+        heap, due = self._heap, []
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            if self._is_live(entry):
+                del self._deadlines[entry[2]]
+                due.append(entry[2])
+        return due
+
+    def start(self):
+        """Start the task that calls back as deadlines pass"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            for key in self.pop_due():
+                try:
+                    self.callback(key)
+                except Exception:
+                    logger.exception("Deadline callback failed", extra={'key': key})
+            deadline = self.next_deadline()
+            self._wakeup.clear()
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+class GameSession:
+    """One channel's game: its players, whose turn it is and what they drew"""
+
+    __slots__ = ('channel_id', 'host_id', 'players', 'turn', 'round', 'phase',
+                 'category', 'question', 'end_reason', 'last_activity', 'message')
+
+    def __init__(self, channel_id, host_id, now):
+        self.channel_id = channel_id
+        self.host_id = host_id
+        self.players = [host_id]
+        self.turn = 0
+        self.round = 0
+        self.phase = LOBBY
+        self.category = None
+        self.question = None
+        self.end_reason = None
+        self.last_activity = now
+        # The message showing the game, kept by the bot to update it when a deadline passes
+        self.message = None
+
+    @property
+    def current_player(self):
+        """The player whose turn it is, or None outside of turns"""
+        if self.phase in (CHOOSING, ANSWERING):
+            return self.players[self.turn]
+        return None
+
+
+class GameManager:
+    """Game sessions, one per channel, moved along by player actions and deadlines.
+
+    Every phase has a deadline on one shared DeadlineScheduler: the lobby
+    starts the game by itself after `join_seconds` (or is closed if too few
+    players joined), and a player who hasn't chosen and answered within
+    `turn_seconds` loses their turn. When a deadline passes the game is
+    advanced and `on_timeout(session, reason)` is called with 'started',
+    'turn_timeout' or 'expired'; a coroutine it returns is run as a task.
+    Games without any player action for `idle_seconds` are ended instead of
+    going round, so abandoned games don't pile up, and at most
+    `max_sessions` run at once.
+
+    Actions raise GameError when they aren't allowed. They return the
+    session, whose phase is ENDED once the game is over.
+    """
+
+    def __init__(self, on_timeout=None, join_seconds=GAME_JOIN_SECONDS, turn_seconds=GAME_TURN_SECONDS,
+                 idle_seconds=GAME_IDLE_MINUTES * 60, min_players=GAME_MIN_PLAYERS,
+                 max_players=GAME_MAX_PLAYERS, max_sessions=GAME_MAX_SESSIONS, clock=time.monotonic):
+        self.on_timeout = on_timeout
+        self.join_seconds = join_seconds
+        self.turn_seconds = turn_seconds
+        self.idle_seconds = idle_seconds
+        self.min_players = min_players
+        self.max_players = max_players
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self.scheduler = DeadlineScheduler(self._deadline_passed, clock)
+        self.sessions = {}
+        self.stats = {'started': 0, 'turns': 0, 'turn_timeouts': 0, 'expired': 0}
+        self._timeout_tasks = set()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def get(self, channel_id):
+        return self.sessions.get(channel_id)
+
+    def _session(self, channel_id):
+        session = self.sessions.get(channel_id)
+        if session is None:
+            raise GameError("There's no game in this channel.")
+        return session
+
+    def _touch(self, session, delay):
+        """Record a player action and reset the session's deadline"""
+        session.last_activity = self.clock()
+        self.scheduler.schedule(session.channel_id, delay)
+
+    def create(self, channel_id, host_id):
+        """Open a lobby in a channel, with the host as its first player"""
+        if channel_id in self.sessions:
+            raise GameError("A game is already running in this channel.")
+        if len(self.sessions) >= self.max_sessions:
+            raise GameError("Too many games are running right now, try again later.")
+        session = self.sessions[channel_id] = GameSession(channel_id, host_id, self.clock())
+        self._touch(session, self.join_seconds)
+        return session
+
+    def join(self, channel_id, user_id):
+        session = self._session(channel_id)
+        if session.phase != LOBBY:
+            raise GameError("This game has already started.")
+        if user_id in session.players:
+            raise GameError("You're already in this game.")
+        if len(session.players) >= self.max_players:
+            raise GameError(f"This game is full ({self.max_players} players).")
+        session.players.append(user_id)
+        session.last_activity = self.clock()
+        return session
+
+    def leave(self, channel_id, user_id):
+        """Take a player out; the host role passes on, and a game left with too few players ends"""
+        session = self._session(channel_id)
+        if user_id not in session.players:
+            raise GameError("You're not in this game.")
+        index = session.players.index(user_id)
+        was_current = session.current_player == user_id
+        session.players.pop(index)
+        session.last_activity = self.clock()
+
+        if not session.players or (session.phase != LOBBY and len(session.players) < self.min_players):
+            self._close(session, 'not_enough_players')
+            return session
+        if session.host_id == user_id:
+            session.host_id = session.players[0]
+        if session.phase != LOBBY:
+            if index < session.turn:
+                session.turn -= 1
+            if was_current:
+                # The next player has moved into the leaving player's place
+                session.turn -= 1
+                self._next_turn(session)
+                self._touch(session, self.turn_seconds)
+        return session
+
+    def start(self, channel_id, user_id):
+        session = self._session(channel_id)
+        if session.phase != LOBBY:
+            raise GameError("This game has already started.")
+        if user_id != session.host_id:
+            raise GameError("Only the host can start the game.")
+        if len(session.players) < self.min_players:
+            raise GameError(f"At least {self.min_players} players are needed to start.")
+        self._begin(session)
+        self._touch(session, self.turn_seconds)
+        return session
+
+    def choose(self, channel_id, user_id, category=None):
+        """Pick the current player's category (random if None); the caller draws the question"""
+        session = self._session(channel_id)
+        if session.phase != CHOOSING:
+            raise GameError("It's not time to choose." if session.phase == LOBBY else "A question was already drawn.")
+        if user_id != session.current_player:
+            raise GameError(f"It's <@{session.current_player}>'s turn.")
+        if category is not None and category not in CATEGORIES:
+            raise GameError(f"Unknown category '{category}'.")
+        session.category = category or random.choice(CATEGORIES)
+        session.question = None
+        session.phase = ANSWERING
+        self._touch(session, self.turn_seconds)
+        return session
+
+    def finish_turn(self, channel_id, user_id):
+        """End the current turn, answered or skipped; the current player or the host may do this"""
+        session = self._session(channel_id)
+        if session.phase not in (CHOOSING, ANSWERING):
+            raise GameError("The game hasn't started yet.")
+        if user_id not in (session.current_player, session.host_id):
+            raise GameError("Only the current player or the host can end this turn.")
+        self._next_turn(session)
+        self._touch(session, self.turn_seconds)
+        return session
+
+    def end(self, channel_id, user_id):
+        session = self._session(channel_id)
+        if user_id != session.host_id:
+            raise GameError("Only the host can end the game.")
+        self._close(session, 'ended')
+        return session
+
+    def _begin(self, session):
+        random.shuffle(session.players)
+        session.turn = -1
+        session.round = 1
+        self.stats['started'] += 1
+        self._next_turn(session)
+
+    def _next_turn(self, session):
+        session.turn += 1
+        if session.turn >= len(session.players):
+            session.turn = 0
+            session.round += 1
+        session.phase = CHOOSING
+        session.category = session.question = None
+        self.stats['turns'] += 1
+
+    def _close(self, session, reason):
+        session.phase = ENDED
+        session.end_reason = reason
+        self.sessions.pop(session.channel_id, None)
+        self.scheduler.cancel(session.channel_id)
+
+    def _deadline_passed(self, channel_id):
+        session = self.sessions.get(channel_id)
+        if session is None:
+            return
+
+        if session.phase == LOBBY:
+            if len(session.players) >= self.min_players:
+                self._begin(session)
+                self.scheduler.schedule(channel_id, self.turn_seconds)
+                reason = 'started'
+            else:
+                self._close(session, 'expired')
+                reason = 'expired'
+                self.stats['expired'] += 1
+        elif self.clock() - session.last_activity >= self.idle_seconds:
+            self._close(session, 'expired')
+            reason = 'expired'
+            self.stats['expired'] += 1
+        else:
+            # Skipping a turn isn't a player action, so it doesn't keep the game from going idle
+            self._next_turn(session)
+            self.scheduler.schedule(channel_id, self.turn_seconds)
+            reason = 'turn_timeout'
+            self.stats['turn_timeouts'] += 1
+
+        if self.on_timeout is not None:
+            result = self.on_timeout(session, reason)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._timeout_tasks.add(task)
+                task.add_done_callback(self._timeout_tasks.discard)
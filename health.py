@@ -0,0 +1,122 @@
+import time
+from collections import deque
+from config import (
+    REQUEST_TIMEOUT,
+    HEALTH_WINDOW,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_BASE_BACKOFF_SECONDS,
+    BREAKER_MAX_BACKOFF_SECONDS,
+    ADAPTIVE_TIMEOUT_MULTIPLIER,
+    ADAPTIVE_TIMEOUT_MIN_SECONDS
+)
+
+# Latency samples needed before the timeout adapts
+MIN_LATENCY_SAMPLES = 5
+
+
+class SourceHealth:
+    """Rolling health of one source URL, driving its circuit breaker and timeout.
+
+    The breaker is 'closed' while the source works. After
+    BREAKER_FAILURE_THRESHOLD consecutive failures it 'opens' and requests
+    are skipped for a backoff window that doubles each time it trips again.
+    When the window ends it is 'half_open': one probe request is let
+    through, closing the breaker on success or reopening it on failure.
+    """
+
+    def __init__(self, window=HEALTH_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = 'closed'
+        self.open_until = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+
+    def allow_request(self):
+        """Check whether a request may be made now, claiming the probe if half-open"""
+        if self.state == 'open':
+            if time.time() < self.open_until:
+                return False
+            self.state = 'half_open'
+        if self.state == 'half_open':
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self, latency):
+        """Record a successful request and its latency in seconds"""
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        self.state = 'closed'
+        self.trips = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        """Record a failed request, opening the breaker if needed"""
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == 'half_open' or self.consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+            backoff = min(BREAKER_BASE_BACKOFF_SECONDS * 2 ** self.trips, BREAKER_MAX_BACKOFF_SECONDS)
+            self.state = 'open'
+            self.open_until = time.time() + backoff
+            self.trips += 1
+
+    def release_probe(self):
+        """Give up a half-open probe that ended without a result (e.g. was cancelled)"""
+        self._probe_in_flight = False
+
+    def p95_latency(self):
+        """95th percentile of recent successful request latencies, or None"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def error_rate(self):
+        """Fraction of recent requests that failed"""
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def timeout(self):
+        """Request timeout for this source, adapted to its observed p95 latency"""
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return REQUEST_TIMEOUT
+        adaptive = self.p95_latency() * ADAPTIVE_TIMEOUT_MULTIPLIER
+        return min(REQUEST_TIMEOUT, max(ADAPTIVE_TIMEOUT_MIN_SECONDS, adaptive))
+
+    def snapshot(self):
+        """Current breaker state and health figures"""
+        p95 = self.p95_latency()
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'error_rate': self.error_rate(),
+            'p95_latency_seconds': p95,
+            'timeout_seconds': self.timeout(),
+            'retry_in_seconds': max(0, int(self.open_until - time.time())) if self.state == 'open' else 0,
+        }
+
+
+class SourceHealthTracker:
+    """SourceHealth for every URL that has been requested"""
+
+    def __init__(self):
+        self._sources = {}
+
+    def get(self, url):
+        """Get the health of a URL, starting it off healthy on first use"""
+        health = self._sources.get(url)
+        if health is None:
+            health = self._sources[url] = SourceHealth()
+        return health
+
+    def snapshot(self, urls=None):
+        """Snapshots for the given URLs (or all tracked ones) that have been requested"""
+        if urls is None:
+            urls = self._sources.keys()
+        return {url: self._sources[url].snapshot() for url in urls if url in self._sources}
@@ -0,0 +1,99 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from config import LOG_LEVEL, LOG_URL_RATE_LIMIT
+from ratelimit import RateLimiter
+
+# Attributes every LogRecord has; anything else was passed with extra= and becomes a JSON field
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line.
+
+    Besides the time, level, logger and message, every field passed with
+    `extra=` (url, category, duration, status, questions, ...) is written
+    as a field of its own so the lines can be filtered and aggregated.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class UrlRateLimitFilter(logging.Filter):
+    """Rate limit warnings and errors about the same URL.
+
+    Records with a `url` field at WARNING or above spend a token from that
+    URL's bucket, and are dropped once it is empty, so a source that fails
+    on every request during an outage logs a few lines instead of a flood.
+    The next record let through for the URL carries a `suppressed` count of
+    the ones dropped in between.
+    """
+
+    def __init__(self, burst=LOG_URL_RATE_LIMIT[0], per_minute=LOG_URL_RATE_LIMIT[1]):
+        super().__init__()
+        self.limiter = RateLimiter(burst, per_minute)
+        self.suppressed = {}
+
+    def filter(self, record):
+        url = getattr(record, 'url', None)
+        if url is None or record.levelno < logging.WARNING:
+            return True
+        if self.limiter.retry_after(url):
+            self.suppressed[url] = self.suppressed.get(url, 0) + 1
+            return False
+        self.limiter.consume(url)
+        dropped = self.suppressed.pop(url, 0)
+        if dropped:
+            record.suppressed = dropped
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Only merge the arguments into the message, in case they change before the
+        # listener gets to it; the listener thread does the JSON formatting
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+
+def setup_logging(level=LOG_LEVEL, stream=None, logger=None):
+    """Send every record of `logger` (the root logger by default) through a queue as JSON lines.
+
+    Logging calls only filter the record and put it on a queue; a
+    QueueListener thread formats it and writes it to `stream` (stdout by
+    default), so slow terminals or pipes never block the event loop.
+    Replaces any handlers the logger had. Returns the listener; stop() it
+    on shutdown to write out whatever is still queued.
+    """
+    logger = logging.getLogger() if logger is None else logger
+    records = queue.SimpleQueue()
+    queue_handler = _QueueHandler(records)
+    queue_handler.addFilter(UrlRateLimitFilter())
+
+    output = logging.StreamHandler(sys.stdout if stream is None else stream)
+    output.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(records, output)
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+    listener.start()
+    return listener
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Question packs: versioned JSONL files of curated or exported questions
+
+A pack starts with a header line describing it, followed by one question
+per line:
+
+    {"format": "truthbot-pack", "version": 1, "name": "fallback", "created": "...", "categories": {"truth": 15}}
+    {"category": "truth", "id": "4f0c2a...", "question": "What's your biggest fear?", "tags": []}
+
+`id` is a stable 64-bit hash of the normalized question, so the same
+question has the same ID in every pack and every export. Packs in
+QUESTION_PACKS_DIR are loaded as question sources next to the scraped
+websites, and FALLBACK_PACK_PATH holds the questions used when scraping
+fails.
+
+    python packs.py export my-pack.jsonl       # The scraped questions in the question store
+    python packs.py import my-pack.jsonl ...   # Validate packs and add them to QUESTION_PACKS_DIR
+    python packs.py info my-pack.jsonl         # Show a pack's header and count its entries
+"""
+
+import argparse
+import functools
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from datetime import datetime, timezone
+from config import FALLBACK_PACK_PATH, QUESTION_PACKS_DIR, QUESTION_STORE_PATH
+from corpus import content_hash
+
+PACK_FORMAT = 'truthbot-pack'
+PACK_VERSION = 1
+# Source URL prefix for packs in a category pool, e.g. 'pack:packs/party.jsonl'
+PACK_PREFIX = 'pack:'
+
+PackEntry = namedtuple('PackEntry', ['id', 'category', 'question', 'tags'])
+
+
+class PackError(ValueError):
+    """A file that is not a valid question pack"""
+
+
+def question_id(question):
+    """Stable ID of a question: its normalized content hash, as 16 hex digits"""
+    return f"{content_hash(question):016x}"
+
+
+def _parse_header(line, path):
+    try:
+        header = json.loads(line)
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get('format') != PACK_FORMAT:
+        raise PackError(f"{path} is not a question pack")
+    if not isinstance(header.get('version'), int) or header['version'] > PACK_VERSION:
+        raise PackError(f"{path} is pack version {header.get('version')}, this bot reads up to {PACK_VERSION}")
+    return header
+
+
+def read_header(path):
+    """Read a pack's header without touching its entries"""
+    with open(path, 'rb') as f:
+        return _parse_header(f.readline(), path)
+
+
+def iter_pack(path, category=None):
+    """Stream the entries of a pack, optionally only those of one category.
+
+    The file is memory-mapped and read a line at a time, so packs of
+    hundreds of thousands of questions never have to fit in memory. Lines
+    written by write_pack() start with their category, which lets lines of
+    other categories be skipped without parsing their JSON.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise PackError(f"{path} is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            _parse_header(data.readline(), path)
+            prefix = json.dumps({'category': category})[:-1].encode('utf-8') if category else None
+            line_number = 1
+            for line in iter(data.readline, b''):
+                line_number += 1
+                if not line.strip():
+                    continue
+                if prefix and line.startswith(b'{"category": ') and not line.startswith(prefix + b','):
+                    continue
+                try:
+                    record = json.loads(line)
+                    question = record['question']
+                    entry = PackEntry(
+                        record.get('id') or question_id(question),
+                        record['category'],
+                        question,
+                        tuple(record.get('tags', ())),
+                    )
+                except (ValueError, KeyError, TypeError) as e:
+                    raise PackError(f"{path}:{line_number}: invalid entry ({e})") from None
+                if category is None or entry.category == category:
+                    yield entry
+
+
+def write_pack(path, entries, name=None):
+    """Write (category, question, tags) entries as a pack, returning the count per category.
+
+    Entries are streamed to a temporary file in the same directory, so any
+    number can be written, and the pack replaces `path` only once it is
+    complete.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    counts = {}
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as body:
+        for category, question, tags in entries:
+            body.write(json.dumps({
+                'category': category, 'id': question_id(question), 'question': question, 'tags': sorted(tags)
+            }, ensure_ascii=False) + '\n')
+            counts[category] = counts.get(category, 0) + 1
+        body.seek(0)
+
+        header = {
+            'format': PACK_FORMAT,
+            'version': PACK_VERSION,
+            'name': name or os.path.splitext(os.path.basename(path))[0],
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'categories': counts,
+        }
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as out:
+                out.write(json.dumps(header, ensure_ascii=False) + '\n')
+                shutil.copyfileobj(body, out)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    return counts
+
+
+def load_pack(path, category=None):
+    """Read all the entries of a pack (or of one category in it) into a list"""
+    return list(iter_pack(path, category))
+
+
+@functools.lru_cache(maxsize=None)
+def load_fallback_questions(path=FALLBACK_PACK_PATH):
+    """Read the fallback pack as {category: [PackEntry, ...]}, once per process"""
+    fallback = {}
+    for entry in iter_pack(path):
+        fallback.setdefault(entry.category, []).append(entry)
+    return fallback
+
+
+def discover_packs(directory=QUESTION_PACKS_DIR, exclude=(FALLBACK_PACK_PATH,)):
+    """Find the packs in a directory, as {path: categories from the header}.
+
+    Files that are not valid packs are skipped, so a half-copied file
+    can't stop the bot from starting.
+    """
+    if not directory or not os.path.isdir(directory):
+        return {}
+    excluded = {os.path.abspath(path) for path in exclude}
+    packs = {}
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if not filename.endswith('.jsonl') or os.path.abspath(path) in excluded:
+            continue
+        try:
+            packs[path] = set(read_header(path).get('categories', {}))
+        except (OSError, PackError):
+            continue
+    return packs
+
+
+def _export(args):
+    import asyncio
+    from scraper import QuestionScraper
+
+    scraper = QuestionScraper(store_path=args.store, packs_dir=None)
+    try:
+        counts = write_pack(args.pack, scraper.pack_entries(), name=args.name)
+    finally:
+        asyncio.run(scraper.close())
+    print(f"📦 Exported {sum(counts.values())} questions to {args.pack}: {_describe(counts)}")
+
+
+def _import(args):
+    os.makedirs(args.dir, exist_ok=True)
+    for path in args.packs:
+        counts = _count(path)
+        target = os.path.join(args.dir, os.path.basename(path))
+        if os.path.abspath(target) != os.path.abspath(path):
+            shutil.copyfile(path, target)
+        print(f"📥 Imported {sum(counts.values())} questions from {path}: {_describe(counts)}")
+
+
+def _info(args):
+    for path in args.packs:
+        header = read_header(path)
+        print(f"📦 {path}: {header.get('name')} (version {header['version']}, created {header.get('created')})")
+        print(f"   {_describe(_count(path))}")
+
+
+def _count(path):
+    """Read every entry of a pack, returning the count per category"""
+    counts = {}
+    for entry in iter_pack(path):
+        counts[entry.category] = counts.get(entry.category, 0) + 1
+    return counts
+
+
+def _describe(counts):
+    return ', '.join(f"{category}: {count}" for category, count in sorted(counts.items())) or 'no questions'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='write the scraped questions in the question store as a pack')
+    export.add_argument('pack', help='pack file to write')
+    export.add_argument('--store', default=QUESTION_STORE_PATH, help='question store to export')
+    export.add_argument('--name', help='pack name for the header (default: the file name)')
+    export.set_defaults(run=_export)
+
+    load = commands.add_parser('import', help='validate packs and copy them into the packs directory')
+    load.add_argument('packs', nargs='+', help='pack files to import')
+    load.add_argument('--dir', default=QUESTION_PACKS_DIR, help='directory the bot loads packs from')
+    load.set_defaults(run=_import)
+
+    info = commands.add_parser('info', help="show a pack's header and entry counts")
+    info.add_argument('packs', nargs='+', help='pack files to describe')
+    info.set_defaults(run=_info)
+
+    args = parser.parse_args()
+    try:
+        args.run(args)
+    except (OSError, PackError) as e:
+        parser.exit(1, f"Error: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import asyncio
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from config import PARSE_EXECUTOR, PARSE_WORKERS, PARSE_QUEUE_DEPTH
+from metrics import registry
+
+PARSE_SECONDS = registry.histogram(
+    'truthbot_parse_duration_seconds', 'Time to extract questions from one page, including queueing'
+)
+
+
+def _extract(page, encoding):
+    """Run extract_questions in a worker, importing lxml there on first use"""
+    from extractor import extract_questions
+    return extract_questions(page, encoding)
+
+
+class ParsePool:
+    """Bounded worker pool that turns fetched HTML into filtered question lists.
+
+    Parsing runs in a thread or process pool so the event loop shared with
+    discord.py never blocks on a large page. At most `workers` pages are
+    parsed at once and `queue_depth` more may wait for a worker; beyond that,
+    callers of parse() wait, which slows scraping down instead of letting
+    pages pile up in memory.
+    """
+
+    def __init__(self, kind=PARSE_EXECUTOR, workers=PARSE_WORKERS, queue_depth=PARSE_QUEUE_DEPTH):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown parse executor {kind!r}, expected 'thread' or 'process'")
+        self.kind = kind
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = None
+        self._slots = asyncio.Semaphore(workers + queue_depth)
+        self._closed = False
+        self.stats = {'parsed': 0, 'in_flight': 0, 'waiting': 0, 'peak_in_flight': 0}
+
+    def _get_executor(self):
+        """Create the executor on first use"""
+        if self._executor is None:
+            if self.kind == 'process':
+                # Don't fork a process that is running an event loop and threads
+                context = multiprocessing.get_context('spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='parse')
+        return self._executor
+
+    async def parse(self, page, encoding=None):
+        """Extract the valid questions from a page's HTML bytes in a worker"""
+        if self._closed:
+            raise RuntimeError("ParsePool is closed")
+
+        self.stats['waiting'] += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.stats['waiting'] -= 1
+
+        self.stats['in_flight'] += 1
+        self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            questions = await loop.run_in_executor(self._get_executor(), _extract, page, encoding)
+            self.stats['parsed'] += 1
+            PARSE_SECONDS.observe(time.perf_counter() - started)
+            return questions
+        finally:
+            self.stats['in_flight'] -= 1
+            self._slots.release()
+
+    def close(self):
+        """Stop accepting pages and shut the workers down without blocking the event loop"""
+        self._closed = True
+        if self._executor is not None:
+            if sys.version_info >= (3, 9):
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                # Python 3.8 can't drop queued pages; the waiting ones are parsed before the workers exit
+                self._executor.shutdown(wait=False)
+            self._executor = None
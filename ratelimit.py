@@ -0,0 +1,94 @@
+import time
+
+# Seconds between sweeps for idle buckets
+SWEEP_INTERVAL = 60
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """Token buckets keyed by anything hashable, e.g. (user ID, command name).
+
+    Each key may spend up to `burst` tokens at once, and tokens refill at
+    `per_minute` a minute. A bucket that has refilled completely is the same
+    as a new one, so idle keys are swept out and memory only grows with the
+    keys that were active recently.
+    """
+
+    def __init__(self, burst, per_minute):
+        self.burst = burst
+        self.rate = per_minute / 60
+        self.rejected = 0
+        self._buckets = {}
+        self._last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _refill(self, key, now):
+        """Get a key's bucket with tokens topped up to `now`, or None if it would be full"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return None
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        return bucket
+
+    def tokens(self, key, now=None):
+        """Tokens `key` has left right now"""
+        now = time.monotonic() if now is None else now
+        bucket = self._refill(key, now)
+        return self.burst if bucket is None else bucket.tokens
+
+    def retry_after(self, key, now=None, tokens=1):
+        """Seconds until `key` can spend `tokens` tokens, 0 if it can right now"""
+        now = time.monotonic() if now is None else now
+        bucket = self._refill(key, now)
+        if bucket is None or bucket.tokens >= tokens:
+            return 0.0
+        return (tokens - bucket.tokens) / self.rate
+
+    def consume(self, key, now=None, tokens=1):
+        """Spend `tokens` tokens for `key`; check retry_after() first"""
+        now = time.monotonic() if now is None else now
+        bucket = self._refill(key, now)
+        if bucket is None:
+            self._buckets[key] = _Bucket(self.burst - tokens, now)
+        else:
+            bucket.tokens -= tokens
+        if now - self._last_sweep >= SWEEP_INTERVAL:
+            self.evict_idle(now)
+
+    def evict_idle(self, now=None):
+        """Drop buckets that have refilled completely"""
+        now = time.monotonic() if now is None else now
+        idle = [key for key, bucket in self._buckets.items()
+                if bucket.tokens + (now - bucket.updated) * self.rate >= self.burst]
+        for key in idle:
+            del self._buckets[key]
+        self._last_sweep = now
+        return len(idle)
+
+
+def acquire(limits, now=None):
+    """Spend one token from each (limiter, key) pair, or none if any is empty.
+
+    Returns 0 when the tokens were spent, otherwise the seconds to wait
+    before every bucket has a token again. The rejection is counted on the
+    limiter that caused it.
+    """
+    now = time.monotonic() if now is None else now
+    waits = [(limiter.retry_after(key, now), limiter) for limiter, key in limits]
+    wait, limiter = max(waits, key=lambda item: item[0], default=(0.0, None))
+    if wait > 0:
+        limiter.rejected += 1
+        return wait
+    for limiter, key in limits:
+        limiter.consume(key, now)
+    return 0.0
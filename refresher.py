@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Question refresher for sharded deployments
+
+Runs the one QuestionScraper that scrapes the question sources and
+publishes every rebuilt category to the shared question store, where bot
+processes started with BOT_RUN_MODE=shard pick it up. Refresh requests
+left in the store by !refresh are handled here.
+"""
+
+import asyncio
+import logging
+import sqlite3
+from config import QUESTION_STORE_PATH, SHARED_POLL_INTERVAL
+from logs import setup_logging
+from scraper import QuestionScraper
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    if not QUESTION_STORE_PATH:
+        logger.error("QUESTION_STORE_PATH must be set to share questions with the bot shards.")
+        return
+
+    scraper = QuestionScraper(publish=True)
+    try:
+        # Publish what the store already holds, so shards have questions straight away
+        scraper.publish_cache()
+        scraper.start_background_refresh()
+        logger.info("Publishing questions to %s", QUESTION_STORE_PATH)
+        while True:
+            await asyncio.sleep(SHARED_POLL_INTERVAL)
+            try:
+                if scraper.store.take_refresh_request():
+                    scraper.request_refresh()
+            except sqlite3.Error as e:
+                logger.error("Error checking for refresh requests: %s", e)
+    finally:
+        await scraper.close()
+
+
+if __name__ == "__main__":
+    log_listener = setup_logging()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log_listener.stop()
@@ -0,0 +1,109 @@
+import random
+from collections import OrderedDict
+from config import SAMPLER_MAX_CHANNELS
+
+
+class ShuffledDeck:
+    """Question IDs dealt in random order without repeats.
+
+    Draws are an incremental Fisher-Yates shuffle: everything before the
+    cursor has been dealt this pass, and each draw swaps a random undealt
+    ID to the cursor. Once every ID has been dealt the next pass starts.
+    A position index makes adding and removing IDs O(1) as well.
+    """
+
+    __slots__ = ('ids', 'positions', 'cursor', 'version')
+
+    def __init__(self, ids, version=None):
+        self.ids = list(ids)
+        self.positions = {qid: i for i, qid in enumerate(self.ids)}
+        self.cursor = 0
+        self.version = version
+
+    def __len__(self):
+        return len(self.ids)
+
+    def draw(self):
+        """Deal the next ID, or None if the deck is empty"""
+        if not self.ids:
+            return None
+        if self.cursor >= len(self.ids):
+            self.cursor = 0
+
+        j = random.randrange(self.cursor, len(self.ids))
+        ids, positions, i = self.ids, self.positions, self.cursor
+        ids[i], ids[j] = ids[j], ids[i]
+        positions[ids[i]] = i
+        positions[ids[j]] = j
+        self.cursor += 1
+        return ids[i]
+
+    def add(self, qid):
+        """Add an ID to the undealt part of the deck"""
+        if qid not in self.positions:
+            self.positions[qid] = len(self.ids)
+            self.ids.append(qid)
+
+    def remove(self, qid):
+        """Remove an ID, keeping the dealt and undealt parts intact"""
+        i = self.positions.pop(qid, None)
+        if i is None:
+            return
+
+        ids, positions = self.ids, self.positions
+        if i < self.cursor:
+            # Fill the hole with the last dealt ID, moving the hole to the boundary
+            self.cursor -= 1
+            if i != self.cursor:
+                moved = ids[self.cursor]
+                ids[i] = moved
+                positions[moved] = i
+            i = self.cursor
+
+        last = ids.pop()
+        if i < len(ids):
+            ids[i] = last
+            positions[last] = i
+
+    def reconcile(self, current_ids, version=None):
+        """Bring the deck in line with a new ID set, touching only what changed"""
+        existing = self.positions.keys()
+        for qid in existing - current_ids:
+            self.remove(qid)
+        for qid in current_ids - existing:
+            self.add(qid)
+        self.version = version
+
+
+class QuestionSampler:
+    """Non-repeating random draws with a separate deck per channel and category.
+
+    Decks are created on a channel's first draw and reconciled with the
+    category's current IDs when its version changes, so a cache refresh
+    doesn't reset what a channel has already seen. Only the most recently
+    used `max_channels` channels are kept.
+    """
+
+    def __init__(self, max_channels=SAMPLER_MAX_CHANNELS):
+        self.max_channels = max_channels
+        self._channels = OrderedDict()
+
+    def draw(self, channel, category, ids, version):
+        """Draw an ID for a channel from a category's current ID set"""
+        decks = self._channels.get(channel)
+        if decks is None:
+            decks = self._channels[channel] = {}
+            while len(self._channels) > self.max_channels:
+                self._channels.popitem(last=False)
+        else:
+            self._channels.move_to_end(channel)
+
+        deck = decks.get(category)
+        if deck is None:
+            deck = decks[category] = ShuffledDeck(ids, version)
+        elif deck.version != version:
+            deck.reconcile(ids, version)
+        return deck.draw()
+
+    def __len__(self):
+        return len(self._channels)
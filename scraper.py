@@ -1,191 +1,844 @@
-import aiohttp
 import asyncio
-from bs4 import BeautifulSoup
+from array import array
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+import logging
+import os
 import random
+import sqlite3
+import time
+from urllib.parse import urlsplit
 from config import (
     REQUEST_TIMEOUT, 
-    MAX_QUESTIONS_PER_SOURCE, 
     CACHE_DURATION_HOURS,
+    REFRESH_AHEAD_MINUTES,
+    REFRESH_CHECK_INTERVAL,
+    REFRESH_REQUEST_BUDGET,
+    PREFETCH_GUILDS,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_REQUESTS_PER_HOST,
+    MIN_QUESTIONS_PER_CATEGORY,
+    SOURCE_GRACE_HOURS,
+    SOURCE_SHRINK_LIMIT,
+    QUESTION_STORE_PATH,
+    QUESTION_PACKS_DIR,
+    PACK_LOAD_SLICE_MS,
     USER_AGENT,
     QUESTION_SOURCES,
-    ALTERNATIVE_SOURCES,
-    FILTER_WORDS
+    ALTERNATIVE_SOURCES
 )
+from classifier import is_valid_question
+from corpus import QuestionCorpus, CategoryPool
+from demand import DemandTracker
+from health import SourceHealthTracker
+from metrics import registry
+from packs import PACK_PREFIX, PackEntry, PackError, discover_packs, iter_pack, load_fallback_questions, question_id
+from parse_pool import ParsePool, PARSE_SECONDS
+from ratelimit import RateLimiter
+from sampler import QuestionSampler
+from store import QuestionStore
+from tags import QuestionTags, url_tags, keyword_tags
+
+SCRAPE_SECONDS = registry.histogram(
+    'truthbot_scrape_duration_seconds', 'Time to fetch and parse one source page', ['outcome']
+)
+SCRAPES = registry.counter(
+    'truthbot_scrapes_total', 'Source page fetches by URL and outcome', ['url', 'outcome']
+)
+LOOKUP_SECONDS = registry.histogram(
+    'truthbot_question_lookup_seconds', 'Time to get the questions of a category', ['category', 'source']
+)
+REFRESH_SECONDS = registry.histogram(
+    'truthbot_refresh_duration_seconds', 'Time to rebuild a category from its sources', ['category']
+)
+
+# Scrape outcomes that count against a source's health
+FAILED_OUTCOMES = ('error', 'timeout', 'http_error')
+# Key of the one bucket in the refresh request budget
+REFRESH_BUDGET_KEY = 'refresh'
+# Level each scrape is logged at, by outcome; failures are warnings, rate limited per URL
+SCRAPE_LOG_LEVELS = {'ok': logging.INFO, **{outcome: logging.WARNING for outcome in FAILED_OUTCOMES}}
+# Served when the fallback pack itself can't be read
+BUILTIN_FALLBACK_QUESTIONS = {
+    'truth': ["What's your biggest fear?", "What's the worst lie you've ever told?", "What's your biggest regret?"],
+    'dare': ["Do 10 push-ups right now", "Dance for 30 seconds without music", "Do your best animal impression"],
+    'would_you_rather': [
+        "Would you rather be invisible or be able to fly?",
+        "Would you rather live in the past or the future?",
+        "Would you rather be too hot or too cold?",
+    ],
+}
+
+logger = logging.getLogger(__name__)
 
 class QuestionScraper:
-    def __init__(self):
+    def __init__(self, sources=None, alternative_sources=None, store_path=QUESTION_STORE_PATH, publish=False,
+                 packs_dir=QUESTION_PACKS_DIR):
+        # Sources default to config; the benchmarks point them at a local mock server
+        self.sources = QUESTION_SOURCES if sources is None else sources
+        self.alternative_sources = ALTERNATIVE_SOURCES if alternative_sources is None else alternative_sources
+        # url -> category, for logging
+        self._url_categories = {
+            url: category
+            for sources_by_category in (self.alternative_sources, self.sources)
+            for category, urls in sources_by_category.items() for url in urls
+        }
+        # Question packs loaded next to the sources: path -> categories it has questions for
+        self.packs_dir = packs_dir
+        self.packs = discover_packs(packs_dir) if packs_dir else {}
+        # (category, pack path) -> modification time of the pack when it was loaded
+        self._pack_mtimes = {}
         self.session = None
+        # category -> (cache time, array of question IDs in self.corpus)
         self.cache = {}
+        self.corpus = QuestionCorpus()
+        # Tags of every question in the corpus, for filtered draws
+        self.tags = QuestionTags()
+        # Questions below this ID have been given their keyword tags
+        self._keyword_tagged = 0
+        # category -> CategoryPool of each source's last good questions
+        self.pools = {}
+        self.source_grace = timedelta(hours=SOURCE_GRACE_HOURS).total_seconds()
         self.cache_duration = timedelta(hours=CACHE_DURATION_HOURS)
-        self.fallback_questions = self._load_fallback_questions()
+        self.refresh_ahead = timedelta(minutes=REFRESH_AHEAD_MINUTES)
+        self.refresh_stats = {}
+        self._refresh_tasks = {}
+        # Sources a cold fill stopped waiting for, whose questions are added when they finish
+        self._late_tasks = set()
+        self._refresher_task = None
+        # Manual refresh of every category; requests made while it runs join it
+        self._manual_refresh = None
+        self.manual_refresh_stats = {'started': 0, 'coalesced': 0}
+        # Requests per category and server, which order the background refreshes
+        self.demand = DemandTracker()
+        # Source pages rebuilds may request per hour. Every rebuild is charged for the pages
+        # it requests, and only the first fill of an empty category may overdraw it.
+        self.refresh_budget = RateLimiter(REFRESH_REQUEST_BUDGET, REFRESH_REQUEST_BUDGET / 60)
+        self.refreshes_deferred = 0
+        self._deferred_categories = set()
+        # Categories the last manual refresh left until the budget refills
+        self.manual_refresh_deferred = []
+        self._request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._host_semaphores = {}
+        self.parse_pool = ParsePool()
+        # Per-URL validators and extracted question IDs for conditional requests
+        self._responses = {}
+        # Per-URL latency and failures, driving circuit breakers and timeouts
+        self.health = SourceHealthTracker()
+        self.http_stats = {
+            'hits': 0,
+            'misses': 0,
+            'not_modified': 0,
+            'errors': 0,
+            'bytes_downloaded': 0,
+            'bytes_saved': 0
+        }
+        # The store is opened and read on first use, not here
+        self.store = QuestionStore(store_path) if store_path else None
+        self._store_loaded = False
+        # The refresher process publishes every rebuilt category for bot shards to read
+        self.publish = publish
+        if publish and self.store is None:
+            raise ValueError("Publishing questions needs a question store")
+        # Per-channel decks so a channel doesn't see repeats until it has seen everything
+        self.sampler = QuestionSampler()
+        # (category, tag, excluded tags) -> (cache time, IDs, frozenset of IDs)
+        self._question_sets = {}
+        # guild ID -> frozenset of tags the server has turned off; loaded from the store on first use
+        self._guild_excluded_tags = None
     
-    def _load_fallback_questions(self):
-        """Load fallback questions in case web scraping fails"""
+    @property
+    def fallback_questions(self):
+        """Fallback questions per category, in case web scraping fails"""
         return {
-            'truth': [
-                "What's the most embarrassing thing that happened to you in school?",
-                "What's your biggest fear?",
-                "What's the worst lie you've ever told?",
-                "What's your most embarrassing childhood memory?",
-                "What's the most trouble you've ever been in?",
-                "What's your biggest regret?",
-                "What's the most embarrassing thing in your search history?",
-                "What's your biggest insecurity?",
-                "What's the most embarrassing thing you've done while drunk?",
-                "What's your biggest pet peeve?",
-                "What's the most embarrassing thing you've ever said to someone?",
-                "What's your most embarrassing nickname?",
-                "What's the most embarrassing thing you've ever worn?",
-                "What's your most embarrassing moment in public?",
-                "What's the most embarrassing thing you've ever done for money?"
-            ],
-            'dare': [
-                "Let someone in the group post something on your social media",
-                "Call your mom and tell her you're getting married",
-                "Let the group go through your phone for 2 minutes",
-                "Do your best impression of someone in the group",
-                "Let someone in the group text anyone in your contacts",
-                "Dance for 30 seconds without music",
-                "Let the group pick your profile picture for the next week",
-                "Call a friend and sing them a song",
-                "Let someone in the group look through your photos for 1 minute",
-                "Do 10 push-ups right now",
-                "Let the group choose your outfit for tomorrow",
-                "Call a random number and try to sell them something",
-                "Let someone in the group control your phone for 5 minutes",
-                "Do your best animal impression",
-                "Let the group pick your next status update"
-            ],
-            'would_you_rather': [
-                "Would you rather be invisible or be able to fly?",
-                "Would you rather be rich and ugly or poor and beautiful?",
-                "Would you rather have unlimited money or unlimited knowledge?",
-                "Would you rather live in the past or the future?",
-                "Would you rather be famous or be a genius?",
-                "Would you rather have no internet or no phone?",
-                "Would you rather be too hot or too cold?",
-                "Would you rather be a superhero or a villain?",
-                "Would you rather be able to read minds or see the future?",
-                "Would you rather be poor and happy or rich and miserable?",
-                "Would you rather be able to speak all languages or play all instruments?",
-                "Would you rather be able to teleport or time travel?",
-                "Would you rather be a famous actor or a famous musician?",
-                "Would you rather be able to control fire or water?",
-                "Would you rather be able to talk to animals or speak all human languages?"
-            ]
+            category: [entry.question for entry in entries]
+            for category, entries in self._fallback_entries().items()
         }
     
+    def _fallback_entries(self):
+        """The fallback pack's entries per category, or BUILTIN_FALLBACK_QUESTIONS if it can't be read"""
+        try:
+            return load_fallback_questions()
+        except (OSError, ValueError) as e:
+            logger.error("Error loading fallback pack: %s", e)
+            return {
+                category: [PackEntry(question_id(question), category, question, ()) for question in questions]
+                for category, questions in BUILTIN_FALLBACK_QUESTIONS.items()
+            }
+    
     async def get_session(self):
         """Get or create an aiohttp session"""
         if self.session is None:
+            # Imported on the first scrape, so importing the scraper stays cheap
+            import aiohttp
             timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
-            self.session = aiohttp.ClientSession(timeout=timeout)
+            connector = aiohttp.TCPConnector(
+                limit=MAX_CONCURRENT_REQUESTS,
+                limit_per_host=MAX_REQUESTS_PER_HOST
+            )
+            self.session = aiohttp.ClientSession(timeout=timeout, connector=connector)
         return self.session
     
+    @asynccontextmanager
+    async def _request_slot(self, url):
+        """Wait for a free per-host slot, then a free global slot, before making a request"""
+        host = urlsplit(url).netloc
+        host_semaphore = self._host_semaphores.get(host)
+        if host_semaphore is None:
+            host_semaphore = self._host_semaphores[host] = asyncio.Semaphore(MAX_REQUESTS_PER_HOST)
+        async with host_semaphore:
+            async with self._request_semaphore:
+                yield
+    
     def _is_valid_question(self, text):
         """Check if a scraped text is a valid question"""
-        if not text or len(text) < 10 or len(text) > 500:
-            return False
-        
-        # Check if it contains filter words
-        text_lower = text.lower()
-        if any(word in text_lower for word in FILTER_WORDS):
-            return False
-        
-        # Check if it looks like a question (contains question words or ends with ?)
-        question_indicators = ['what', 'when', 'where', 'who', 'why', 'how', 'would you', 'have you', 'do you', 'are you']
-        has_question_indicator = any(indicator in text_lower for indicator in question_indicators)
-        ends_with_question = text.strip().endswith('?')
-        
-        return has_question_indicator or ends_with_question
+        return is_valid_question(text)
+    
+    @staticmethod
+    def _freshness_lifetime(headers):
+        """Seconds a response may be reused without revalidating, from Cache-Control"""
+        cache_control = headers.get('Cache-Control', '').lower()
+        if 'no-cache' in cache_control or 'no-store' in cache_control:
+            return 0
+        for directive in cache_control.split(','):
+            name, _, value = directive.strip().partition('=')
+            if name == 'max-age' and value.isdigit():
+                return int(value)
+        return 0
     
     async def scrape_questions(self, url):
-        """Scrape questions from a given URL"""
+        """Scrape questions from a given URL, recording and logging its duration and outcome"""
+        started = time.perf_counter()
+        outcome = 'error'
+        questions = []
+        fields = {'url': url, 'category': self._url_categories.get(url)}
+        health = self.health.get(url)
+        try:
+            questions, outcome, latency = await self._fetch_questions(url, health, fields)
+            if outcome in ('ok', 'not_modified'):
+                health.record_success(latency)
+            elif outcome in FAILED_OUTCOMES:
+                health.record_failure()
+            return questions
+        except asyncio.CancelledError:
+            outcome = 'cancelled'
+            # A probe cut short by faster sources says nothing about this one
+            health.release_probe()
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            SCRAPE_SECONDS.labels(outcome).observe(duration)
+            SCRAPES.labels(url, outcome).inc()
+            fields.update(outcome=outcome, duration=round(duration, 3), questions=len(questions))
+            logger.log(SCRAPE_LOG_LEVELS.get(outcome, logging.DEBUG), "Scraped %s: %s", url, outcome, extra=fields)
+    
+    async def _fetch_questions(self, url, health, fields):
+        """Fetch and parse a source page, revalidating it if possible, returning (questions, outcome, latency)"""
+        cached = self._responses.get(url)
+        if cached and time.time() < cached['expires']:
+            self.http_stats['hits'] += 1
+            self.http_stats['bytes_saved'] += cached['size']
+            return self.corpus.get_many(cached['question_ids']), 'cached', None
+        
+        if not health.allow_request():
+            return [], 'circuit_open', None
+        
         try:
             session = await self.get_session()
             headers = {'User-Agent': USER_AGENT}
+            if cached:
+                if cached['etag']:
+                    headers['If-None-Match'] = cached['etag']
+                if cached['last_modified']:
+                    headers['If-Modified-Since'] = cached['last_modified']
             
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    questions = []
-                    
-                    # Try different selectors for finding questions
-                    selectors = [
-                        'li', 'p', 'h3', 'h4', 'h5', 'div.question', 
-                        'div.truth-question', 'div.dare-question',
-                        'span.question', 'article', 'section'
-                    ]
+            import aiohttp
+            timeout = aiohttp.ClientTimeout(total=health.timeout())
+            async with self._request_slot(url):
+                started = time.perf_counter()
+                async with session.get(url, headers=headers, timeout=timeout) as response:
+                    fields['status'] = response.status
+                    if response.status == 304 and cached:
+                        self.http_stats['not_modified'] += 1
+                        self.http_stats['bytes_saved'] += cached['size']
+                        cached['expires'] = time.time() + self._freshness_lifetime(response.headers)
+                        latency = time.perf_counter() - started
+                        return self.corpus.get_many(cached['question_ids']), 'not_modified', latency
+                    elif response.status != 200:
+                        self.http_stats['errors'] += 1
+                        return [], 'http_error', None
                     
-                    for selector in selectors:
-                        elements = soup.select(selector)
-                        for element in elements:
-                            text = element.get_text().strip()
-                            if self._is_valid_question(text):
-                                questions.append(text)
-                    
-                    # Remove duplicates while preserving order
-                    seen = set()
-                    unique_questions = []
-                    for question in questions:
-                        if question not in seen:
-                            seen.add(question)
-                            unique_questions.append(question)
-                    
-                    return unique_questions[:MAX_QUESTIONS_PER_SOURCE]
-                else:
-                    print(f"Failed to scrape {url}: Status {response.status}")
-                    return []
+                    body = await response.read()
+                    encoding = response.charset
+                    response_headers = response.headers
+                latency = time.perf_counter() - started
+            
+            self.http_stats['misses'] += 1
+            self.http_stats['bytes_downloaded'] += len(body)
+            # Parse after releasing the connection, in the parse pool so a
+            # large page can't stall the event loop
+            questions = await self.parse_pool.parse(body, encoding)
+            
+            etag = response_headers.get('ETag')
+            last_modified = response_headers.get('Last-Modified')
+            self._responses[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'expires': time.time() + self._freshness_lifetime(response_headers),
+                'size': len(body),
+                'question_ids': self.corpus.add_many(questions)
+            }
+            if questions and (etag or last_modified):
+                self._save_validators(url, etag, last_modified, len(body))
+            return list(questions), 'ok', latency
         except asyncio.TimeoutError:
-            print(f"Timeout while scraping {url}")
-            return []
+            self.http_stats['errors'] += 1
+            return [], 'timeout', None
         except Exception as e:
-            print(f"Error scraping {url}: {e}")
-            return []
+            self.http_stats['errors'] += 1
+            fields['error'] = f"{type(e).__name__}: {e}"
+            return [], 'error', None
     
-    async def get_all_questions(self, category):
-        """Get all questions for a category from multiple sources"""
-        # Check cache first
-        if category in self.cache:
-            cache_time, questions = self.cache[category]
-            if datetime.now() - cache_time < self.cache_duration:
-                return questions
+    async def _scrape_sources(self, urls, min_questions=None):
+        """Scrape several sources concurrently, returning ({url: questions}, {task: url} still in flight)"""
+        pending = {asyncio.create_task(self.scrape_questions(url)): url for url in urls}
+        results = {}
+        total = 0
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url = pending.pop(task)
+                    results[url] = task.result()
+                    total += len(results[url])
+                # The caller takes over the sources still in flight
+                if min_questions and total >= min_questions:
+                    break
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            raise
         
-        all_questions = []
+        return results, pending
+    
+    def _apply_results(self, category, results):
+        """Diff freshly scraped sources into a category's pool, returning (added, removed)"""
+        pool = self.pools.setdefault(category, CategoryPool())
+        now = time.time()
+        added = removed = 0
+        for url, questions in results.items():
+            snapshot = pool.snapshots.get(url)
+            # A failed, empty or shrunken result keeps the last good snapshot for the grace period
+            good = bool(questions) and (
+                snapshot is None or len(questions) >= SOURCE_SHRINK_LIMIT * len(snapshot.ids)
+            )
+            if not good and snapshot is not None:
+                if snapshot.failed_since is None:
+                    snapshot.failed_since = now
+                if now - snapshot.failed_since < self.source_grace:
+                    continue
+            
+            if questions:
+                changes = pool.update(url, self._intern(questions, url), now)
+                self._save_source(category, url, questions)
+            elif snapshot is not None:
+                logger.warning(
+                    "Dropping questions from %s after failing for %sh", url, SOURCE_GRACE_HOURS,
+                    extra={'url': url, 'category': category}
+                )
+                changes = pool.drop(url)
+                self._delete_source(category, url)
+            else:
+                continue
+            added += changes[0]
+            removed += changes[1]
+        return added, removed
+    
+    async def _build_category(self, category, min_questions=None):
+        """Refresh a category's sources and packs incrementally and return its question IDs"""
+        added, removed = await self._apply_packs(category)
         
         # Try primary sources
-        urls = QUESTION_SOURCES.get(category, [])
-        for url in urls:
-            questions = await self.scrape_questions(url)
-            all_questions.extend(questions)
+        urls = self.sources.get(category, [])
+        results, late = await self._scrape_sources(urls, min_questions)
+        scraped_added, scraped_removed = self._apply_results(category, results)
+        added += scraped_added
+        removed += scraped_removed
+        pool = self.pools[category]
         
         # If not enough questions, try alternative sources
-        if len(all_questions) < 10:
-            alt_urls = ALTERNATIVE_SOURCES.get(category, [])
-            for url in alt_urls:
-                questions = await self.scrape_questions(url)
-                all_questions.extend(questions)
+        if len(pool) < 10:
+            alt_urls = self.alternative_sources.get(category, [])
+            self._charge_refresh_budget(len(alt_urls))
+            results, alt_late = await self._scrape_sources(alt_urls, min_questions)
+            late.update(alt_late)
+            alt_added, alt_removed = self._apply_results(category, results)
+            added += alt_added
+            removed += alt_removed
+        if late:
+            task = asyncio.create_task(self._apply_late_sources(category, late))
+            self._late_tasks.add(task)
+            task.add_done_callback(self._late_tasks.discard)
+        
+        stats = self.refresh_stats.setdefault(category, {'refresh_count': 0, 'last_error': None})
+        stats['last_added'] = added
+        stats['last_removed'] = removed
         
         # If still no questions, use fallback
-        if not all_questions:
-            all_questions = self.fallback_questions.get(category, [])
+        if not len(pool):
+            return self._intern_fallback(category)
+        
+        return pool.ids()
+    
+    async def _apply_late_sources(self, category, late):
+        """Add the sources a cold fill stopped waiting for to the category once they finish"""
+        await asyncio.wait(late)
+        results = {url: task.result() for task, url in late.items() if not task.cancelled() and not task.exception()}
+        added, removed = self._apply_results(category, results)
+        if (added or removed) and category in self.cache:
+            self._cache_category(category, self.pools[category].ids())
+    
+    async def _apply_packs(self, category):
+        """Load new or changed packs with questions in a category into its pool, returning (added, removed)"""
+        pool = self.pools.setdefault(category, CategoryPool())
+        added = removed = 0
+        for path in self._removed_packs(category):
+            changes = pool.drop(PACK_PREFIX + path)
+            del self._pack_mtimes[(category, path)]
+            logger.info("Dropped pack %s", path, extra={'url': PACK_PREFIX + path, 'category': category})
+            added += changes[0]
+            removed += changes[1]
+        for path, categories in self.packs.items():
+            if category not in categories:
+                continue
+            url = PACK_PREFIX + path
+            started = time.perf_counter()
+            try:
+                mtime = os.stat(path).st_mtime
+                if self._pack_mtimes.get((category, path)) == mtime:
+                    continue
+                ids, count = await self._load_pack(path, category)
+            except (OSError, PackError) as e:
+                logger.error("Error loading pack %s: %s", path, e, extra={'url': url, 'category': category})
+                continue
+            
+            slice_end = time.perf_counter() + PACK_LOAD_SLICE_MS / 1000
+            for changes in pool.update_steps(url, ids, mtime):
+                if time.perf_counter() >= slice_end:
+                    await asyncio.sleep(0)
+                    slice_end = time.perf_counter() + PACK_LOAD_SLICE_MS / 1000
+            self._pack_mtimes[(category, path)] = mtime
+            logger.info("Loaded pack %s", path, extra={
+                'url': url,
+                'category': category,
+                'duration': round(time.perf_counter() - started, 3),
+                'questions': count,
+            })
+            added += changes[0]
+            removed += changes[1]
+        return added, removed
+    
+    async def _load_pack(self, path, category):
+        """Stream a pack's questions in a category into the corpus, returning (unique IDs, entries read)"""
+        ids = {}
+        count = 0
+        # Parsed on the event loop rather than in a worker thread, which would hold the GIL
+        # for a whole switch interval at a time
+        slice_end = time.perf_counter() + PACK_LOAD_SLICE_MS / 1000
+        for entry in iter_pack(path, category):
+            count += 1
+            ids[self._intern_entry(entry)] = None
+            if time.perf_counter() >= slice_end:
+                await asyncio.sleep(0)
+                slice_end = time.perf_counter() + PACK_LOAD_SLICE_MS / 1000
+        return array('I', ids), count
+    
+    def _removed_packs(self, category):
+        """Packs loaded into a category whose file was removed or no longer has questions in it"""
+        return [
+            path for loaded, path in self._pack_mtimes
+            if loaded == category and (
+                not os.path.exists(path) or (path in self.packs and category not in self.packs[path]))
+        ]
+    
+    def _stale_pack_categories(self):
+        """Categories with a pack that was added, changed or removed on disk since they were built"""
+        if self.packs_dir:
+            self.packs = discover_packs(self.packs_dir)
+        stale = {category for category, _ in self._pack_mtimes if self._removed_packs(category)}
+        for path, categories in self.packs.items():
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            stale.update(category for category in categories if self._pack_mtimes.get((category, path)) != mtime)
+        return stale
+    
+    def _save_source(self, category, url, questions):
+        """Persist one source's questions"""
+        if self.store is None:
+            return
+        try:
+            self.store.save_source(category, url, questions)
+        except sqlite3.Error as e:
+            logger.error("Error saving %s to question store: %s", url, e, extra={'url': url, 'category': category})
+    
+    def _delete_source(self, category, url):
+        """Remove a dropped source from the store"""
+        if self.store is None:
+            return
+        try:
+            self.store.delete_source(category, url)
+        except sqlite3.Error as e:
+            logger.error("Error removing %s from question store: %s", url, e, extra={'url': url, 'category': category})
+    
+    def _save_validators(self, url, etag, last_modified, size):
+        """Persist a page's cache validators so revalidation survives restarts"""
+        if self.store is None:
+            return
+        try:
+            self.store.save_validators(url, etag, last_modified, size)
+        except sqlite3.Error as e:
+            logger.error("Error saving validators for %s: %s", url, e, extra={'url': url})
+    
+    def _intern(self, questions, url=None):
+        """Add scraped questions to the corpus, tagged by source URL and keywords, and return their IDs"""
+        ids = self.corpus.add_many(questions)
+        if url:
+            self.tags.add(ids, url_tags(url))
+        self._tag_new_questions()
+        return ids
+    
+    def _intern_entry(self, entry):
+        """Add a pack entry to the corpus with its own tags and keyword tags, returning its ID"""
+        qid = self.corpus.add(entry.question)
+        if entry.tags:
+            self.tags.add((qid,), entry.tags)
+        self._tag_new_questions()
+        return qid
+    
+    def _tag_new_questions(self):
+        """Give the questions added to the corpus since the last call their keyword tags"""
+        for qid in range(self._keyword_tagged, len(self.corpus)):
+            tags = keyword_tags(self.corpus.get(qid))
+            if tags:
+                self.tags.add((qid,), tags)
+        self._keyword_tagged = len(self.corpus)
+    
+    def _intern_entries(self, entries):
+        """Add pack entries to the corpus with their own tags and keyword tags, returning their IDs"""
+        return array('I', dict.fromkeys(self._intern_entry(entry) for entry in entries))
+    
+    def _intern_fallback(self, category):
+        """Add a category's fallback questions to the corpus and return their IDs"""
+        return self._intern_entries(self._fallback_entries().get(category, []))
+    
+    def _publish(self, category, ids):
+        """Publish a category's questions and tags to the shards"""
+        tags = {}
+        for index, qid in enumerate(ids):
+            for tag in self.tags.tags_of(qid):
+                tags.setdefault(tag, []).append(index)
+        try:
+            self.store.publish(category, self.corpus.get_many(ids), tags)
+        except sqlite3.Error as e:
+            logger.error("Error publishing %s: %s", category, e, extra={'category': category})
+    
+    def publish_cache(self):
+        """Publish every cached category, e.g. the ones loaded from the store at startup"""
+        self._load_store()
+        for category, (_, ids) in list(self.cache.items()):
+            self._publish(category, ids)
+    
+    def _load_store(self):
+        """Fill the cache from the question store the first time it is needed"""
+        if self._store_loaded or self.store is None:
+            return
+        self._store_loaded = True
+        try:
+            stored = self.store.load_all()
+            validators = self.store.load_validators()
+        except sqlite3.Error as e:
+            logger.error("Error loading question store: %s", e)
+            return
+        
+        for category, sources in stored.items():
+            # Keep configured source order, and date the entry by its oldest source
+            order = self.sources.get(category, []) + self.alternative_sources.get(category, [])
+            sources.sort(key=lambda source: order.index(source[0]) if source[0] in order else len(order))
+            pool = self.pools.setdefault(category, CategoryPool())
+            for url, fetched_at, source_questions in sources:
+                ids = self._intern(source_questions, url)
+                # Stored snapshots are what the first refresh diffs against
+                if url not in pool.snapshots:
+                    pool.update(url, ids, fetched_at)
+                # Stored questions plus validators let the first refresh be a cheap 304
+                if url in validators and url not in self._responses:
+                    etag, last_modified, size = validators[url]
+                    self._responses[url] = {
+                        'etag': etag,
+                        'last_modified': last_modified,
+                        'expires': 0,
+                        'size': size,
+                        'question_ids': ids
+                    }
+            
+            if category not in self.cache and len(pool):
+                oldest = min(fetched_at for _, fetched_at, _ in sources)
+                self.cache[category] = (datetime.fromtimestamp(oldest), pool.ids())
+    
+    def _cache_category(self, category, ids):
+        """Swap a category's rebuilt question IDs into the cache"""
+        self.cache[category] = (datetime.now(), ids)
+        self._prefetch_question_sets(category)
+        if self.publish:
+            self._publish(category, ids)
+    
+    async def _refresh_category(self, category, min_questions=None):
+        """Rebuild a category and swap it into the cache, recording how long it took"""
+        started = time.perf_counter()
+        stats = self.refresh_stats.setdefault(category, {'refresh_count': 0, 'last_error': None})
+        try:
+            ids = await self._build_category(category, min_questions)
+            self._cache_category(category, ids)
+            stats['last_error'] = None
+            logger.info("Refreshed %s", category, extra={
+                'category': category,
+                'duration': round(time.perf_counter() - started, 3),
+                'questions': len(ids),
+                'added': stats.get('last_added'),
+                'removed': stats.get('last_removed'),
+            })
+            return ids
+        except Exception as e:
+            logger.exception("Error refreshing %s: %s", category, e, extra={'category': category})
+            stats['last_error'] = str(e)
+            # Keep serving whatever we had before the failed rebuild
+            if category in self.cache:
+                return self.cache[category][1]
+            return self._intern_fallback(category)
+        finally:
+            stats['refresh_count'] += 1
+            stats['last_refresh_seconds'] = time.perf_counter() - started
+            REFRESH_SECONDS.labels(category).observe(stats['last_refresh_seconds'])
+            stats['last_refresh_at'] = datetime.now()
+            self._refresh_tasks.pop(category, None)
+    
+    def _schedule_refresh(self, category, min_questions=None):
+        """Start a rebuild for a category unless one is already running, charging it to the refresh budget"""
+        task = self._refresh_tasks.get(category)
+        if task is None or task.done():
+            # Only the first fill of an empty category calls this directly and may overdraw the
+            # budget; every other rebuild goes through _refresh_within_budget()
+            self._charge_refresh_budget(len(self.sources.get(category, ())))
+            self._deferred_categories.discard(category)
+            task = asyncio.create_task(self._refresh_category(category, min_questions))
+            self._refresh_tasks[category] = task
+        return task
+    
+    def _charge_refresh_budget(self, pages):
+        """Spend refresh budget tokens on source pages about to be requested"""
+        if pages:
+            self.refresh_budget.consume(REFRESH_BUDGET_KEY, tokens=pages)
+    
+    def _refresh_within_budget(self, category):
+        """Start a rebuild for a category if the refresh request budget allows it, returning whether it did"""
+        task = self._refresh_tasks.get(category)
+        if task is not None and not task.done():
+            return True
+        cost = min(len(self.sources.get(category, ())), self.refresh_budget.burst)
+        if cost and self.refresh_budget.retry_after(REFRESH_BUDGET_KEY, tokens=cost):
+            if category not in self._deferred_categories:
+                self._deferred_categories.add(category)
+                self.refreshes_deferred += 1
+            return False
+        self._schedule_refresh(category)
+        return True
+    
+    def _needs_refresh(self, cache_time, ahead=True):
+        """Check whether a cache entry has expired or, with `ahead`, is close enough to expiry to rebuild"""
+        lifetime = self.cache_duration - self.refresh_ahead if ahead else self.cache_duration
+        return datetime.now() - cache_time >= lifetime
+    
+    async def _get_question_ids(self, category):
+        """Get the question IDs for a category, scraping only if nothing is cached"""
+        started = time.perf_counter()
+        self._load_store()
+        
+        # Serve from cache, even if stale, and rebuild in the background. Rebuilds
+        # ahead of expiry are left to the background refresher, in order of demand.
+        if category in self.cache:
+            cache_time, ids = self.cache[category]
+            if self._needs_refresh(cache_time, ahead=False):
+                self._refresh_within_budget(category)
+            LOOKUP_SECONDS.labels(category, 'cache').observe(time.perf_counter() - started)
+            return ids
+        
+        # Nothing cached yet: wait for the (shared) rebuild, but only until enough
+        # questions are in. Shield it so a cancelled command doesn't cancel the
+        # rebuild for everyone else.
+        ids = await asyncio.shield(self._schedule_refresh(category, MIN_QUESTIONS_PER_CATEGORY))
+        LOOKUP_SECONDS.labels(category, 'scrape').observe(time.perf_counter() - started)
+        return ids
+    
+    async def get_all_questions(self, category):
+        """Get all questions for a category from multiple sources"""
+        return self.corpus.get_many(await self._get_question_ids(category))
+    
+    def start_background_refresh(self):
+        """Start the background task that rebuilds categories ahead of expiry"""
+        if self._refresher_task is None or self._refresher_task.done():
+            self._refresher_task = asyncio.create_task(self._background_refresh_loop())
+    
+    async def warm_up(self, categories=None):
+        """Fill the cache for several categories at once, waiting for every source since no command is"""
+        if categories is None:
+            categories = list(self.sources.keys())
+        self._load_store()
+        await asyncio.gather(*(
+            self._schedule_refresh(category) for category in categories if category not in self.cache
+        ))
+    
+    async def _background_refresh_loop(self):
+        """Warm every category, then periodically rebuild the ones due, most urgent first, within the budget"""
+        await self.warm_up()
+        while True:
+            for _, category in self._refresh_candidates():
+                # Categories further down wait for the budget too, so it goes to the busiest first
+                if not self._refresh_within_budget(category):
+                    break
+            await asyncio.sleep(REFRESH_CHECK_INTERVAL)
+    
+    def _refresh_candidates(self):
+        """Categories due for a rebuild as [(priority, category)], busiest and closest to expiry first"""
+        stale_packs = self._stale_pack_categories()
+        lifetime = self.cache_duration.total_seconds()
+        now = datetime.now()
+        candidates = []
+        for category in dict.fromkeys([*self.sources, *self.cache]):
+            if category in self.cache:
+                cache_time = self.cache[category][0]
+                if not (self._needs_refresh(cache_time) or category in stale_packs):
+                    continue
+                expires_in = lifetime - (now - cache_time).total_seconds()
+            else:
+                expires_in = 0
+            # Requests per hour over seconds left, so quiet categories still get their turn
+            candidates.append(((self.demand.rate(category) + 1) / max(expires_in, 1), category))
+        candidates.sort(reverse=True)
+        return candidates
+    
+    def record_demand(self, category, guild_id=None):
+        """Count a question shown in a category, for ordering refreshes and prefetching"""
+        self.demand.record(category, guild_id)
+    
+    def _prefetch_question_sets(self, category):
+        """Build the filtered question sets of the busiest servers of a freshly rebuilt category"""
+        for guild_id in self.demand.top_guilds(category, PREFETCH_GUILDS):
+            exclude = self.get_guild_excluded_tags(guild_id)
+            if exclude:
+                self._question_set(category, None, exclude)
+    
+    def _question_set(self, category, tag=None, exclude=frozenset()):
+        """Get (version, IDs, frozenset of IDs) of a cached category's questions with a tag and none of `exclude`"""
+        cache_time, ids = self.cache[category]
+        key = (category, tag, exclude)
+        cached = self._question_sets.get(key)
+        if cached is None or cached[0] != cache_time:
+            if tag or exclude:
+                ids = self.tags.select(self._question_set(category)[2], tag, exclude)
+            cached = (cache_time, ids, frozenset(ids))
+            # Don't keep entries for tags nobody has seen, so typos can't grow this
+            if not tag or tag in self.tags:
+                self._question_sets[key] = cached
+        return cached
+    
+    def _draw(self, category, ids, channel_id, tag=None, exclude=frozenset()):
+        """Pick a question from a category's IDs, from the channel's deck when possible"""
+        if category not in self.cache:
+            ids = self.tags.select(ids, tag, exclude) if tag or exclude else ids
+            return self.corpus.get(random.choice(ids)) if ids else None
         
-        # Cache the results
-        self.cache[category] = (datetime.now(), all_questions)
-        return all_questions
+        version, ids, id_set = self._question_set(category, tag, exclude)
+        if not ids:
+            return None
+        if channel_id is None:
+            return self.corpus.get(random.choice(ids))
+        deck = (category, tag, exclude) if tag or exclude else category
+        return self.corpus.get(self.sampler.draw(channel_id, deck, id_set, version))
+    
+    def _pick_category(self, tag=None, exclude=frozenset()):
+        """Choose a category for !random, preferring cached ones that have questions with the tag"""
+        categories = list(self.sources.keys())
+        if tag:
+            cached = [
+                category for category in categories
+                if category in self.cache and self._question_set(category, tag, exclude)[1]
+            ]
+        else:
+            cached = [category for category in categories if category in self.cache]
+        return random.choice(cached or categories)
     
-    async def get_random_question(self, category=None):
-        """Get a random question from any category or a specific category"""
+    def peek_random_question(self, category=None, channel_id=None, tag=None, exclude=frozenset()):
+        """Get a random question, or None if its category still has to be scraped, returning it with the category"""
         if category is None:
-            category = random.choice(list(QUESTION_SOURCES.keys()))
+            category = self._pick_category(tag, exclude)
         
-        questions = await self.get_all_questions(category)
-        if questions:
-            return random.choice(questions), category
-        return None, None
+        started = time.perf_counter()
+        self._load_store()
+        if category not in self.cache:
+            return None, category
+        
+        cache_time, ids = self.cache[category]
+        if self._needs_refresh(cache_time, ahead=False):
+            self._refresh_within_budget(category)
+        LOOKUP_SECONDS.labels(category, 'cache').observe(time.perf_counter() - started)
+        return self._draw(category, ids, channel_id, tag, exclude), category
+    
+    async def get_random_question(self, category=None, channel_id=None, tag=None, exclude=frozenset()):
+        """Get a random question from any category or a specific one, from the channel's deck if given"""
+        if category is None:
+            category = self._pick_category(tag, exclude)
+        
+        ids = await self._get_question_ids(category)
+        question = self._draw(category, ids, channel_id, tag, exclude) if ids else None
+        if question is None:
+            return None, None
+        return question, category
+    
+    def get_tags(self, category=None):
+        """Tags with at least one cached question, in one category or all of them"""
+        categories = [category] if category else list(self.cache)
+        tags = set()
+        for name in categories:
+            if name in self.cache:
+                tags.update(self.tags.category_tags(self.cache[name][1]))
+        return sorted(tags)
+    
+    def get_guild_excluded_tags(self, guild_id):
+        """Get the tags a server has turned off"""
+        if self._guild_excluded_tags is None:
+            self._guild_excluded_tags = {}
+            if self.store is not None:
+                try:
+                    stored = self.store.load_guild_excluded_tags()
+                except sqlite3.Error as e:
+                    logger.error("Error loading server settings: %s", e)
+                    stored = {}
+                self._guild_excluded_tags = {guild: frozenset(tags) for guild, tags in stored.items()}
+        return self._guild_excluded_tags.get(guild_id, frozenset())
+    
+    def set_guild_excluded_tags(self, guild_id, tags):
+        """Set the tags a server has turned off, saving them to the store"""
+        self.get_guild_excluded_tags(guild_id)
+        self._guild_excluded_tags[guild_id] = frozenset(tags)
+        if self.store is not None:
+            try:
+                self.store.save_guild_excluded_tags(guild_id, tags)
+            except sqlite3.Error as e:
+                logger.error("Error saving server settings: %s", e, extra={'guild_id': guild_id})
     
     async def refresh_cache(self, category=None):
         """Refresh the cache for a specific category or all categories"""
@@ -195,19 +848,113 @@ class QuestionScraper:
         else:
             self.cache.clear()
     
+    def request_refresh(self):
+        """Rebuild every category the refresh budget allows in the background, returning True unless one was running"""
+        if self._manual_refresh is not None and not self._manual_refresh.done():
+            self.manual_refresh_stats['coalesced'] += 1
+            return False
+        self.manual_refresh_stats['started'] += 1
+        rebuilds, self.manual_refresh_deferred = self._refresh_all()
+        self._manual_refresh = asyncio.gather(*rebuilds)
+        return True
+    
+    def _refresh_all(self):
+        """Rebuild every category the refresh budget allows, returning (rebuilds, deferred categories)"""
+        rebuilds, deferred = [], []
+        for category in self.sources:
+            if self._refresh_within_budget(category):
+                rebuilds.append(self._refresh_tasks[category])
+            else:
+                deferred.append(category)
+        return rebuilds, deferred
+    
+    def pack_entries(self):
+        """Yield (category, question, tags) for every question being served, e.g. to export as a pack"""
+        self._load_store()
+        for category, (_, ids) in list(self.cache.items()):
+            for qid in ids:
+                yield category, self.corpus.get(qid), self.tags.tags_of(qid)
+    
     async def close(self):
-        """Close the aiohttp session"""
+        """Stop background refreshes and close the aiohttp session"""
+        tasks = [*self._refresh_tasks.values(), *self._late_tasks]
+        for task in (self._refresher_task, self._manual_refresh):
+            if task:
+                tasks.append(task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
         if self.session:
             await self.session.close()
+        
+        self.parse_pool.close()
+        
+        if self.store:
+            self.store.close()
+    
+    def get_performance_info(self):
+        """Summarize scrape, parse and lookup latency from the metrics registry"""
+        failed = sum(
+            child.value for (_, outcome), child in SCRAPES.items()
+            if outcome in FAILED_OUTCOMES
+        )
+        total = SCRAPES.total()
+        return {
+            'scrape_count': total,
+            'scrape_failure_rate': failed / total if total else 0.0,
+            'scrape_p95_seconds': SCRAPE_SECONDS.quantile(0.95),
+            'parse_p95_seconds': PARSE_SECONDS.quantile(0.95),
+            'lookup_p95_seconds': LOOKUP_SECONDS.quantile(0.95),
+        }
+    
+    def get_http_stats(self):
+        """Get counters for page downloads, cache hits and 304 revalidations"""
+        return dict(self.http_stats)
+    
+    def get_corpus_info(self):
+        """Get the number of unique questions held, near-duplicates merged into them and the memory they use"""
+        info = self.corpus.memory_usage()
+        info['question_count'] = len(self.corpus)
+        info['near_duplicates_merged'] = self.corpus.near_duplicates_merged
+        return info
     
     def get_cache_info(self):
         """Get information about the current cache"""
+        self._load_store()
         info = {}
-        for category, (cache_time, questions) in self.cache.items():
+        for category, (cache_time, ids) in self.cache.items():
             age = datetime.now() - cache_time
+            stats = self.refresh_stats.get(category, {})
             info[category] = {
-                'question_count': len(questions),
+                'question_count': len(ids),
                 'cache_age_minutes': int(age.total_seconds() / 60),
-                'is_fresh': age < self.cache_duration
+                'is_fresh': age < self.cache_duration,
+                'refreshing': category in self._refresh_tasks,
+                'refresh_count': stats.get('refresh_count', 0),
+                'last_refresh_seconds': stats.get('last_refresh_seconds'),
+                'last_refresh_error': stats.get('last_error'),
+                'last_added': stats.get('last_added'),
+                'last_removed': stats.get('last_removed'),
+                'sources_in_grace': sum(
+                    1 for snapshot in self.pools[category].snapshots.values() if snapshot.failed_since is not None
+                ) if category in self.pools else 0,
+                'sources': self.health.snapshot(
+                    self.sources.get(category, []) + self.alternative_sources.get(category, [])
+                )
             }
-        return info 
\ No newline at end of file
+        return info
+    
+    def get_demand_info(self):
+        """Get recent requests per hour by category and the state of the refresh request budget"""
+        return {
+            'requests_per_hour': self.demand.snapshot(),
+            'guilds_tracked': len(self.demand),
+            'budget_remaining': max(0, int(self.refresh_budget.tokens(REFRESH_BUDGET_KEY))),
+            'budget_per_hour': self.refresh_budget.burst,
+            'refreshes_deferred': self.refreshes_deferred,
+        }
+    
+    def get_source_health(self):
+        """Get circuit breaker state, error rate and timeout for every source requested so far"""
+        return self.health.snapshot() 
\ No newline at end of file
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import sqlite3
+from array import array
+from config import QUESTION_STORE_PATH, SHARED_POLL_INTERVAL
+from scraper import QuestionScraper
+
+logger = logging.getLogger(__name__)
+
+
+class SharedQuestionReader(QuestionScraper):
+    """Question source for bot shards, serving what the refresher process publishes.
+
+    Nothing is scraped here. Each category is read from the question store
+    the first time it is asked for, and a background task polls the
+    published versions and reloads the categories the refresher has rebuilt
+    since, so adding shards adds no scraping. Until a category has been
+    published the fallback questions are served. !refresh leaves a request
+    in the store for the refresher, coalesced across all shards.
+    """
+
+    def __init__(self, store_path=QUESTION_STORE_PATH, poll_interval=SHARED_POLL_INTERVAL):
+        if not store_path:
+            raise ValueError("Shard mode needs QUESTION_STORE_PATH to be set")
+        # Pack questions reach shards through the refresher's published rows, so packs aren't read here
+        super().__init__(store_path=store_path, packs_dir=None)
+        self.poll_interval = poll_interval
+        # category -> published version currently in self.cache
+        self._versions = {}
+
+    def _load_store(self):
+        # Categories are loaded from their published rows on first use instead
+        pass
+
+    def _needs_refresh(self, cache_time, ahead=True):
+        # Categories change when the poller sees a new published version, not with age
+        return False
+
+    async def _build_category(self, category, min_questions=None):
+        """Load the IDs of a category's published questions, or its fallback questions until there are any"""
+        try:
+            published = self.store.load_published(category)
+        except sqlite3.Error as e:
+            logger.error("Error loading published %s questions: %s", category, e, extra={'category': category})
+            published = None
+        if published is None:
+            return self._intern_fallback(category)
+
+        version, _, questions, tags = published
+        self._versions[category] = version
+        # Tag indexes refer to positions in `questions`; near-duplicates may share an ID here
+        question_ids = [self.corpus.add(question) for question in questions]
+        for tag, indexes in tags.items():
+            self.tags.add([question_ids[index] for index in indexes], [tag])
+        return array('I', dict.fromkeys(question_ids))
+
+    def _reload_changed(self):
+        """Reload every category whose published version differs from the one in memory"""
+        try:
+            versions = self.store.published_versions()
+        except sqlite3.Error as e:
+            logger.error("Error checking published questions: %s", e)
+            return
+        for category, version in versions.items():
+            if category in self.sources and self._versions.get(category) != version:
+                self._schedule_refresh(category)
+
+    async def _background_refresh_loop(self):
+        """Load every category, then pick up newly published versions as they appear"""
+        await self.warm_up()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            self._reload_changed()
+
+    def request_refresh(self):
+        """Ask the refresher process to rebuild every category.
+
+        Returns True if this made a new request, False if one from any
+        shard was still pending.
+        """
+        try:
+            requested = self.store.request_refresh()
+        except sqlite3.Error as e:
+            logger.error("Error requesting a refresh: %s", e)
+            return False
+        self.manual_refresh_stats['started' if requested else 'coalesced'] += 1
+        return requested
@@ -0,0 +1,194 @@
+import json
+import sqlite3
+import time
+
+
+class QuestionStore:
+    """SQLite-backed store of the questions scraped from each source.
+
+    One row is kept per (category, source URL) holding the most recent
+    successful scrape and the time it was fetched, so a restarted bot can
+    answer from disk instead of re-scraping everything.
+    
+    In sharded mode the store is also how the refresher process hands
+    questions to the bot shards: it publishes each rebuilt category with
+    a version number that the shards poll for, and shards leave refresh
+    requests for it in the meta table.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+
+    def _connect(self):
+        """Open the database on first use and create the schema if needed"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path)
+            # WAL lets readers keep going while a scrape is being written
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                '''CREATE TABLE IF NOT EXISTS source_questions (
+                    category TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    questions TEXT NOT NULL,
+                    PRIMARY KEY (category, url)
+                )'''
+            )
+            self._conn.execute(
+                '''CREATE TABLE IF NOT EXISTS http_validators (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER NOT NULL DEFAULT 0
+                )'''
+            )
+            self._conn.execute(
+                '''CREATE TABLE IF NOT EXISTS published_categories (
+                    category TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    published_at REAL NOT NULL,
+                    questions TEXT NOT NULL
+                )'''
+            )
+            self._conn.execute(
+                '''CREATE TABLE IF NOT EXISTS guild_settings (
+                    guild_id INTEGER PRIMARY KEY,
+                    excluded_tags TEXT NOT NULL
+                )'''
+            )
+            self._conn.execute(
+                '''CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value REAL NOT NULL
+                )'''
+            )
+            self._conn.commit()
+        return self._conn
+
+    def save_source(self, category, url, questions, fetched_at=None):
+        """Replace the stored questions for one source of a category"""
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO source_questions (category, url, fetched_at, questions) '
+            'VALUES (?, ?, ?, ?)',
+            (category, url, fetched_at or time.time(), json.dumps(questions))
+        )
+        conn.commit()
+
+    def delete_source(self, category, url):
+        """Forget the stored questions of one source of a category"""
+        conn = self._connect()
+        conn.execute('DELETE FROM source_questions WHERE category = ? AND url = ?', (category, url))
+        conn.commit()
+
+    def load_all(self):
+        """Load every stored source, grouped by category.
+
+        Returns {category: [(url, fetched_at, questions), ...]}.
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            'SELECT category, url, fetched_at, questions FROM source_questions ORDER BY category, url'
+        )
+        sources = {}
+        for category, url, fetched_at, questions in rows:
+            sources.setdefault(category, []).append((url, fetched_at, json.loads(questions)))
+        return sources
+
+    def save_validators(self, url, etag, last_modified, size):
+        """Remember the ETag/Last-Modified a page was last served with"""
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO http_validators (url, etag, last_modified, size) VALUES (?, ?, ?, ?)',
+            (url, etag, last_modified, size)
+        )
+        conn.commit()
+
+    def load_validators(self):
+        """Load stored validators as {url: (etag, last_modified, size)}"""
+        conn = self._connect()
+        rows = conn.execute('SELECT url, etag, last_modified, size FROM http_validators')
+        return {url: (etag, last_modified, size) for url, etag, last_modified, size in rows}
+
+    def publish(self, category, questions, tags=None):
+        """Publish the questions a category should serve, bumping its version.
+        
+        `tags` maps tag names to the indexes of the questions carrying them.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT INTO published_categories (category, version, published_at, questions) '
+                'VALUES (?, 1, ?, ?) ON CONFLICT (category) DO UPDATE SET '
+                'version = version + 1, published_at = excluded.published_at, questions = excluded.questions',
+                (category, time.time(), json.dumps({'questions': questions, 'tags': tags or {}}))
+            )
+
+    def published_versions(self):
+        """Get {category: version} for every published category; cheap enough to poll"""
+        conn = self._connect()
+        return dict(conn.execute('SELECT category, version FROM published_categories'))
+
+    def load_published(self, category):
+        """Load a published category as (version, published_at, questions, tags), or None"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT version, published_at, questions FROM published_categories WHERE category = ?',
+            (category,)
+        ).fetchone()
+        if row is None:
+            return None
+        version, published_at, payload = row
+        payload = json.loads(payload)
+        return version, published_at, payload['questions'], payload['tags']
+
+    def save_guild_excluded_tags(self, guild_id, tags):
+        """Remember which tags a server has turned off"""
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO guild_settings (guild_id, excluded_tags) VALUES (?, ?)',
+            (guild_id, json.dumps(sorted(tags)))
+        )
+        conn.commit()
+
+    def load_guild_excluded_tags(self):
+        """Load {guild_id: set of excluded tags} for every server that changed the default"""
+        conn = self._connect()
+        rows = conn.execute('SELECT guild_id, excluded_tags FROM guild_settings')
+        return {guild_id: set(json.loads(tags)) for guild_id, tags in rows}
+
+    def _get_meta(self, conn, key):
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else 0.0
+
+    def request_refresh(self):
+        """Ask the refresher to rebuild everything; returns False if a request is already pending"""
+        conn = self._connect()
+        with conn:
+            # BEGIN IMMEDIATE so two shards can't both see "no request pending"
+            conn.execute('BEGIN IMMEDIATE')
+            if self._get_meta(conn, 'refresh_requested_at') > self._get_meta(conn, 'refresh_taken_at'):
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('refresh_requested_at', time.time())
+            )
+        return True
+
+    def take_refresh_request(self):
+        """Claim a pending refresh request, returning True if there was one"""
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            if self._get_meta(conn, 'refresh_requested_at') <= self._get_meta(conn, 'refresh_taken_at'):
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('refresh_taken_at', time.time())
+            )
+        return True
+
+    def close(self):
+        """Close the database connection"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,83 @@
+from array import array
+from urllib.parse import urlsplit
+from classifier import compile_phrases
+from config import TAG_KEYWORDS, SLUG_STOPWORDS
+
+# Distinct tags kept; tags seen after this many are ignored
+MAX_TAGS = 64
+
+_KEYWORD_PATTERNS = {tag: compile_phrases(words) for tag, words in TAG_KEYWORDS.items()}
+
+
+def normalize_tag(tag):
+    """Canonical form of a tag as typed by a user, e.g. 'Couples ' -> 'couples'"""
+    return tag.strip().lower()
+
+
+def url_tags(url):
+    """Tags encoded in a source URL's slug, e.g. .../funny-truth-questions/ -> {'funny'}"""
+    segments = [segment for segment in urlsplit(url).path.split('/') if segment]
+    if not segments:
+        return set()
+    return {word for word in segments[-1].lower().split('-') if word and word not in SLUG_STOPWORDS}
+
+
+def keyword_tags(text):
+    """Tags whose TAG_KEYWORDS appear as whole words in a question"""
+    lowered = text.lower()
+    return {tag for tag, pattern in _KEYWORD_PATTERNS.items() if pattern.search(lowered)}
+
+
+class QuestionTags:
+    """The tags of every question in a corpus, as the set of question IDs carrying each tag.
+
+    Tags are only ever added: a question keeps the tags of every source it
+    was seen on, so excluding a tag errs on the side of leaving questions
+    out. The per-tag sets are the inverted index itself, so select() costs
+    set operations on the questions involved rather than a pass over every
+    question of a category.
+    """
+
+    def __init__(self):
+        self.names = []
+        self._ids = {}
+
+    def __contains__(self, tag):
+        return tag in self._ids
+
+    def add(self, ids, tags):
+        """Give every question in `ids` the given tags"""
+        for tag in tags:
+            tagged = self._ids.get(tag)
+            if tagged is None:
+                if len(self.names) >= MAX_TAGS:
+                    continue
+                tagged = self._ids[tag] = set()
+                self.names.append(tag)
+            tagged.update(ids)
+
+    def tags_of(self, qid):
+        """Names of a question's tags"""
+        return [name for name in self.names if qid in self._ids[name]]
+
+    def select(self, ids, tag=None, exclude=()):
+        """IDs from `ids` carrying `tag` (if given) and none of the `exclude` tags, in ID order.
+
+        Pass `ids` as a set or frozenset to save converting it.
+        """
+        if not isinstance(ids, (set, frozenset)):
+            ids = frozenset(ids)
+        if tag:
+            tagged = self._ids.get(tag)
+            if not tagged:
+                return array('I')
+            ids = tagged & ids
+        for name in exclude:
+            excluded = self._ids.get(name)
+            if excluded:
+                ids = ids - excluded
+        return array('I', sorted(ids))
+
+    def category_tags(self, ids):
+        """Names of every tag used by at least one of `ids`"""
+        return [name for name in self.names if not self._ids[name].isdisjoint(ids)]
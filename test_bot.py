@@ -7,6 +7,7 @@ This script tests the web scraping functionality and bot commands
 import asyncio
 import sys
 import os
+from datetime import datetime, timedelta
 
 # Add the current directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -14,11 +15,23 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from scraper import QuestionScraper
 from config import QUESTION_SOURCES
 
+def stub_builds(scraper, questions, delay=0):
+    """Make a scraper's rebuilds return questions(category), returning the categories rebuilt so far"""
+    built = []
+    
+    async def fake_build(category, min_questions=None):
+        built.append(category)
+        await asyncio.sleep(delay)
+        return scraper.corpus.add_many(questions(category))
+    
+    scraper._build_category = fake_build
+    return built
+
 async def test_scraper():
     """Test the web scraping functionality"""
     print("🧪 Testing Question Scraper...")
     
-    scraper = QuestionScraper()
+    scraper = QuestionScraper(store_path=None, packs_dir=None)
     
     try:
         # Test each category
@@ -60,7 +73,7 @@ async def test_fallback_questions():
     """Test the fallback question system"""
     print("\n🔄 Testing fallback questions...")
     
-    scraper = QuestionScraper()
+    scraper = QuestionScraper(store_path=None, packs_dir=None)
     
     try:
         # Test fallback questions for each category
@@ -76,6 +89,697 @@ async def test_fallback_questions():
     finally:
         await scraper.close()
 
+async def test_stale_while_revalidate():
+    """Test that stale cache entries are served while a single rebuild runs"""
+    print("\n♻️ Testing stale-while-revalidate refresh...")
+    
+    scraper = QuestionScraper(store_path=None, packs_dir=None)
+    
+    try:
+        built = stub_builds(scraper, lambda category: ["What is your freshest question?"], delay=0.05)
+        stale_ids = scraper.corpus.add_many(["What is your stalest question?"])
+        scraper.cache['truth'] = (datetime.now() - timedelta(hours=2), stale_ids)
+        
+        # Concurrent callers all get the stale list immediately and share one rebuild
+        results = await asyncio.gather(*[scraper.get_all_questions('truth') for _ in range(10)])
+        assert all(r == ["What is your stalest question?"] for r in results)
+        await asyncio.sleep(0.1)
+        assert built == ['truth']
+        assert await scraper.get_all_questions('truth') == ["What is your freshest question?"]
+        
+        info = scraper.get_cache_info()['truth']
+        print(f"   Rebuilds: {len(built)}, last refresh took {info['last_refresh_seconds']:.3f}s")
+        print("✅ Stale-while-revalidate test completed!")
+        
+    except Exception as e:
+        print(f"❌ Stale-while-revalidate test failed: {e!r}")
+    
+    finally:
+        await scraper.close()
+
+def test_question_classifier():
+    """Test word-boundary filtering in the question classifier"""
+    print("\n🔎 Testing question classifier...")
+    
+    try:
+        from classifier import QuestionClassifier
+        
+        classifier = QuestionClassifier()
+        cases = {
+            "Where is the strangest road you've driven on?": True,
+            "Have you already told them your secret?": True,
+            "Show the group your last photo": True,
+            "What do you think of this advertisement?": False,
+            "Click   here for more questions, what fun": False,
+            "Would you rather fly or be invisible": True,
+            # Plurals and other inflections of filter words are filtered too...
+            "We use cookies to improve your visit. How we use them?": False,
+            "Advertisements help us keep the site free, why not whitelist us?": False,
+            "Subscribers get new questions first, how cool?": False,
+            "Post your ads here, who will see them?": False,
+            # ...but short ones don't catch longer words they start
+            "What was your biggest adventure?": True,
+        }
+        results = classifier.classify(list(cases))
+        for (text, expected), result in zip(cases.items(), results):
+            assert result == expected, f"{text!r} classified as {result}"
+            assert classifier.is_question(text) == expected
+        
+        print(f"   {len(cases)} cases classified correctly")
+        print("✅ Question classifier test completed!")
+        
+    except Exception as e:
+        print(f"❌ Question classifier test failed: {e}")
+
+def test_question_sampler():
+    """Test non-repeating per-channel draws across a cache refresh"""
+    print("\n🃏 Testing question sampler...")
+    
+    try:
+        from sampler import QuestionSampler
+        
+        sampler = QuestionSampler(max_channels=2)
+        ids = frozenset(range(20))
+        
+        # A full pass over the deck never repeats
+        drawn = [sampler.draw('channel-a', 'truth', ids, 1) for _ in range(10)]
+        assert len(set(drawn)) == 10
+        
+        # After a refresh, removed IDs are never dealt and new ones are
+        refreshed = frozenset(range(5, 25))
+        rest = [sampler.draw('channel-a', 'truth', refreshed, 2) for _ in range(20)]
+        assert not set(rest) - refreshed
+        assert set(drawn + rest) >= refreshed
+        
+        # Only the most recently used channels are kept
+        sampler.draw('channel-b', 'truth', ids, 1)
+        sampler.draw('channel-c', 'truth', ids, 1)
+        assert len(sampler) == 2
+        
+        print(f"   Drew {len(drawn) + len(rest)} questions across a refresh with no repeats")
+        print("✅ Question sampler test completed!")
+        
+    except Exception as e:
+        print(f"❌ Question sampler test failed: {e!r}")
+
+async def test_incremental_refresh():
+    """Test that refreshes diff each source and keep failing sources during the grace period"""
+    print("\n🧩 Testing incremental refresh...")
+    
+    try:
+        scraper = QuestionScraper(
+            sources={'truth': ['http://a/', 'http://b/']}, alternative_sources={}, store_path=None, packs_dir=None
+        )
+        pages = {
+            'http://a/': [f"What is your question {n} from a?" for n in range(10)],
+            'http://b/': [f"What is your question {n} from b?" for n in range(10)],
+        }
+        
+        async def fake_scrape(url):
+            return list(pages[url])
+        scraper.scrape_questions = fake_scrape
+        
+        await scraper._refresh_category('truth')
+        assert len(await scraper.get_all_questions('truth')) == 20
+        
+        # Only the changes are applied
+        pages['http://a/'] = pages['http://a/'][1:] + ["What is your brand new question?"]
+        await scraper._refresh_category('truth')
+        info = scraper.get_cache_info()['truth']
+        assert (info['last_added'], info['last_removed']) == (1, 1)
+        
+        # A failing or shrunken source keeps its last good questions...
+        pages['http://b/'] = []
+        await scraper._refresh_category('truth')
+        pages['http://b/'] = pages['http://a/'][:2]
+        await scraper._refresh_category('truth')
+        assert len(await scraper.get_all_questions('truth')) == 20
+        assert scraper.get_cache_info()['truth']['sources_in_grace'] == 1
+        
+        # ...until the grace period runs out
+        scraper.pools['truth'].snapshots['http://b/'].failed_since -= scraper.source_grace
+        await scraper._refresh_category('truth')
+        assert len(await scraper.get_all_questions('truth')) == 10
+        await scraper.close()
+        
+        print("✅ Incremental refresh test completed!")
+        
+    except Exception as e:
+        print(f"❌ Incremental refresh test failed: {e!r}")
+
+async def test_slow_sources():
+    """Test that slow sources are only left behind while a command waits, and are still added"""
+    print("\n🐢 Testing slow sources...")
+    
+    try:
+        slow = 'http://example.com/funny-truth-questions/'
+        scraper = QuestionScraper(
+            sources={'truth': ['http://fast-a/', 'http://fast-b/', slow]}, alternative_sources={},
+            store_path=None, packs_dir=None
+        )
+        pages = {
+            'http://fast-a/': [f"What is your question {n} from fast a?" for n in range(50)],
+            'http://fast-b/': [f"What is your question {n} from fast b?" for n in range(50)],
+            slow: [f"What is your question {n} from the slow page?" for n in range(5)],
+        }
+        
+        async def fake_scrape(url):
+            await asyncio.sleep(0.05 if url == slow else 0)
+            return list(pages[url])
+        scraper.scrape_questions = fake_scrape
+        
+        # A background rebuild waits for every source
+        await scraper._refresh_category('truth')
+        assert len(await scraper.get_all_questions('truth')) == 105
+        assert scraper.peek_random_question('truth', tag='funny')[0] in pages[slow]
+        
+        # A command waiting on an empty category gets the fast sources first...
+        scraper.cache.clear()
+        scraper.pools.clear()
+        assert len(await scraper.get_all_questions('truth')) == 100
+        # ...and the slow one is added once it answers
+        await asyncio.sleep(0.1)
+        assert len(await scraper.get_all_questions('truth')) == 105
+        assert scraper.peek_random_question('truth', tag='funny')[0] in pages[slow]
+        await scraper.close()
+        
+        print("✅ Slow sources test completed!")
+        
+    except Exception as e:
+        print(f"❌ Slow sources test failed: {e!r}")
+
+async def test_predictive_refresh():
+    """Test demand tracking, refresh ordering and the refresh request budget"""
+    print("\n🔮 Testing predictive refreshes...")
+    
+    try:
+        from demand import DemandTracker
+        from ratelimit import RateLimiter
+        from scraper import REFRESH_BUDGET_KEY
+        
+        # Counts halve every half-life, and idle servers are swept
+        demand = DemandTracker(half_life=60)
+        for _ in range(8):
+            demand.record('truth', 'guild-a', now=0)
+        demand.record('truth', 'guild-b', now=0)
+        demand.record('dare', 'guild-b', now=0)
+        assert abs(demand.rate('truth', now=60) - demand.rate('truth', now=0) / 2) < 1e-6
+        assert demand.top_guilds('truth', 1, now=0) == ['guild-a']
+        assert demand.evict_idle(now=600) == 3 and len(demand) == 0
+        
+        sources = {category: [f"http://{category}/{n}" for n in range(4)] for category in ('truth', 'dare', 'would_you_rather')}
+        scraper = QuestionScraper(sources=sources, alternative_sources={}, store_path=None, packs_dir=None)
+        built = stub_builds(scraper, lambda category: [f"What is your freshest {category} question?"])
+        almost_expired = datetime.now() - timedelta(minutes=58)
+        scraper.cache['truth'] = (almost_expired, scraper.corpus.add_many(["What is your stale truth?"]))
+        scraper.cache['dare'] = (almost_expired, scraper.corpus.add_many(["What is your stale dare?"]))
+        for _ in range(20):
+            scraper.record_demand('dare', 7)
+        
+        # Uncached categories come first, then the busiest of those about to expire
+        assert [category for _, category in scraper._refresh_candidates()] == ['would_you_rather', 'dare', 'truth']
+        # !random only picks categories that are already cached
+        assert {scraper._pick_category() for _ in range(50)} == {'truth', 'dare'}
+        
+        # With budget for two categories the third waits for the next hour
+        scraper.refresh_budget = RateLimiter(8, 8 / 60)
+        scraper.set_guild_excluded_tags(7, {'dirty'})
+        results = [scraper._refresh_within_budget(category) for _, category in scraper._refresh_candidates()]
+        await asyncio.sleep(0.05)
+        assert results == [True, True, False] and built == ['would_you_rather', 'dare']
+        assert scraper.get_demand_info()['refreshes_deferred'] == 1
+        # The busiest server's filtered question set was built with the refresh
+        assert ('dare', None, frozenset({'dirty'})) in scraper._question_sets
+        # A deferred category is counted once, however many commands find it stale
+        assert not scraper._refresh_within_budget('truth')
+        assert scraper.get_demand_info()['refreshes_deferred'] == 1
+        # !refresh waits for the budget too, so asking for it again and again can't overdraw it
+        for _ in range(5):
+            assert scraper.request_refresh()
+            await asyncio.sleep(0.01)
+        assert built == ['would_you_rather', 'dare'] and scraper.refresh_budget.tokens(REFRESH_BUDGET_KEY) > -1
+        assert scraper.manual_refresh_deferred == list(scraper.sources)
+        assert scraper.get_demand_info()['refreshes_deferred'] == 3
+        await scraper.close()
+        
+        print("✅ Predictive refresh test completed!")
+        
+    except Exception as e:
+        print(f"❌ Predictive refresh test failed: {e!r}")
+
+async def test_question_response():
+    """Test that cached questions are sent in one message without a typing indicator"""
+    print("\n💬 Testing question response path...")
+    
+    try:
+        import bot
+        
+        class Context:
+            def __init__(self):
+                self.author = type('Author', (), {'display_name': 'tester'})()
+                self.channel = type('Channel', (), {'id': 1})()
+                self.guild = None
+                self.typing_calls = 0
+                self.sent = []
+            
+            def typing(self):
+                self.typing_calls += 1
+                return self
+            
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *exc):
+                return False
+            
+            async def send(self, content=None, embed=None):
+                self.sent.append(embed or content)
+        
+        bot.scraper = QuestionScraper(store_path=None, packs_dir=None)
+        bot.scraper.cache['truth'] = (datetime.now(), bot.scraper.corpus.add_many(["What is your warmest question?"]))
+        
+        ctx = Context()
+        await bot.truth.callback(ctx)
+        assert ctx.typing_calls == 0 and len(ctx.sent) == 1
+        assert ctx.sent[0].description == "What is your warmest question?"
+        assert ctx.sent[0].color.value == bot.EMBED_COLORS['truth']
+        assert ctx.sent[0].footer.text == "Requested by tester"
+        
+        # A category that still has to be scraped shows typing while it loads
+        stub_builds(bot.scraper, lambda category: bot.scraper.fallback_questions[category])
+        ctx = Context()
+        await bot.dare.callback(ctx)
+        assert ctx.typing_calls == 1 and len(ctx.sent) == 1
+        await bot.scraper.close()
+        
+        print("✅ Question response test completed!")
+        
+    except Exception as e:
+        print(f"❌ Question response test failed: {e!r}")
+
+async def test_rate_limits():
+    """Test token-bucket limits and coalescing of manual refreshes"""
+    print("\n⏳ Testing rate limits...")
+    
+    try:
+        from ratelimit import RateLimiter, acquire
+        
+        users = RateLimiter(burst=2, per_minute=60)
+        guilds = RateLimiter(burst=3, per_minute=60)
+        
+        # A user gets a burst, then waits for tokens to refill; the server limit is shared
+        assert acquire([(users, ('alice', 'truth')), (guilds, ('guild', 'truth'))], now=0) == 0
+        assert acquire([(users, ('alice', 'truth')), (guilds, ('guild', 'truth'))], now=0) == 0
+        assert acquire([(users, ('alice', 'truth')), (guilds, ('guild', 'truth'))], now=0) == 1.0
+        assert acquire([(users, ('bob', 'truth')), (guilds, ('guild', 'truth'))], now=0) == 0
+        assert acquire([(users, ('carol', 'truth')), (guilds, ('guild', 'truth'))], now=0) > 0
+        assert users.rejected == 1 and guilds.rejected == 1
+        
+        # Buckets that have refilled are evicted
+        assert users.evict_idle(now=60) == 2 and len(users) == 0
+        
+        # Repeated refresh requests share one pending refresh
+        scraper = QuestionScraper(store_path=None, packs_dir=None)
+        built = stub_builds(scraper, lambda category: ["What is your freshest question?"], delay=0.05)
+        started = [scraper.request_refresh() for _ in range(10)]
+        await asyncio.sleep(0.1)
+        assert started.count(True) == 1
+        assert sorted(built) == sorted(scraper.sources)
+        assert scraper.manual_refresh_stats == {'started': 1, 'coalesced': 9}
+        await scraper.close()
+        
+        print(f"   10 refresh requests -> {len(built)} category rebuilds")
+        print("✅ Rate limit test completed!")
+        
+    except Exception as e:
+        print(f"❌ Rate limit test failed: {e!r}")
+
+async def test_question_packs():
+    """Test writing, streaming and loading question packs"""
+    print("\n📦 Testing question packs...")
+    
+    try:
+        import json
+        import tempfile
+        from packs import PackError, iter_pack, read_header, write_pack
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'party.jsonl')
+            counts = write_pack(path, [
+                ('truth', "What is the silliest thing you believed as a kid?", ['party']),
+                ('dare', "Do your best impression of a famous singer.", []),
+                ('truth', "Who in this room would survive a zombie apocalypse?", ['party']),
+            ])
+            assert counts == {'truth': 2, 'dare': 1}
+            assert read_header(path)['categories'] == counts
+            truths = list(iter_pack(path, 'truth'))
+            assert [entry.tags for entry in truths] == [('party',), ('party',)]
+            # IDs are stable content hashes, the same in every pack
+            assert truths[0].id == list(iter_pack(path))[0].id and len(truths[0].id) == 16
+            
+            future = os.path.join(tmp, 'future.jsonl')
+            with open(future, 'w') as f:
+                f.write(json.dumps({'format': 'truthbot-pack', 'version': 99}) + '\n')
+            try:
+                list(iter_pack(future))
+                assert False, "a newer pack version was read"
+            except PackError:
+                pass
+            
+            # Packs in the packs directory are sources of their categories; broken files are skipped
+            scraper = QuestionScraper(sources={'truth': [], 'dare': []}, alternative_sources={},
+                                      store_path=None, packs_dir=tmp)
+            assert list(scraper.packs) == [path]
+            questions = await scraper.get_all_questions('truth')
+            assert sorted(questions) == sorted(entry.question for entry in truths)
+            assert scraper.get_tags('truth') == ['party']
+            # Only categories that haven't loaded the pack yet need a rebuild
+            assert scraper._stale_pack_categories() == {'dare'}
+            # Packs are streamed in slices, and questions already in the corpus keep their IDs
+            import scraper as scraper_module
+            slice_ms, scraper_module.PACK_LOAD_SLICE_MS = scraper_module.PACK_LOAD_SLICE_MS, 0
+            try:
+                ids, count = await scraper._load_pack(path, 'truth')
+            finally:
+                scraper_module.PACK_LOAD_SLICE_MS = slice_ms
+            assert count == 2 and sorted(ids) == sorted(scraper.pools['truth'].ids())
+            
+            # Exported questions round-trip through a pack
+            exported = os.path.join(tmp, 'export.jsonl.out')
+            assert write_pack(exported, scraper.pack_entries()) == {'truth': 2}
+            
+            # A removed pack's questions are dropped
+            os.remove(path)
+            assert 'truth' in scraper._stale_pack_categories()
+            assert await scraper._apply_packs('truth') == (0, 2)
+            assert not len(scraper.pools['truth']) and not scraper._stale_pack_categories()
+            await scraper.close()
+        
+        # Fallback questions come from the fallback pack, or built-in ones if it can't be read
+        scraper = QuestionScraper(store_path=None, packs_dir=None)
+        assert len(scraper.fallback_questions['truth']) == 15
+        
+        def broken_fallback():
+            raise PackError("fallback.jsonl is not a question pack")
+        load_fallback, scraper_module.load_fallback_questions = scraper_module.load_fallback_questions, broken_fallback
+        try:
+            assert scraper.fallback_questions == scraper_module.BUILTIN_FALLBACK_QUESTIONS
+            assert len(scraper._intern_fallback('dare')) == 3
+        finally:
+            scraper_module.load_fallback_questions = load_fallback
+        await scraper.close()
+        
+        print("✅ Question packs test completed!")
+        
+    except Exception as e:
+        print(f"❌ Question packs test failed: {e!r}")
+
+async def test_game_sessions():
+    """Test game turns, timeouts and idle expiry on one deadline scheduler"""
+    print("\n🎲 Testing game sessions...")
+    
+    try:
+        from game import GameManager, GameError, CHOOSING, ANSWERING, ENDED
+        
+        now = 0.0
+        timeouts = []
+        games = GameManager(on_timeout=lambda session, reason: timeouts.append(reason),
+                            join_seconds=60, turn_seconds=30, idle_seconds=100, clock=lambda: now)
+        
+        def advance(seconds):
+            nonlocal now
+            now += seconds
+            for channel in games.scheduler.pop_due():
+                games._deadline_passed(channel)
+        
+        session = games.create(1, 'alice')
+        games.join(1, 'bob')
+        games.join(1, 'carol')
+        for action in (lambda: games.join(1, 'bob'), lambda: games.start(1, 'bob'), lambda: games.create(1, 'dave')):
+            try:
+                action()
+                assert False, "an invalid action was allowed"
+            except GameError:
+                pass
+        
+        # Turns rotate through the players; only the current player may choose
+        games.start(1, 'alice')
+        first = session.current_player
+        assert session.phase == CHOOSING and session.round == 1
+        games.choose(1, first, 'dare')
+        assert session.phase == ANSWERING and session.category == 'dare'
+        games.finish_turn(1, first)
+        assert session.current_player != first and session.phase == CHOOSING
+        
+        # A turn that runs out of time is skipped, and a game nobody touches expires
+        advance(31)
+        advance(31)
+        assert timeouts == ['turn_timeout'] * 2 and session.round == 2 and session.current_player == first
+        advance(31)
+        advance(31)
+        assert timeouts[-1] == 'expired' and session.phase == ENDED and len(games) == 0
+        assert len(games.scheduler) == 0
+        
+        # A lobby with too few players closes when the join window ends
+        games.create(2, 'alice')
+        advance(61)
+        assert timeouts[-1] == 'expired' and games.get(2) is None
+        
+        # Thousands of games share one scheduler task, and rescheduled deadlines don't pile up
+        games = GameManager(turn_seconds=0.05, join_seconds=0.05, idle_seconds=0.1)
+        games.scheduler.start()
+        tasks = len(asyncio.all_tasks())
+        for channel in range(5000):
+            games.create(channel, 'alice')
+            games.join(channel, 'bob')
+            games.start(channel, 'alice')
+        assert len(games.scheduler._heap) < 3 * len(games) + 64
+        assert len(asyncio.all_tasks()) == tasks
+        await asyncio.sleep(0.4)
+        assert len(games) == 0 and games.stats['expired'] == 5000
+        await games.scheduler.stop()
+        
+        # The bot renders each phase with the shared per-phase button views
+        import bot
+        session = bot.game_manager.create(3, 42)
+        assert bot.game_view(session) is bot.game_view(bot.game_manager.create(4, 43))
+        assert [item.custom_id for item in bot.game_view(session).children] == ['game:join', 'game:leave', 'game:start']
+        assert '<@42>' in bot.game_embed(session).fields[0].value
+        bot.game_manager.end(3, 42)
+        assert bot.game_view(session) is None and bot.game_embed(session).title == "🏁 Game Over"
+        
+        print("   5000 games expired on one scheduler task")
+        print("✅ Game sessions test completed!")
+        
+    except Exception as e:
+        print(f"❌ Game sessions test failed: {e!r}")
+
+async def test_shared_store():
+    """Test that shards serve what the refresher publishes and share refresh requests"""
+    print("\n🗂️ Testing shared question store...")
+    
+    try:
+        import tempfile
+        from shared import SharedQuestionReader
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'questions.db')
+            owner = QuestionScraper(store_path=path, publish=True, packs_dir=None)
+            shards = [SharedQuestionReader(store_path=path, poll_interval=0.01) for _ in range(2)]
+            
+            def fake_questions(category):
+                return [f"What is your {category} question number {n}?" for n in range(3)]
+            
+            stub_builds(owner, fake_questions)
+            
+            # Before anything is published shards serve fallback questions
+            assert await shards[0].get_all_questions('dare') == owner.fallback_questions['dare']
+            
+            await owner.warm_up()
+            for shard in shards:
+                shard.start_background_refresh()
+            await asyncio.sleep(0.1)
+            for shard in shards:
+                assert await shard.get_all_questions('dare') == fake_questions('dare')
+            
+            # A republished category reaches the shards through polling
+            stub_builds(owner, lambda category: ["What is your newest dare?"])
+            await owner._refresh_category('dare')
+            await asyncio.sleep(0.1)
+            assert await shards[1].get_all_questions('dare') == ["What is your newest dare?"]
+            
+            # Refresh requests from every shard coalesce into one for the refresher
+            assert [shard.request_refresh() for shard in shards] == [True, False]
+            assert owner.store.take_refresh_request()
+            assert not owner.store.take_refresh_request()
+            
+            for scraper in [owner] + shards:
+                await scraper.close()
+        
+        print("✅ Shared question store test completed!")
+        
+    except Exception as e:
+        print(f"❌ Shared question store test failed: {e!r}")
+
+async def test_circuit_breaker():
+    """Test that failing sources are skipped and timeouts follow latency"""
+    print("\n⛔ Testing source circuit breaker...")
+    
+    try:
+        from config import BREAKER_FAILURE_THRESHOLD, REQUEST_TIMEOUT, ADAPTIVE_TIMEOUT_MIN_SECONDS
+        from health import SourceHealth
+        
+        # Timeouts start at REQUEST_TIMEOUT and shrink towards p95 * multiplier
+        health = SourceHealth()
+        assert health.timeout() == REQUEST_TIMEOUT
+        for _ in range(10):
+            health.record_success(0.1)
+        assert health.timeout() == ADAPTIVE_TIMEOUT_MIN_SECONDS
+        
+        # Consecutive failures open the breaker; an expired window allows one probe
+        for _ in range(BREAKER_FAILURE_THRESHOLD):
+            assert health.allow_request()
+            health.record_failure()
+        assert health.state == 'open' and not health.allow_request()
+        health.open_until = 0
+        assert health.allow_request() and health.state == 'half_open'
+        assert not health.allow_request()
+        health.record_success(0.1)
+        assert health.state == 'closed'
+        
+        # An unreachable source stops being requested once its breaker opens
+        scraper = QuestionScraper(store_path=None, packs_dir=None)
+        url = 'http://127.0.0.1:9/questions'
+        for _ in range(BREAKER_FAILURE_THRESHOLD + 2):
+            assert await scraper.scrape_questions(url) == []
+        source = scraper.get_source_health()[url]
+        assert source['state'] == 'open'
+        assert source['consecutive_failures'] == BREAKER_FAILURE_THRESHOLD
+        await scraper.close()
+        
+        print(f"   Breaker opened after {BREAKER_FAILURE_THRESHOLD} failures, retry in {source['retry_in_seconds']}s")
+        print("✅ Circuit breaker test completed!")
+        
+    except Exception as e:
+        print(f"❌ Circuit breaker test failed: {e!r}")
+
+def test_tags():
+    """Test tagging at ingestion and filtered draws"""
+    print("\n🏷️ Testing question tags...")
+    
+    try:
+        from array import array
+        from tags import url_tags, keyword_tags
+        
+        assert url_tags('https://www.truthordarequestions.net/funny-truth-questions/') == {'funny'}
+        assert url_tags('https://www.truthordarequestions.net/truth-questions-for-couples/') == {'couples'}
+        assert keyword_tags("What do you like most about your partner?") == {'couples'}
+        assert keyword_tags("Who is your department head?") == set()
+        
+        scraper = QuestionScraper(store_path=None, packs_dir=None)
+        funny = [f"What is the funniest thing number {n} you did?" for n in range(5)]
+        dirty = [f"What is the wildest thing number {n} you did?" for n in range(5)]
+        plain = [f"What is the plainest thing number {n} you did?" for n in range(5)]
+        scraper._apply_results('truth', {
+            'https://example.com/funny-truth-questions/': funny,
+            'https://example.com/dirty-truth-questions/': dirty,
+            'https://example.com/truth-questions/': plain,
+        })
+        scraper.cache['truth'] = (datetime.now(), scraper.pools['truth'].ids())
+        
+        assert scraper.get_tags('truth') == ['dirty', 'funny']
+        drawn = {scraper.peek_random_question('truth', 1, tag='funny')[0] for _ in range(5)}
+        assert drawn == set(funny)
+        clean = {scraper.peek_random_question('truth', 2, exclude=frozenset({'dirty'}))[0] for _ in range(10)}
+        assert clean == set(funny + plain)
+        assert scraper.peek_random_question('truth', 3, tag='unknown') == (None, 'truth')
+        
+        # Questions already in the corpus, like a page's cached response, still get keyword tags
+        partner = "What do you like most about your partner?"
+        qid = scraper.corpus.add(partner)
+        assert scraper._intern([partner]) == array('I', [qid])
+        assert scraper.tags.tags_of(qid) == ['couples']
+        assert scraper.tags.select([qid, 0], 'couples', exclude=['dirty']) == array('I', [qid])
+        
+        scraper.set_guild_excluded_tags(42, {'dirty'})
+        assert scraper.get_guild_excluded_tags(42) == {'dirty'}
+        assert scraper.get_guild_excluded_tags(7) == frozenset()
+        
+        print("✅ Question tags test completed!")
+        
+    except Exception as e:
+        print(f"❌ Question tags test failed: {e!r}")
+
+def test_near_duplicates():
+    """Test that near-duplicate questions resolve to one canonical question"""
+    print("\n👯 Testing near-duplicate detection...")
+    
+    try:
+        from corpus import QuestionCorpus
+        from dedup import normalize_text
+        
+        assert normalize_text("What's UR biggest fear?? 😱") == "what is your biggest fear"
+        
+        corpus = QuestionCorpus()
+        canonical = corpus.add("What is your favourite movie?")
+        for variant in ["what is your favourite movie", "WHAT IS UR FAVOURITE MOVIE?!", "What's your favourite movie? 🍿",
+                        "What is your favorite movie?"]:
+            assert corpus.add(variant) == canonical, variant
+        assert corpus.get(canonical) == "What is your favourite movie?"
+        assert corpus.near_duplicates_merged == 1
+        
+        # Different questions, or ones asking about different numbers, stay apart
+        assert corpus.add("What is your biggest regret?") != corpus.add("What is your biggest fear?")
+        assert corpus.add("Would you rather have 1 kid or 5 kids?") != corpus.add("Would you rather have 2 kids or 3 kids?")
+        assert len(corpus) == 5
+        
+        # Negations and short words must match exactly, however alike they look
+        assert corpus.add("Have you ever stolen something?") != corpus.add("Have you never stolen something?")
+        assert corpus.add("Would you ever date a coworker?") != corpus.add("Would you never date a coworker?")
+        assert corpus.add("What is your biggest fear?") != corpus.add("What is your biggest fea?")
+        assert len(corpus) == 10
+        
+        exact = QuestionCorpus(near_duplicates=False)
+        assert exact.add("What is your favourite movie?") != exact.add("What is your favorite movie?")
+        
+        print("✅ Near-duplicate detection test completed!")
+        
+    except Exception as e:
+        print(f"❌ Near-duplicate detection test failed: {e!r}")
+
+def test_logging():
+    """Test the JSON logging pipeline and per-URL rate limiting"""
+    print("\n📜 Testing structured logging...")
+    
+    try:
+        import io
+        import json
+        import logging
+        from logs import setup_logging
+        
+        stream = io.StringIO()
+        logger = logging.getLogger('test_bot.logging')
+        logger.propagate = False
+        listener = setup_logging('INFO', stream, logger)
+        for status in range(500, 510):
+            logger.warning("Scraped http://a/: http_error", extra={'url': 'http://a/', 'status': status})
+        logger.warning("Scraped http://b/: timeout", extra={'url': 'http://b/', 'category': 'truth'})
+        logger.info("Scraped http://a/: ok", extra={'url': 'http://a/', 'duration': 0.25, 'questions': 40})
+        logger.debug("Not written at INFO")
+        listener.stop()
+        
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        # Only the burst of a's warnings gets through, but b and a's info record are unaffected
+        assert [line.get('status') for line in lines[:3]] == [500, 501, 502]
+        assert lines[3]['url'] == 'http://b/' and lines[3]['category'] == 'truth'
+        assert lines[4]['level'] == 'INFO' and lines[4]['questions'] == 40 and lines[4]['duration'] == 0.25
+        assert len(lines) == 5
+        
+        print("✅ Structured logging test completed!")
+        
+    except Exception as e:
+        print(f"❌ Structured logging test failed: {e!r}")
+
 def test_config():
     """Test the configuration settings"""
     print("\n⚙️ Testing configuration...")
@@ -108,9 +812,54 @@ async def main():
     # Test configuration
     test_config()
     
+    # Test question filtering
+    test_question_classifier()
+    
+    # Test non-repeating draws
+    test_question_sampler()
+    
+    # Test tagged draws
+    test_tags()
+    
+    # Test near-duplicate merging
+    test_near_duplicates()
+    
+    # Test JSON logging
+    test_logging()
+    
     # Test fallback questions
     await test_fallback_questions()
     
+    # Test background refresh
+    await test_stale_while_revalidate()
+    
+    # Test diff-based refreshes
+    await test_incremental_refresh()
+    
+    # Test that slow sources are kept
+    await test_slow_sources()
+    
+    # Test demand-ordered refreshes
+    await test_predictive_refresh()
+    
+    # Test the command response path
+    await test_question_response()
+    
+    # Test rate limiting
+    await test_rate_limits()
+    
+    # Test question packs
+    await test_question_packs()
+    
+    # Test game sessions
+    await test_game_sessions()
+    
+    # Test sharing questions between processes
+    await test_shared_store()
+    
+    # Test skipping failing sources
+    await test_circuit_breaker()
+    
     # Test web scraping
     await test_scraper()
     